@@ -0,0 +1,122 @@
+"""
+Executor de scoring com controle de admissão
+============================================
+
+O scoring do /recommend (numpy, scipy, BM25) roda em um pool próprio, com
+poucas threads (uma por núcleo), em vez do threadpool padrão do AnyIO, que
+aceita dezenas de requisições simultâneas disputando o GIL e a CPU.
+
+Requisições além das threads ocupadas esperam em uma fila limitada. Com a
+fila cheia, `submit` levanta `Overloaded` imediatamente, e o servidor
+responde 503 com `Retry-After`, em vez de acumular latência para todos.
+
+Profundidade da fila, tempo de espera e rejeições ficam disponíveis em
+`stats()` para o /health.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from text_processing import resolve_workers
+
+DEFAULT_MAX_QUEUE = 64
+# Tempos recentes usados nos percentis de espera
+WAIT_SAMPLES = 1024
+
+
+class Overloaded(Exception):
+    """Fila de admissão cheia; `retry_after` é a sugestão de espera em segundos"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Servidor sobrecarregado, tente novamente em {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Pool de `max_workers` threads com no máximo `max_queue` tarefas aguardando"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: int = DEFAULT_MAX_QUEUE,
+                 name: str = "scoring"):
+        self.max_workers = resolve_workers(max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.pending = 0  # Tarefas admitidas e ainda não concluídas (em execução + na fila)
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def retry_after(self) -> int:
+        """Segundos estimados para esvaziar a fila atual (tempo médio de execução)"""
+        mean_run = self.busy_seconds / self.completed if self.completed else 0.0
+        return max(1, math.ceil(self.pending * mean_run / self.max_workers))
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.pending += 1
+            self.submitted += 1
+        enqueued_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self.running += 1
+                self.waits.append(started_at - enqueued_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.pending -= 1
+                    self.completed += 1
+                    self.busy_seconds += time.perf_counter() - started_at
+
+        try:
+            return self._pool.submit(task)
+        except RuntimeError:
+            # Pool já encerrado (shutdown do servidor)
+            with self._lock:
+                self.pending -= 1
+            raise
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Executa `fn` no pool sem ocupar o event loop nem o threadpool do AnyIO"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits_ms = np.array(self.waits, dtype=np.float64) * 1000.0
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queue_depth": self.pending - self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms": {
+                    "p50": round(float(np.percentile(waits_ms, 50)), 3) if len(waits_ms) else 0.0,
+                    "p95": round(float(np.percentile(waits_ms, 95)), 3) if len(waits_ms) else 0.0,
+                    "max": round(float(waits_ms.max()), 3) if len(waits_ms) else 0.0,
+                },
+            }
@@ -0,0 +1,276 @@
+"""
+Busca aproximada (ANN) sobre os embeddings
+==========================================
+
+Backends de busca por vizinhos mais próximos (produto interno de vetores
+normalizados = cosseno) para o caminho semântico:
+
+- `exact`: varredura completa do store (referência e fallback);
+- `ivf`:   índice invertido por clusters (k-means esférico em numpy); a
+           query visita apenas as `nprobe` listas de centróides mais
+           próximos;
+- `hnsw`:  grafo HNSW do `hnswlib`, quando a biblioteca está instalada;
+           `ef` controla a largura da busca.
+
+Os índices são gravados ao lado dos embeddings (data/sbert_embeddings/) e
+ficam associados à geração do store: se os embeddings mudarem, o índice é
+reconstruído na próxima inicialização.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from ranking import top_k
+from shared_artifacts import build_lock
+
+logger = logging.getLogger(__name__)
+
+ANN_BACKENDS = ('exact', 'ivf', 'hnsw')
+
+DEFAULT_NPROBE = 8
+DEFAULT_KMEANS_ITERATIONS = 10
+# Pontos de treino por centróide no k-means
+KMEANS_SAMPLE_PER_LIST = 64
+ASSIGN_CHUNK = 16384
+
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCTION = 200
+DEFAULT_HNSW_EF = 64
+
+IVF_FILE = 'ann-ivf.npz'
+HNSW_FILE = 'ann-hnsw.bin'
+HNSW_META_FILE = 'ann-hnsw.json'
+
+
+def hnsw_available() -> bool:
+    """hnswlib é uma dependência opcional"""
+    try:
+        import hnswlib  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def min_score(searcher, query: np.ndarray, **params) -> float:
+    """
+    Menor produto interno da query com o corpus: o documento menos similar é
+    o mais próximo da query negada, então basta o top-1 dessa busca (exato
+    com `exact`; nos índices aproximados, com o mesmo recall do top-k).
+    """
+    _, scores = searcher.search(-query, 1, **params)
+    return -float(scores[0]) if len(scores) else 0.0
+
+
+def dense_scores(num_rows: int, indices: np.ndarray, scores: np.ndarray, floor: float) -> np.ndarray:
+    """
+    Vetor de scores do corpus a partir dos candidatos de uma busca ANN.
+
+    Documentos não retornados recebem `floor`, o menor score do corpus
+    (`min_score`): a normalização min/max da fusão híbrida usa então a mesma
+    escala da busca exata, e só os scores de quem ficou fora dos candidatos
+    são aproximados (pelo piso).
+    """
+    if len(scores):
+        floor = min(floor, float(scores.min()))
+    dense = np.full(num_rows, floor, dtype=np.float32)
+    dense[indices] = scores
+    return dense
+
+
+class ExactSearcher:
+    """Varredura completa: mesmo resultado do produto escalar com todo o store"""
+
+    name = 'exact'
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+
+    def search(self, query: np.ndarray, k: int, **params) -> Tuple[np.ndarray, np.ndarray]:
+        return top_k(self.store.scores(query), k)
+
+
+# =============================================================================
+# IVF
+# =============================================================================
+
+def _assign(store: EmbeddingStore, centroids: np.ndarray) -> np.ndarray:
+    """Centróide mais próximo (maior produto interno) de cada linha do store"""
+    labels = np.empty(len(store), dtype=np.int32)
+    for start in range(0, len(store), ASSIGN_CHUNK):
+        stop = min(start + ASSIGN_CHUNK, len(store))
+        labels[start:stop] = np.argmax(store.dequantize(start, stop) @ centroids.T, axis=1)
+    return labels
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class IVFIndex:
+    """Listas invertidas por cluster: `order` agrupa as linhas de cada lista, delimitadas por `offsets`"""
+
+    name = 'ivf'
+
+    def __init__(self, store: EmbeddingStore, centroids: np.ndarray, order: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = DEFAULT_NPROBE):
+        self.store = store
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, store: EmbeddingStore, nlist: Optional[int] = None,
+              iterations: int = DEFAULT_KMEANS_ITERATIONS, seed: int = 0) -> 'IVFIndex':
+        """K-means esférico sobre uma amostra do store e atribuição de todas as linhas"""
+        n = len(store)
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n, size=min(n, nlist * KMEANS_SAMPLE_PER_LIST), replace=False))
+        sample = store.data[sample_rows].astype(np.float32)
+        if store.scales is not None:
+            sample *= store.scales[sample_rows, None]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            # Clusters vazios mantêm o centróide anterior
+            centroids = np.where(counts[:, None] > 0, _normalize(sums), centroids)
+
+        labels = _assign(store, centroids)
+        order = np.argsort(labels, kind='stable').astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+        return cls(store, centroids.astype(np.float32), order, offsets)
+
+    def save(self, directory):
+        path = Path(directory) / IVF_FILE
+        tmp = path.with_name(f".{IVF_FILE}-{os.getpid()}.npz")
+        np.savez(tmp, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 generation=np.array(self.store.generation or ''))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, directory, store: EmbeddingStore) -> Optional['IVFIndex']:
+        path = Path(directory) / IVF_FILE
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if str(data['generation']) != (store.generation or ''):
+                    return None
+                return cls(store, data['centroids'], data['order'], data['offsets'])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Índice IVF ilegível em {path}: {e}")
+            return None
+
+    def search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None, **params) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(max(nprobe or self.nprobe, 1), self.nlist)
+        lists = top_k(self.centroids @ query, nprobe)[0]
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+        local, scores = top_k(self.store.row_scores(query, rows), k)
+        return rows[local], scores
+
+
+# =============================================================================
+# HNSW (opcional)
+# =============================================================================
+
+class HNSWIndex:
+    """Grafo HNSW do hnswlib sobre os embeddings dequantizados"""
+
+    name = 'hnsw'
+
+    def __init__(self, store: EmbeddingStore, index, ef: int = DEFAULT_HNSW_EF):
+        self.store = store
+        self.index = index
+        self.ef = ef
+
+    @classmethod
+    def build(cls, store: EmbeddingStore, M: int = DEFAULT_HNSW_M,
+              ef_construction: int = DEFAULT_HNSW_EF_CONSTRUCTION) -> 'HNSWIndex':
+        import hnswlib
+
+        index = hnswlib.Index(space='ip', dim=store.shape[1])
+        index.init_index(max_elements=len(store), ef_construction=ef_construction, M=M)
+        for start in range(0, len(store), ASSIGN_CHUNK):
+            stop = min(start + ASSIGN_CHUNK, len(store))
+            index.add_items(store.dequantize(start, stop), np.arange(start, stop))
+        return cls(store, index)
+
+    def save(self, directory):
+        directory = Path(directory)
+        tmp = directory / f".{HNSW_FILE}-{os.getpid()}"
+        self.index.save_index(str(tmp))
+        os.replace(tmp, directory / HNSW_FILE)
+        with open(directory / HNSW_META_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'generation': self.store.generation}, f)
+
+    @classmethod
+    def load(cls, directory, store: EmbeddingStore) -> Optional['HNSWIndex']:
+        import hnswlib
+
+        directory = Path(directory)
+        try:
+            with open(directory / HNSW_META_FILE, encoding='utf-8') as f:
+                if json.load(f).get('generation') != store.generation:
+                    return None
+            index = hnswlib.Index(space='ip', dim=store.shape[1])
+            index.load_index(str(directory / HNSW_FILE), max_elements=len(store))
+        except (OSError, ValueError, RuntimeError):
+            return None
+        return cls(store, index)
+
+    def search(self, query: np.ndarray, k: int, ef: Optional[int] = None, **params) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self.store))
+        self.index.set_ef(max(ef or self.ef, k))
+        labels, distances = self.index.knn_query(query, k=k)
+        # Distância 'ip' do hnswlib = 1 - produto interno
+        return labels[0].astype(np.intp), (1.0 - distances[0]).astype(np.float32)
+
+
+# =============================================================================
+# CARREGAMENTO
+# =============================================================================
+
+def load_or_build(store: EmbeddingStore, directory, backends=ANN_BACKENDS) -> Dict[str, object]:
+    """
+    Buscadores disponíveis por nome. O `exact` está sempre presente; IVF e
+    HNSW são lidos do disco ou construídos (e gravados) para a geração atual
+    do store. HNSW é ignorado se o hnswlib não estiver instalado.
+    """
+    searchers = {'exact': ExactSearcher(store)}
+    for backend, cls in (('ivf', IVFIndex), ('hnsw', HNSWIndex)):
+        if backend not in backends:
+            continue
+        if backend == 'hnsw' and not hnsw_available():
+            logger.info("hnswlib não instalado; backend 'hnsw' indisponível")
+            continue
+        index = cls.load(directory, store)
+        if index is None:
+            # Um único worker constrói o índice; os demais o leem do disco depois do lock
+            with build_lock(Path(directory) / f"ann-{backend}"):
+                index = cls.load(directory, store)
+                if index is None:
+                    logger.info(f"Construindo índice ANN '{backend}' para {store.shape[0]} embeddings...")
+                    index = cls.build(store)
+                    try:
+                        index.save(directory)
+                    except OSError as e:
+                        logger.warning(f"Erro ao salvar índice ANN '{backend}': {e}")
+        searchers[backend] = index
+    return searchers
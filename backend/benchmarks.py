@@ -0,0 +1,506 @@
+"""
+Benchmarks
+==========
+
+Medições de desempenho dos componentes do backend, rodando sobre o catálogo
+processado (data/processed_movies.arrow).
+
+Uso:
+    python backend/benchmarks.py bm25 [--queries 200] [--repeat 3]
+    python backend/benchmarks.py fusion [--top-n 20] [--depth 100]
+    python backend/benchmarks.py alloc [--queries 100]
+    python backend/benchmarks.py analyzer [--limit 2000]
+    python backend/benchmarks.py embeddings [--queries 200]
+    python backend/benchmarks.py ann [--synthetic 200000] [--nprobe 4 8 16 32]
+    python backend/benchmarks.py payloads [--requests 500] [--top-n 20]
+    python backend/benchmarks.py imports [--modules main main_semantic] [--repeat 3]
+"""
+
+import argparse
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+import unicodedata
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from catalog import catalog_source, load_movies
+from ann_index import ExactSearcher, HNSWIndex, IVFIndex, hnsw_available
+from embedding_store import EmbeddingStore, load_store, quantize
+from index_store import build_index, file_sha256, load_index
+from neighbors import l2_normalize_rows
+from nltk_resources import LEMMATIZE_RESOURCES, require_resources
+from ranking import full_fusion_top_k, fuse_top_k, top_k
+from sparse_scoring import sparse_dot_scores
+from text_processing import combine_features_text, get_analyzer, lemmatize_tokens, preprocess_text
+
+DATA_PATH = "data/processed_movies.arrow"
+CSV_DATA_PATH = "data/processed_movies.csv"
+INDEX_PROFILE = "lexical"
+EMBEDDINGS_STORE_PATH = "data/sbert_embeddings"
+
+SAMPLE_QUERIES = [
+    "superhero movies with action",
+    "romantic comedy",
+    "Christopher Nolan",
+    "Tom Hanks",
+    "space exploration sci-fi",
+    "a detective investigates a murder in a small town",
+    "animated family adventure with talking animals",
+    "horror zombie apocalypse",
+]
+
+
+def load_lexical_index(args):
+    """Carrega o catálogo e o índice lexical (pré-construído ou ajustado na hora)"""
+    df = load_movies(args.data, args.csv)
+    index = load_index(INDEX_PROFILE, file_sha256(catalog_source(args.data, args.csv)))
+    if index is None:
+        index = build_index(df, INDEX_PROFILE)
+    return df, index
+
+
+def make_queries(df, count: int, seed: int = 42):
+    """Queries de exemplo + títulos e descrições sorteados do catálogo"""
+    rng = random.Random(seed)
+    queries = list(SAMPLE_QUERIES)
+    while len(queries) < count:
+        movie = df.iloc[rng.randrange(len(df))]
+        queries.append(movie['title'] if rng.random() < 0.5 else str(movie['description'])[:120])
+    return queries[:count]
+
+
+def timed(fn, items, repeat: int):
+    """Executa fn sobre cada item `repeat` vezes e retorna (resultados, latências em ms)"""
+    latencies, results = [], []
+    for _ in range(repeat):
+        results = []
+        for item in items:
+            start = time.perf_counter()
+            results.append(fn(item))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def report(name: str, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"  {name:<22} mean {statistics.mean(ordered):8.3f} ms   p50 {statistics.median(ordered):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+# =============================================================================
+# BM25
+# =============================================================================
+
+def bench_bm25(args):
+    """SparseBM25.get_scores vs rank_bm25.BM25Okapi.get_scores"""
+    from rank_bm25 import BM25Okapi
+
+    df, index = load_lexical_index(args)
+    reference = BM25Okapi([doc.split() for doc in index.features])
+    queries = [preprocess_text(q).split() for q in make_queries(df, args.queries)]
+
+    print(f"BM25: {len(df)} documentos, {len(index.bm25.terms)} termos, {len(queries)} queries x {args.repeat}")
+    sparse_scores, sparse_latency = timed(index.bm25.get_scores, queries, args.repeat)
+    reference_scores, reference_latency = timed(reference.get_scores, queries, args.repeat)
+
+    report("rank_bm25", reference_latency)
+    report("SparseBM25", sparse_latency)
+    print(f"  speedup {statistics.mean(reference_latency) / statistics.mean(sparse_latency):.1f}x")
+
+    mismatches = sum(not np.array_equal(a, b) for a, b in zip(sparse_scores, reference_scores))
+    max_diff = max(float(np.abs(a - b).max()) for a, b in zip(sparse_scores, reference_scores))
+    print(f"  scores idênticos: {len(queries) - mismatches}/{len(queries)} (maior diferença {max_diff:.3g})")
+    return mismatches == 0
+
+
+# =============================================================================
+# FUSÃO HÍBRIDA
+# =============================================================================
+
+def bench_fusion(args):
+    """Fusão por candidatos (argpartition) vs normalização + argsort do corpus inteiro"""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    df, index = load_lexical_index(args)
+    signals = []
+    for query in make_queries(df, args.queries):
+        processed = preprocess_text(query)
+        tfidf_scores = cosine_similarity(index.tfidf.transform([processed]), index.tfidf_matrix).flatten()
+        bm25_scores = index.bm25.get_scores(processed.split())
+        signals.append([(tfidf_scores, 0.5), (bm25_scores, 0.5)])
+
+    def argsort_fusion(query_signals):
+        combined = sum(weight * ((s - s.min()) / (s.max() - s.min()) if s.max() > s.min() else 0 * s)
+                       for s, weight in query_signals)
+        top = combined.argsort()[-args.top_n:][::-1]
+        return top, combined[top]
+
+    print(f"Fusão: {len(df)} documentos, {len(signals)} queries x {args.repeat}, top {args.top_n}, profundidade {args.depth}")
+    _, argsort_latency = timed(argsort_fusion, signals, args.repeat)
+    full, full_latency = timed(lambda sig: full_fusion_top_k(sig, args.top_n), signals, args.repeat)
+    fused, fused_latency = timed(lambda sig: fuse_top_k(sig, args.top_n, args.depth), signals, args.repeat)
+
+    report("argsort completo", argsort_latency)
+    report("fusão completa + top_k", full_latency)
+    report("fusão por candidatos", fused_latency)
+
+    mismatches = sum(not (np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1]))
+                     for a, b in zip(fused, full))
+    print(f"  resultados idênticos à fusão completa: {len(signals) - mismatches}/{len(signals)}")
+    return mismatches == 0
+
+
+# =============================================================================
+# ALOCAÇÕES POR REQUISIÇÃO
+# =============================================================================
+
+def allocation_profile(fn, items):
+    """Pico de memória alocada (tracemalloc) e latência de fn para cada item"""
+    fn(items[0])  # aquecimento (caches internos do numpy/scipy)
+    peaks, latencies = [], []
+    for item in items:
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return peaks, latencies
+
+
+def report_allocations(name: str, peaks, latencies):
+    print(f"  {name:<34} pico médio {statistics.mean(peaks):10.1f} KiB   máx {max(peaks):10.1f} KiB"
+          f"   latência média {statistics.mean(latencies):8.3f} ms")
+
+
+def load_embeddings(num_movies: int):
+    """Embeddings SBERT do store do servidor semântico (ou sintéticos, 384 dimensões)"""
+    store = load_store(EMBEDDINGS_STORE_PATH)
+    if store is not None and len(store) == num_movies:
+        return store.dequantize(), f"store {store.dtype}"
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((num_movies, 384), dtype=np.float32), "sintéticos"
+
+
+def bench_alloc(args):
+    """cosine_similarity sobre o corpus vs matriz/embeddings pré-normalizados"""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    df, index = load_lexical_index(args)
+    queries = make_queries(df, args.queries)
+    query_vecs = [index.tfidf.transform([preprocess_text(q)]) for q in queries]
+
+    print(f"TF-IDF: {index.tfidf_matrix.shape}, {index.tfidf_matrix.nnz} não-nulos, {len(queries)} queries")
+    report_allocations("antes: cosine_similarity", *allocation_profile(
+        lambda vec: cosine_similarity(vec, index.tfidf_matrix).flatten(), query_vecs))
+    report_allocations("depois: postings pré-normalizados", *allocation_profile(
+        lambda vec: sparse_dot_scores(index.tfidf_postings, vec), query_vecs))
+
+    raw, source = load_embeddings(len(df))
+    normalized = l2_normalize_rows(raw)
+    rng = np.random.default_rng(1)
+    query_embeddings = [rng.standard_normal((1, raw.shape[1]), dtype=np.float32) for _ in queries]
+
+    print(f"SBERT: {raw.shape} ({source})")
+    report_allocations("antes: cosine_similarity", *allocation_profile(
+        lambda emb: cosine_similarity(emb, raw).flatten(), query_embeddings))
+    report_allocations("depois: GEMV float32 normalizado", *allocation_profile(
+        lambda emb: normalized @ l2_normalize_rows(emb)[0], query_embeddings))
+
+
+# =============================================================================
+# STORE DE EMBEDDINGS
+# =============================================================================
+
+def bench_embeddings(args):
+    """Embeddings float32 vs store float16/int8: memória, latência e recall@10"""
+    df = load_movies(args.data, args.csv)
+    raw, source = load_embeddings(len(df))
+    reference = l2_normalize_rows(raw)
+    rng = np.random.default_rng(1)
+    queries = l2_normalize_rows(rng.standard_normal((args.queries, raw.shape[1]), dtype=np.float32))
+    expected = [set(top_k(reference @ q, 10)[0].tolist()) for q in queries]
+
+    print(f"Embeddings: {reference.shape} ({source}), {args.queries} queries")
+    _, latencies = timed(lambda q: reference @ q, queries, 1)
+    report(f"float32: {reference.nbytes / 2**20:.1f} MiB", latencies)
+    for dtype in ('float16', 'int8'):
+        data, scales = quantize(reference, dtype)
+        store = EmbeddingStore(data, scales, "benchmark", [])
+        nbytes = data.nbytes + (scales.nbytes if scales is not None else 0)
+        results, latencies = timed(store.scores, queries, 1)
+        recall = statistics.mean(len(set(top_k(scores, 10)[0].tolist()) & exp) / 10
+                                 for scores, exp in zip(results, expected))
+        report(f"{dtype}: {nbytes / 2**20:.1f} MiB", latencies)
+        print(f"  {dtype}: recall@10 {recall:.4f}")
+
+
+def clustered_embeddings(rows: int, dim: int = 384, clusters: int = 1000, seed: int = 0) -> np.ndarray:
+    """Embeddings sintéticos agrupados (centros + ruído), normalizados"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    data = centers[rng.integers(0, clusters, rows)] + 1.5 * rng.standard_normal((rows, dim), dtype=np.float32)
+    return l2_normalize_rows(data)
+
+
+def bench_ann(args):
+    """Busca exata vs IVF (nprobe) vs HNSW (ef): latência e recall@10"""
+    if args.synthetic:
+        embeddings, source = clustered_embeddings(args.synthetic), "sintéticos agrupados"
+    else:
+        raw, source = load_embeddings(len(load_movies(args.data, args.csv)))
+        embeddings = l2_normalize_rows(raw)
+    data, scales = quantize(embeddings, 'int8')
+    store = EmbeddingStore(data, scales, "benchmark", [], generation="benchmark")
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(len(embeddings), size=args.queries, replace=False)]
+
+    print(f"ANN: {store.shape} int8 ({source}), {args.queries} queries")
+    exact, latencies = timed(lambda q: ExactSearcher(store).search(q, 10), queries, 1)
+    expected = [set(indices.tolist()) for indices, _ in exact]
+    report("exact", latencies)
+
+    def recall(results):
+        return statistics.mean(len(set(indices.tolist()) & exp) / 10 for (indices, _), exp in zip(results, expected))
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(store)
+    print(f"  IVF: {ivf.nlist} listas, construído em {time.perf_counter() - start:.1f}s")
+    for nprobe in args.nprobe:
+        results, latencies = timed(lambda q: ivf.search(q, 10, nprobe=nprobe), queries, 1)
+        report(f"ivf nprobe={nprobe}", latencies)
+        print(f"  ivf nprobe={nprobe}: recall@10 {recall(results):.4f}")
+
+    if not hnsw_available():
+        print("  hnswlib não instalado; HNSW ignorado")
+        return
+    start = time.perf_counter()
+    hnsw = HNSWIndex.build(store)
+    print(f"  HNSW: construído em {time.perf_counter() - start:.1f}s")
+    for ef in args.ef:
+        results, latencies = timed(lambda q: hnsw.search(q, 10, ef=ef), queries, 1)
+        report(f"hnsw ef={ef}", latencies)
+        print(f"  hnsw ef={ef}: recall@10 {recall(results):.4f}")
+
+
+# =============================================================================
+# ANALISADOR DE TEXTO
+# =============================================================================
+
+def reference_preprocess(text: str, use_lemmatization: bool = True, min_token_length: int = 2) -> str:
+    """Pipeline original (stopwords, NFD e word_tokenize a cada chamada), para comparação"""
+    from nltk import pos_tag
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    from nltk.tokenize import word_tokenize
+    from text_processing import get_wordnet_pos
+
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    text = text.translate(str.maketrans('', '', string.punctuation))
+    try:
+        tokens = word_tokenize(text)
+    except Exception:
+        tokens = text.split()
+    stop_words = set(stopwords.words('english'))
+    tokens = [t for t in tokens if t not in stop_words and len(t) >= min_token_length]
+    if use_lemmatization and tokens:
+        lemmatizer = WordNetLemmatizer()
+        tokens = [lemmatizer.lemmatize(word, get_wordnet_pos(tag)) for word, tag in pos_tag(tokens)]
+    return " ".join(tokens)
+
+
+def bench_analyzer(args):
+    """TextAnalyzer vs pipeline original sobre os textos combinados do catálogo"""
+    df = load_movies(args.data, args.csv)
+    rows = df.head(args.limit).to_dict(orient='records')
+    texts = [combine_features_text(row) for row in rows]
+    queries = [q.lower() for q in make_queries(df, args.limit)]
+
+    analyzer = get_analyzer()
+    print(f"Analisador: {len(texts)} documentos, {len(queries)} queries")
+    for name, items in (("documentos", texts), ("queries", queries)):
+        reference, reference_latency = timed(reference_preprocess, items, 1)
+        lemmatize_tokens([])  # garante o tagger carregado fora da medição
+        current, current_latency = timed(analyzer.process, items, 1)
+        report(f"{name}: original", reference_latency)
+        report(f"{name}: TextAnalyzer", current_latency)
+        mismatches = sum(a != b for a, b in zip(reference, current))
+        print(f"  {name}: saídas idênticas {len(items) - mismatches}/{len(items)}")
+        if mismatches:
+            return False
+    return True
+
+
+# =============================================================================
+# SERIALIZAÇÃO DAS RESPOSTAS
+# =============================================================================
+
+def bench_payloads(args):
+    """JSON pré-serializado (payloads.py) vs to_dict + jsonable_encoder + json.dumps por requisição"""
+    import json
+    import pandas as pd
+    from fastapi.encoders import jsonable_encoder
+    from payloads import MoviePayloads
+
+    df = load_movies(args.data, args.csv)
+    payloads = MoviePayloads.from_frame(df)
+    rng = np.random.default_rng(42)
+    requests = [rng.choice(len(df), size=min(args.top_n, len(df)), replace=False) for _ in range(args.requests)]
+
+    def reference(rows):
+        movies = []
+        for rank, row in enumerate(rows):
+            movie = df.iloc[row].to_dict()
+            movie['score'] = 1.0 / (rank + 1)
+            for key, value in movie.items():
+                if not isinstance(value, list) and pd.isna(value):
+                    movie[key] = ""
+            movies.append(movie)
+        return json.dumps(jsonable_encoder(movies), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def pre_serialized(rows):
+        return payloads.render((payloads.hit(row, score=1.0 / (rank + 1)) for rank, row in enumerate(rows)),
+                               ('score',)).data
+
+    print(f"Respostas: {len(df)} filmes, {len(requests)} requisições x {args.repeat}, top {args.top_n}")
+    expected, reference_latency = timed(reference, requests, args.repeat)
+    rendered, payload_latency = timed(pre_serialized, requests, args.repeat)
+
+    report("to_dict + encoder", reference_latency)
+    report("pré-serializado", payload_latency)
+    print(f"  speedup {statistics.mean(reference_latency) / statistics.mean(payload_latency):.1f}x")
+
+    mismatches = sum(json.loads(a) != json.loads(b) for a, b in zip(rendered, expected))
+    print(f"  respostas idênticas: {len(requests) - mismatches}/{len(requests)}")
+    return mismatches == 0
+
+
+# =============================================================================
+# TEMPO DE IMPORT
+# =============================================================================
+
+# Orçamento (ms) do import de cada ponto de entrada, medido com `python -X importtime`
+IMPORT_BUDGETS_MS = {
+    'main': 800,
+    'main_enhanced': 800,
+    'main_semantic': 800,
+    'build_index': 600,
+}
+
+# Bibliotecas pesadas que só os motores que as usam importam (na carga em segundo plano)
+LAZY_MODULES = ('nltk', 'sklearn', 'torch', 'sentence_transformers', 'rank_bm25', 'onnxruntime', 'hnswlib')
+
+
+def import_profile(module: str):
+    """(total em ms, [(ms acumulados, pacote)] dos imports diretos, módulos importados)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=Path(__file__).resolve().parent, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} falhou:\n{result.stderr[-2000:]}")
+
+    total, direct, names = 0.0, [], set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        names.add(name.split('.')[0])
+        if name == module and depth == 0:
+            total = int(cumulative) / 1000
+        elif depth == 1:
+            direct.append((int(cumulative) / 1000, name))
+    return total, sorted(direct, reverse=True), names
+
+
+def bench_imports(args):
+    """Tempo de import de cada ponto de entrada contra o orçamento (melhor de --repeat execuções)"""
+    ok = True
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        total, direct, names = min(runs, key=lambda run: run[0])
+        budget = IMPORT_BUDGETS_MS.get(module)
+        eager = [name for name in LAZY_MODULES if name in names]
+        within = budget is None or total <= budget
+        ok = ok and within and not eager
+
+        status = "sem orçamento" if budget is None else f"orçamento {budget} ms: {'OK' if within else 'EXCEDIDO'}"
+        print(f"{module}: {total:.0f} ms ({status})")
+        for cumulative, name in direct[:args.top]:
+            print(f"  {cumulative:8.1f} ms  {name}")
+        if eager:
+            print(f"  importados no import do módulo (deveriam ser preguiçosos): {', '.join(eager)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do backend")
+    parser.add_argument('--data', default=DATA_PATH, help="catálogo Arrow processado")
+    parser.add_argument('--csv', default=CSV_DATA_PATH, help="catálogo CSV legado (fallback)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bm25 = subparsers.add_parser('bm25', help="BM25 esparso vs rank_bm25")
+    bm25.add_argument('--queries', type=int, default=200)
+    bm25.add_argument('--repeat', type=int, default=3)
+    bm25.set_defaults(func=bench_bm25)
+
+    fusion = subparsers.add_parser('fusion', help="fusão por candidatos vs fusão completa")
+    fusion.add_argument('--queries', type=int, default=200)
+    fusion.add_argument('--repeat', type=int, default=3)
+    fusion.add_argument('--top-n', type=int, default=20)
+    fusion.add_argument('--depth', type=int, default=100)
+    fusion.set_defaults(func=bench_fusion)
+
+    alloc = subparsers.add_parser('alloc', help="alocações por requisição no scoring TF-IDF/SBERT")
+    alloc.add_argument('--queries', type=int, default=100)
+    alloc.set_defaults(func=bench_alloc)
+
+    analyzer = subparsers.add_parser('analyzer', help="TextAnalyzer vs pipeline original de pré-processamento")
+    analyzer.add_argument('--limit', type=int, default=2000)
+    analyzer.set_defaults(func=bench_analyzer)
+
+    embeddings = subparsers.add_parser('embeddings', help="store float16/int8 vs embeddings float32")
+    embeddings.add_argument('--queries', type=int, default=200)
+    embeddings.set_defaults(func=bench_embeddings)
+
+    ann = subparsers.add_parser('ann', help="busca SBERT exata vs IVF/HNSW")
+    ann.add_argument('--queries', type=int, default=200)
+    ann.add_argument('--synthetic', type=int, default=0, help="usa N embeddings sintéticos agrupados")
+    ann.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32])
+    ann.add_argument('--ef', type=int, nargs='+', default=[32, 64, 128])
+    ann.set_defaults(func=bench_ann)
+
+    payloads = subparsers.add_parser('payloads', help="respostas pré-serializadas vs to_dict + jsonable_encoder")
+    payloads.add_argument('--requests', type=int, default=500)
+    payloads.add_argument('--repeat', type=int, default=3)
+    payloads.add_argument('--top-n', type=int, default=20)
+    payloads.set_defaults(func=bench_payloads)
+
+    imports = subparsers.add_parser('imports', help="tempo de import dos pontos de entrada (-X importtime)")
+    imports.add_argument('--modules', nargs='+', default=list(IMPORT_BUDGETS_MS))
+    imports.add_argument('--repeat', type=int, default=3)
+    imports.add_argument('--top', type=int, default=8, help="imports diretos mais lentos listados")
+    imports.set_defaults(func=bench_imports)
+
+    args = parser.parse_args()
+    if args.command not in ('imports', 'payloads'):
+        require_resources(LEMMATIZE_RESOURCES)
+
+    ok = args.func(args)
+    raise SystemExit(0 if ok in (None, True) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Build-index
+===========
+
+Gera offline o índice lexical versionado (features processadas, TF-IDF e
+BM25) usado pelos servidores na inicialização.
+
+Uso:
+    python backend/build_index.py                   # perfil 'lexical' (main_enhanced / main_semantic)
+    python backend/build_index.py --profile basic   # perfil do main.py
+    python backend/build_index.py --workers 4       # limita o pool de pré-processamento
+    python backend/build_index.py --verify          # confere o SHA-256 da versão CURRENT, sem reconstruir
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+from catalog import catalog_source, load_movies
+from index_store import INDEX_PROFILES, INDEX_ROOT, build_index, file_sha256, load_index, write_index
+from nltk_resources import required_resources, require_resources
+from shared_artifacts import build_lock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATA_PATH = "data/processed_movies.arrow"
+CSV_DATA_PATH = "data/processed_movies.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o índice lexical versionado")
+    parser.add_argument('--profile', choices=sorted(INDEX_PROFILES), default='lexical')
+    parser.add_argument('--data', default=DATA_PATH, help="catálogo Arrow processado")
+    parser.add_argument('--csv', default=CSV_DATA_PATH, help="catálogo CSV legado (fallback)")
+    parser.add_argument('--out', default=INDEX_ROOT, help="diretório raiz dos índices")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processos no pré-processamento (padrão: todos os núcleos)")
+    parser.add_argument('--verify', action='store_true',
+                        help="confere o SHA-256 de cada arquivo da versão CURRENT (sai com 1 se não conferir)")
+    args = parser.parse_args()
+
+    if args.verify:
+        source = catalog_source(args.data, args.csv)
+        index = load_index(args.profile, file_sha256(source), args.out, verify_checksums=True)
+        if index is None:
+            logger.error(f"Índice '{args.profile}' ausente, desatualizado ou corrompido em {args.out}")
+            sys.exit(1)
+        logger.info(f"Índice '{args.profile}' {index.version}: checksums conferem")
+        return
+
+    # Mesmos recursos NLTK que os servidores usam no pré-processamento (sem download)
+    require_resources(required_resources(INDEX_PROFILES[args.profile]['analyzer']['use_lemmatization']))
+
+    source = catalog_source(args.data, args.csv)
+    df = load_movies(args.data, args.csv)
+    logger.info(f"Catálogo: {source} ({len(df)} filmes)")
+
+    start = time.perf_counter()
+    index = build_index(df, args.profile, workers=args.workers)
+    # Mesmo lock dos servidores: publicação e limpeza de versões não se cruzam com outro build
+    with build_lock(Path(args.out) / args.profile):
+        path = write_index(index, df['id'], file_sha256(source), args.out)
+    logger.info(f"Índice '{args.profile}' gravado em {path} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Índices de catálogo pré-computados
+==================================
+
+Estruturas montadas uma única vez no carregamento dos dados para servir os
+endpoints de navegação (/movies, /genres, /movies/by-genre/{genre}) sem
+varrer, reordenar nem re-parsear o DataFrame a cada requisição.
+"""
+
+import ast
+import hashlib
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from pagination import next_cursor
+from payloads import MoviePayloads, RawJSON, dumps
+
+# Colunas que contêm listas de strings
+LIST_COLUMNS = ('genre', 'cast', 'keywords')
+
+
+def parse_list_field(val) -> List[str]:
+    """Converte um campo de lista (lista real ou repr em string) para lista"""
+    if isinstance(val, list):
+        return val
+    if isinstance(val, str) and val.startswith('['):
+        try:
+            parsed = ast.literal_eval(val)
+            if isinstance(parsed, list):
+                return parsed
+        except (ValueError, SyntaxError):
+            pass
+    return []
+
+
+def catalog_source(arrow_path: str, csv_path: str) -> str:
+    """Arquivo de catálogo efetivamente usado por load_movies"""
+    return arrow_path if os.path.exists(arrow_path) else csv_path
+
+
+def load_movies(arrow_path: str, csv_path: str) -> pd.DataFrame:
+    """
+    Carrega o catálogo processado.
+
+    Prefere o arquivo Arrow IPC gerado pelo data_processor, lido via
+    memory-map (colunas numéricas sem cópia, compartilhadas entre workers, e
+    listas nativas). O CSV legado
+    continua aceito: suas listas em repr são convertidas uma única vez aqui,
+    e não a cada requisição.
+    """
+    if catalog_source(arrow_path, csv_path) == arrow_path:
+        table = feather.read_table(arrow_path, memory_map=True)
+        list_columns = [field.name for field in table.schema if pa.types.is_list(field.type)]
+        # split_blocks: uma coluna por bloco, sem consolidar (e copiar) os arrays do memory-map
+        df = table.drop_columns(list_columns).to_pandas(split_blocks=True)
+        for name in list_columns:
+            df[name] = table.column(name).to_pylist()
+        # fillna só onde há nulos: nas demais colunas o array do memory-map é mantido
+        for name in df.columns[df.isna().any()]:
+            df[name] = df[name].fillna('')
+        return df[table.column_names]
+
+    df = pd.read_csv(csv_path).fillna('')
+    for name in LIST_COLUMNS:
+        if name in df.columns:
+            df[name] = df[name].apply(parse_list_field)
+    return df
+
+
+def build_id_index(df: pd.DataFrame, alive: Optional[np.ndarray] = None) -> Dict[int, int]:
+    """Mapeia o id do filme (TMDB) para a posição da linha no DataFrame (só linhas vivas, se `alive`)"""
+    if df.empty:
+        return {}
+    if alive is None:
+        return {int(movie_id): row for row, movie_id in enumerate(df['id'].tolist())}
+    return {int(movie_id): row for row, movie_id in enumerate(df['id'].tolist()) if alive[row]}
+
+
+def catalog_fingerprint(df: pd.DataFrame, text_column: str = 'processed_features') -> str:
+    """Hash de ids + textos do catálogo, usado para validar artefatos derivados salvos em disco"""
+    digest = hashlib.sha1()
+    for movie_id, text in zip(df['id'].tolist(), df[text_column].tolist()):
+        digest.update(f"{movie_id}\0{text}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def popularity_order(df: pd.DataFrame) -> np.ndarray:
+    """Posições das linhas em ordem decrescente de popularidade (estável, como nlargest)"""
+    popularity = pd.to_numeric(df['popularity'], errors='coerce').fillna(0).to_numpy()
+    return np.argsort(-popularity, kind='stable')
+
+
+def build_popularity_index(df: pd.DataFrame, alive: Optional[np.ndarray] = None) -> np.ndarray:
+    """Posições das linhas vivas em ordem decrescente de popularidade (páginas do /movies são slices)"""
+    if df.empty:
+        return np.zeros(0, dtype=np.int64)
+    order = popularity_order(df).astype(np.int64, copy=False)
+    return order if alive is None else order[alive[order]]
+
+
+def build_genre_index(df: pd.DataFrame, alive: Optional[np.ndarray] = None,
+                      order: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Monta o índice invertido gênero -> posições de linha no DataFrame.
+
+    Cada lista de postings já sai ordenada por popularidade decrescente, de
+    modo que o top-N de um gênero é apenas um slice. Com `alive`, linhas
+    apagadas ou substituídas (tombstones) ficam de fora; `order` reaproveita
+    a ordem de build_popularity_index, se já calculada.
+    """
+    if df.empty:
+        return {}
+
+    genres = df['genre'].tolist()
+    postings: Dict[str, List[int]] = {}
+
+    # Percorrer na ordem de popularidade mantém as listas ordenadas
+    if order is None:
+        order = build_popularity_index(df, alive)
+    for row in order:
+        for genre in parse_list_field(genres[row]):
+            postings.setdefault(genre, []).append(int(row))
+
+    return {genre: np.asarray(rows, dtype=np.int64) for genre, rows in postings.items()}
+
+
+def build_genre_rows(payloads: MoviePayloads, genre_index: Dict[str, np.ndarray], genres: List[str],
+                     limit: int, ids: Sequence[int], fields: Optional[Sequence[str]] = None) -> RawJSON:
+    """
+    Monta as linhas por gênero da home: top-`limit` filmes de cada gênero
+    (só com `fields`, se dado) e o cursor da página seguinte de cada um, para
+    /movies/by-genre/{genre}. `ids` é o id do filme de cada linha.
+
+    Os filmes vêm do JSON pré-serializado de cada linha (payloads.py), então
+    um filme presente em vários gêneros não é convertido de novo.
+    """
+    return RawJSON(dumps([
+        {"genre": genre, "movies": payloads.rows(genre_index[genre][:limit], fields),
+         "next_cursor": next_cursor(genre_index[genre], limit, ids)}
+        for genre in genres if genre in genre_index
+    ]))
@@ -1,6 +1,28 @@
 import pandas as pd
 import ast
+import argparse
+import os
 import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+OUTPUT_PATH = 'data/processed_movies.arrow'
+CSV_OUTPUT_PATH = 'data/processed_movies.csv'
+
+# Typed columnar schema: native list<string> columns and compact integer dtypes
+MOVIES_SCHEMA = pa.schema([
+    ('id', pa.int32()),
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('genre', pa.list_(pa.string())),
+    ('image_url', pa.string()),
+    ('director', pa.string()),
+    ('cast', pa.list_(pa.string())),
+    ('keywords', pa.list_(pa.string())),
+    ('vote_average', pa.float64()),
+    ('vote_count', pa.int32()),
+    ('popularity', pa.float64()),
+])
 
 def parse_list(x):
     try:
@@ -38,7 +60,26 @@ def get_production_companies(companies_list):
         return [c.get('name') for c in companies_list]
     return []
 
-def process_data():
+def clean_list(values):
+    # Drop missing names so the column is a clean list<string>
+    return [v for v in values if isinstance(v, str)]
+
+def save_movies(df, path):
+    """Write the processed movies as an uncompressed Arrow IPC file (memory-mappable)"""
+    df = df.copy()
+    for col in ('genre', 'cast', 'keywords'):
+        df[col] = df[col].apply(clean_list)
+    df['vote_count'] = df['vote_count'].astype('int32')
+    df['id'] = df['id'].astype('int32')
+
+    table = pa.Table.from_pandas(df, schema=MOVIES_SCHEMA, preserve_index=False)
+    # Write next to the target and rename: running servers keep their memory-map
+    # of the old file (hot reload) instead of seeing it rewritten in place
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+def process_data(export_csv=False):
     print("Loading datasets...")
     # Load movies metadata
     meta = pd.read_csv('data/extracted/movies_metadata.csv', low_memory=False, on_bad_lines='skip')
@@ -141,10 +182,20 @@ def process_data():
     final_df['genre'] = final_df['genre'].apply(lambda x: x if isinstance(x, list) else [])
     final_df['cast'] = final_df['cast'].apply(lambda x: x if isinstance(x, list) else [])
     final_df['keywords'] = final_df['keywords'].apply(lambda x: x if isinstance(x, list) else [])
+    final_df['title'] = final_df['title'].fillna('')
+    final_df['vote_average'] = pd.to_numeric(final_df['vote_average'], errors='coerce').fillna(0)
+    final_df['vote_count'] = pd.to_numeric(final_df['vote_count'], errors='coerce').fillna(0)
+    final_df['popularity'] = pd.to_numeric(final_df['popularity'], errors='coerce').fillna(0)
 
     print(f"Saving {len(final_df)} processed movies...")
-    final_df.to_csv('data/processed_movies.csv', index=False)
+    save_movies(final_df, OUTPUT_PATH)
+    if export_csv:
+        final_df.to_csv(f"{CSV_OUTPUT_PATH}.tmp", index=False)
+        os.replace(f"{CSV_OUTPUT_PATH}.tmp", CSV_OUTPUT_PATH)
     print("Done!")
 
 if __name__ == "__main__":
-    process_data()
+    parser = argparse.ArgumentParser(description="Process the TMDB datasets into the movie catalog")
+    parser.add_argument('--csv', action='store_true', help=f"also export {CSV_OUTPUT_PATH}")
+    args = parser.parse_args()
+    process_data(export_csv=args.csv)
@@ -0,0 +1,242 @@
+"""
+Store de embeddings
+===================
+
+Embeddings SBERT do catálogo gravados como .npy e abertos com memory-map,
+de modo que todos os workers compartilham a mesma cópia no page cache:
+
+    data/sbert_embeddings/
+        manifest.json             -> modelo, dtype, dimensão, hash por filme
+        embeddings-<geração>.npy  -> vetores L2-normalizados (float16 ou int8)
+        scales-<geração>.npy      -> escala por linha (apenas int8)
+
+Cada linha é associada ao hash do texto do filme. Ao sincronizar com o
+catálogo, apenas filmes novos ou com texto alterado são codificados de novo;
+as demais linhas são copiadas já quantizadas. Uma troca de modelo ou de dtype
+invalida o store inteiro.
+
+Os arquivos de cada geração nunca são sobrescritos: o manifest é trocado
+atomicamente e processos que ainda mapeiam a geração anterior continuam
+lendo arquivos válidos. Com vários workers, apenas um sincroniza o store
+(lock entre processos); os demais abrem a geração gravada.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from neighbors import l2_normalize_rows
+from shared_artifacts import build_lock
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ('float16', 'int8')
+DEFAULT_DTYPE = 'float16'
+# Linhas convertidas para float32 por vez ao pontuar
+DEFAULT_SCORE_CHUNK = 8192
+
+
+def content_hash(text: str) -> str:
+    """Hash curto do texto usado para gerar o embedding de um filme"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def quantize(embeddings: np.ndarray, dtype: str):
+    """Converte embeddings float32 normalizados para o dtype do store (dados, escalas)"""
+    if dtype == 'float16':
+        return embeddings.astype(np.float16), None
+    if dtype == 'int8':
+        # Escala simétrica por linha: o maior valor absoluto vira 127
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return data, scales.astype(np.float32)
+    raise ValueError(f"dtype de embeddings não suportado: {dtype}")
+
+
+class EmbeddingStore:
+    """Embeddings quantizados (memory-mapped) com pontuação em blocos"""
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray], model_name: str,
+                 hashes: Sequence[str], generation: Optional[str] = None):
+        self.data = data
+        self.scales = scales
+        self.model_name = model_name
+        self.hashes = list(hashes)
+        self.generation = generation
+
+    @property
+    def dtype(self) -> str:
+        return self.data.dtype.name
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def dequantize(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Linhas [start, stop) em float32"""
+        block = self.data[start:stop].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:stop, None]
+        return block
+
+    def scores(self, query: np.ndarray, chunk_size: int = DEFAULT_SCORE_CHUNK) -> np.ndarray:
+        """
+        Produto escalar de uma query normalizada (float32) com todas as linhas.
+
+        A conversão para float32 é feita em blocos, então a memória extra por
+        consulta é limitada a `chunk_size` linhas, e o GEMV usa BLAS.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        n = len(self)
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            np.dot(self.data[start:stop].astype(np.float32), query, out=out[start:stop])
+            if self.scales is not None:
+                out[start:stop] *= self.scales[start:stop]
+        return out
+
+    def row_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Produto escalar da query apenas com as linhas `rows` (candidatos de um índice ANN)"""
+        scores = self.data[rows].astype(np.float32) @ np.asarray(query, dtype=np.float32)
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+
+
+# =============================================================================
+# LEITURA E ESCRITA
+# =============================================================================
+
+def load_store(path) -> Optional[EmbeddingStore]:
+    """Abre o store (memory-map) ou retorna None se ausente/ilegível"""
+    path = Path(path)
+    if not (path / 'manifest.json').exists():
+        return None
+    try:
+        with open(path / 'manifest.json', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != STORE_FORMAT_VERSION:
+            return None
+        data = np.load(path / manifest['files']['embeddings'], mmap_mode='r')
+        scales = None
+        if manifest['files'].get('scales'):
+            scales = np.load(path / manifest['files']['scales'], mmap_mode='r')
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Store de embeddings ilegível em {path}: {e}")
+        return None
+
+    if data.shape != (len(manifest['hashes']), manifest['dim']) or data.dtype.name != manifest['dtype']:
+        logger.warning(f"Store de embeddings em {path} não confere com o manifest; ignorando")
+        return None
+    return EmbeddingStore(data, scales, manifest['model_name'], manifest['hashes'], manifest['generation'])
+
+
+def write_store(path, data: np.ndarray, scales: Optional[np.ndarray], model_name: str,
+                hashes: Sequence[str]) -> EmbeddingStore:
+    """Grava uma nova geração e troca o manifest atomicamente"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    generation = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    files = {'embeddings': f"embeddings-{generation}.npy"}
+    np.save(path / files['embeddings'], data)
+    if scales is not None:
+        files['scales'] = f"scales-{generation}.npy"
+        np.save(path / files['scales'], scales)
+
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'generation': generation,
+        'model_name': model_name,
+        'dtype': data.dtype.name,
+        'dim': int(data.shape[1]),
+        'files': files,
+        'hashes': list(hashes),
+    }
+    tmp_manifest = path / f".manifest-{os.getpid()}.json"
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, path / 'manifest.json')
+
+    # Gerações antigas: quem ainda as mapeia mantém o arquivo aberto até fechar
+    for old in path.glob('*.npy'):
+        if old.name not in files.values():
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    return load_store(path)
+
+
+def sync_store(path, texts: Sequence[str], model_name: str,
+               encode: Callable[[List[str]], np.ndarray], dtype: str = DEFAULT_DTYPE) -> EmbeddingStore:
+    """
+    Store alinhado com `texts` (uma linha por filme, na ordem do catálogo).
+
+    Reaproveita as linhas cujo hash de texto já está no store e chama
+    `encode` apenas para os textos novos ou alterados.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"dtype de embeddings não suportado: {dtype}")
+    hashes = [content_hash(text) for text in texts]
+
+    existing = load_store(path)
+    if existing is not None and (existing.model_name, existing.dtype, existing.hashes) == (model_name, dtype, hashes):
+        logger.info(f"Embeddings carregados de {path}: {existing.shape} ({dtype})")
+        return existing
+
+    with build_lock(path):
+        # Outro worker pode ter sincronizado o store enquanto este aguardava
+        return _sync_locked(path, texts, hashes, model_name, encode, dtype)
+
+
+def _sync_locked(path, texts: Sequence[str], hashes: List[str], model_name: str,
+                 encode: Callable[[List[str]], np.ndarray], dtype: str) -> EmbeddingStore:
+    existing = load_store(path)
+    if existing is not None and (existing.model_name != model_name or existing.dtype != dtype):
+        logger.info(f"Store de embeddings gerado com {existing.model_name}/{existing.dtype}; recodificando tudo")
+        existing = None
+    if existing is not None and existing.hashes == hashes:
+        logger.info(f"Embeddings carregados de {path}: {existing.shape} ({dtype})")
+        return existing
+
+    known = {} if existing is None else {h: row for row, h in enumerate(existing.hashes)}
+    reuse = [(row, known[h]) for row, h in enumerate(hashes) if h in known]
+    missing = [row for row, h in enumerate(hashes) if h not in known]
+    logger.info(f"Embeddings: {len(reuse)} reaproveitados, {len(missing)} a codificar")
+
+    encoded = None
+    if missing:
+        encoded = l2_normalize_rows(encode([texts[row] for row in missing]))
+    dim = encoded.shape[1] if encoded is not None else existing.shape[1]
+
+    data = np.empty((len(texts), dim), dtype=np.dtype(dtype))
+    scales = np.empty(len(texts), dtype=np.float32) if dtype == 'int8' else None
+    if reuse:
+        rows, old_rows = map(np.asarray, zip(*reuse))
+        data[rows] = existing.data[old_rows]
+        if scales is not None:
+            scales[rows] = existing.scales[old_rows]
+    if missing:
+        new_data, new_scales = quantize(encoded, dtype)
+        data[missing] = new_data
+        if scales is not None:
+            scales[missing] = new_scales
+
+    store = write_store(path, data, scales, model_name, hashes)
+    logger.info(f"Embeddings salvos em {path}: {store.shape} ({dtype})")
+    return store
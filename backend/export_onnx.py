@@ -0,0 +1,149 @@
+"""
+Export ONNX
+===========
+
+Exporta o modelo SBERT para ONNX (e, opcionalmente, uma versão com
+quantização dinâmica int8) em `data/onnx/<modelo>/`, para o servidor
+semântico codificar sem torch. Ao final compara os embeddings do ONNX com
+os do SentenceTransformer (torch) e falha se a similaridade mínima ficar
+abaixo do limite.
+
+Requer, apenas neste passo: sentence-transformers, torch, onnx e onnxruntime.
+
+Uso:
+    python backend/export_onnx.py                 # float32
+    python backend/export_onnx.py --quantize      # float32 + int8
+    python backend/export_onnx.py --check-only    # só a verificação de paridade
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from onnx_encoder import (CONFIG_FILE, MODEL_FILE, QUANTIZED_MODEL_FILE, OnnxSentenceEncoder,
+                          parity_report)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+OUTPUT_ROOT = "data/onnx"
+DATA_PATH = "data/processed_movies.arrow"
+CSV_DATA_PATH = "data/processed_movies.csv"
+OPSET_VERSION = 14
+
+# Similaridade cosseno mínima aceita entre ONNX e torch
+PARITY_THRESHOLD = 0.999
+QUANTIZED_PARITY_THRESHOLD = 0.98
+
+PARITY_SAMPLE_TEXTS = [
+    "superhero movies with action",
+    "a detective investigates a murder in a small town",
+    "animated family adventure with talking animals",
+    "romantic comedy set in Paris",
+    "Christopher Nolan",
+    "space exploration sci-fi with time travel and black holes",
+]
+
+
+def export(model, out_dir: Path):
+    """Transformer em ONNX (eixos de batch e sequência dinâmicos) + tokenizador + config"""
+    import torch
+
+    transformer, pooling = model[0], model[1]
+    features = model.tokenize(PARITY_SAMPLE_TEXTS[:2])
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in features]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+
+    auto_model = transformer.auto_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            auto_model,
+            tuple(features[name] for name in input_names),
+            str(out_dir / MODEL_FILE),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=OPSET_VERSION,
+            do_constant_folding=True,
+        )
+
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(str(out_dir))
+    config = {
+        'model_name': MODEL_NAME,
+        'pooling': pooling.get_pooling_mode_str(),
+        'dimension': model.get_sentence_embedding_dimension(),
+        'max_seq_length': model.max_seq_length,
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id,
+        'opset_version': OPSET_VERSION,
+    }
+    with open(out_dir / CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"Modelo exportado em {out_dir / MODEL_FILE}")
+
+
+def quantize(out_dir: Path):
+    """Quantização dinâmica int8 dos pesos (ativações continuam em float)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(out_dir / MODEL_FILE), str(out_dir / QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+    logger.info(f"Modelo int8 gravado em {out_dir / QUANTIZED_MODEL_FILE}")
+
+
+def parity_texts(args, limit: int = 200):
+    """Textos de exemplo + títulos/descrições do catálogo, se disponível"""
+    texts = list(PARITY_SAMPLE_TEXTS)
+    try:
+        from catalog import load_movies
+        df = load_movies(args.data, args.csv).head(limit)
+        texts += [f"{row.title}. {row.description}" for row in df.itertuples()]
+    except (FileNotFoundError, AttributeError):
+        pass
+    return texts
+
+
+def check_parity(model, out_dir: Path, args) -> bool:
+    texts = parity_texts(args)
+    ok = True
+    variants = [(False, PARITY_THRESHOLD)]
+    if (out_dir / QUANTIZED_MODEL_FILE).exists():
+        variants.append((True, QUANTIZED_PARITY_THRESHOLD))
+    for quantized, threshold in variants:
+        report = parity_report(model, OnnxSentenceEncoder(out_dir, quantized=quantized), texts)
+        name = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        passed = report['min_cosine'] >= threshold
+        ok = ok and passed
+        logger.info(f"Paridade {name}: cosseno mínimo {report['min_cosine']:.6f}, médio {report['mean_cosine']:.6f} "
+                    f"em {report['texts']} textos (limite {threshold}) -> {'OK' if passed else 'FALHOU'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo SBERT para ONNX")
+    parser.add_argument('--out', default=OUTPUT_ROOT, help="diretório raiz dos modelos ONNX")
+    parser.add_argument('--quantize', action='store_true', help="gera também a versão int8 (quantização dinâmica)")
+    parser.add_argument('--check-only', action='store_true', help="apenas compara ONNX e torch")
+    parser.add_argument('--data', default=DATA_PATH, help="catálogo usado nos textos de paridade")
+    parser.add_argument('--csv', default=CSV_DATA_PATH, help="catálogo CSV legado (fallback)")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(MODEL_NAME, device='cpu')
+    out_dir = Path(args.out) / MODEL_NAME
+    if not args.check_only:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        export(model, out_dir)
+        if args.quantize:
+            quantize(out_dir)
+
+    if not check_parity(model, out_dir, args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
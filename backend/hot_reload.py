@@ -0,0 +1,168 @@
+"""
+Recarga do catálogo sem downtime
+================================
+
+Tudo o que depende do catálogo (DataFrame, índice lexical, embeddings,
+vizinhos) fica em um único objeto, `ServingState`, nunca alterado depois de
+publicado. Cada requisição lê a referência uma vez no início e usa só esse
+objeto até o fim: uma recarga nunca mistura versões dentro da requisição, e
+o estado antigo é liberado quando a última requisição que o usa termina.
+
+`StateHolder.reload()` constrói o novo estado em uma thread de fundo, com o
+antigo servindo normalmente, e troca a referência de uma vez (a atribuição
+de um atributo é atômica em Python). Só uma recarga roda por vez. Alterações
+incrementais (segments.py) publicam estados sob `StateHolder.lock`; o
+`catch_up` reaplica, antes da troca, as que chegaram durante a reconstrução.
+
+`CatalogWatcher` compara periodicamente mtime e tamanho dos arquivos do
+catálogo com os do estado carregado e dispara a recarga quando mudam e
+permanecem iguais por um ciclo (um arquivo ainda sendo gravado não dispara).
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATCH_INTERVAL = 5.0  # segundos
+
+Signature = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+def file_signature(paths: Sequence[str]) -> Signature:
+    """(caminho, mtime_ns, tamanho) de cada arquivo; None nos ausentes"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class ServingState:
+    """Estado de uma versão do catálogo; derivado por cópia (`evolve`), nunca alterado no lugar"""
+
+    def evolve(self, **changes) -> 'ServingState':
+        """Cópia rasa com os atributos de `changes` substituídos"""
+        state = copy.copy(self)
+        for name, value in changes.items():
+            if not hasattr(state, name):
+                raise AttributeError(f"{type(self).__name__} não tem o campo {name!r}")
+            setattr(state, name, value)
+        return state
+
+
+class StateHolder:
+    """Referência única para o estado servido, trocada atomicamente"""
+
+    def __init__(self, initial: ServingState, on_swap: Optional[Callable[[ServingState], None]] = None,
+                 catch_up: Optional[Callable[[ServingState], ServingState]] = None):
+        self.current = initial
+        self._on_swap = on_swap
+        self._catch_up = catch_up
+        # Serializa as trocas que partem do estado atual (alterações incrementais e fim da recarga)
+        self.lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self.reloading = False
+        self.reloads = 0
+        self.failures = 0
+        self.last_trigger: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_reload_at: Optional[str] = None
+        self.last_duration_s: Optional[float] = None
+
+    def swap(self, state: ServingState):
+        """Publica `state`; requisições já iniciadas continuam com o estado que leram"""
+        self.current = state
+        if self._on_swap is not None:
+            self._on_swap(state)
+
+    def reload(self, build: Callable[[], ServingState], trigger: str = "admin") -> bool:
+        """Reconstrói o estado em segundo plano; False se já houver uma recarga em andamento"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+        self.last_trigger = trigger
+        thread = threading.Thread(target=self._run, args=(build, trigger), name="catalog-reload", daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, build: Callable[[], ServingState], trigger: str):
+        started_at = time.monotonic()
+        logger.info(f"Recarregando catálogo ({trigger})...")
+        try:
+            state = build()
+            with self.lock:
+                if self._catch_up is not None:
+                    state = self._catch_up(state)
+                self.swap(state)
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+            logger.info(f"Catálogo recarregado em {time.monotonic() - started_at:.1f}s")
+        except Exception as e:
+            # O estado anterior continua servindo
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Erro ao recarregar o catálogo: {e}")
+        finally:
+            self.last_duration_s = round(time.monotonic() - started_at, 3)
+            self.reloading = False
+            self._reload_lock.release()
+
+    def stats(self) -> Dict:
+        return {
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_trigger": self.last_trigger,
+            "last_reload_at": self.last_reload_at,
+            "last_duration_s": self.last_duration_s,
+            "last_error": self.last_error,
+        }
+
+
+class CatalogWatcher:
+    """Dispara `on_change` quando os arquivos diferem da assinatura carregada e se estabilizam"""
+
+    def __init__(self, paths: Sequence[str], loaded_signature: Callable[[], Optional[Signature]],
+                 on_change: Callable[[], bool], interval: float = DEFAULT_WATCH_INTERVAL):
+        self.paths = list(paths)
+        self.loaded_signature = loaded_signature
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self._run, name="catalog-watch", daemon=True)
+        self._thread.start()
+        logger.info(f"Monitorando {', '.join(self.paths)} a cada {self.interval}s")
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            current = file_signature(self.paths)
+            loaded = self.loaded_signature()
+            if loaded is None or current == loaded:
+                pending = None
+            elif current != pending:
+                # Mudou desde o último ciclo: espera estabilizar antes de recarregar
+                pending = current
+            elif self.on_change():
+                pending = None
+            # Recarga já em andamento: tenta de novo no próximo ciclo
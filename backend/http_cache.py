@@ -0,0 +1,189 @@
+"""
+Cache HTTP dos endpoints de catálogo
+====================================
+
+/movies, /genres, /movies/by-genre e /movies/{id}/similar só mudam quando
+muda a versão servida (recarga, merge ou alteração incremental). Para eles:
+
+- ETag forte derivado da versão e dos parâmetros da requisição: um
+  `If-None-Match` que casa é respondido com 304 sem montar o corpo;
+- `Cache-Control: public, max-age=N`: o navegador reaproveita a resposta por
+  N segundos e depois revalida com o ETag;
+- corpo guardado já serializado (ResultCache, invalidado pela versão) e
+  comprimido uma única vez por codificação (brotli e gzip; só gzip se o
+  pacote `brotli` do requirements.txt faltar), escolhida pelo `Accept-Encoding`.
+
+Cada codificação tem o próprio ETag (sufixo `-gzip`/`-br`), como pede a
+semântica de ETag forte; na revalidação qualquer variante da mesma versão
+casa.
+"""
+
+import gzip
+import hashlib
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from starlette.responses import Response
+
+from payloads import dumps
+from result_cache import ResultCache
+
+try:
+    import brotli
+except ImportError:  # Instalação sem o requirements.txt: só gzip
+    brotli = None
+
+DEFAULT_MAX_AGE = 60            # segundos
+COMPRESS_MIN_SIZE = 1024        # bytes; corpos menores vão sem compressão
+GZIP_LEVEL = 9                  # Comprimido uma vez por versão: nível máximo
+BROTLI_QUALITY = 9              # 10-11 ganham pouco e são várias vezes mais lentos
+
+# Preferência do servidor entre as codificações aceitas pelo cliente
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0: mesmo corpo, mesmos bytes (e mesmo ETag) em todos os workers
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Codificação -> peso (q) do cabeçalho Accept-Encoding"""
+    weights = {}
+    for part in (accept_encoding or '').lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+    return weights
+
+
+def negotiate(accept_encoding: Optional[str], size: int) -> str:
+    """Codificação da resposta: a preferida entre as aceitas (q > 0), ou identity"""
+    if size < COMPRESS_MIN_SIZE:
+        return 'identity'
+    weights = accepted_encodings(accept_encoding)
+    wildcard = weights.get('*', 0.0)
+    candidates = [(weights.get(coding, wildcard), coding) for coding in ENCODINGS]
+    candidates = [(q, coding) for q, coding in candidates if q > 0]
+    if not candidates:
+        return 'identity'
+    # Maior q; no empate, a ordem de ENCODINGS
+    return max(candidates, key=lambda item: (item[0], -ENCODINGS.index(item[1])))[1]
+
+
+def _parse_tag(tag: str) -> Tuple[str, str]:
+    """(valor sem W/, aspas e sufixo, codificação) de uma entidade do If-None-Match"""
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for encoding in ('br', 'gzip'):
+        if tag.endswith(f'-{encoding}'):
+            return tag[:-len(encoding) - 1], encoding
+    return tag, 'identity'
+
+
+def matching_encoding(if_none_match: Optional[str], opaque: str) -> Optional[str]:
+    """
+    Codificação da variante do If-None-Match que casa com o ETag (comparação
+    fraca, como manda a RFC 9110 para o 304), ou None se nenhuma casa
+    """
+    if not if_none_match:
+        return None
+    for tag in if_none_match.split(','):
+        if tag.strip() == '*':
+            return 'identity'
+        value, encoding = _parse_tag(tag)
+        if value == opaque:
+            return encoding
+    return None
+
+
+class CachedBody:
+    """Corpo serializado de uma resposta e suas versões comprimidas (geradas sob demanda, uma vez)"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._encoded = {'identity': body}
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self._encoded.get(encoding)
+        if data is None:
+            # Duas requisições simultâneas podem comprimir em dobro; o resultado é o mesmo
+            data = self._encoded[encoding] = compress(self.body, encoding)
+        return data
+
+
+class CatalogResponses:
+    """Respostas com ETag/304, Cache-Control e corpo pré-comprimido para os endpoints de catálogo"""
+
+    def __init__(self, cache: ResultCache, max_age: int = DEFAULT_MAX_AGE, salt: str = ''):
+        self.cache = cache
+        self.max_age = max_age
+        self.salt = salt  # Ex.: nome/versão da API, para o ETag mudar com o formato das respostas
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.served = {'identity': 0, **{encoding: 0 for encoding in ENCODINGS}}
+
+    def etag(self, version: str, key: Hashable) -> str:
+        return hashlib.sha1(f"{self.salt}\0{version}\0{key!r}".encode('utf-8')).hexdigest()[:24]
+
+    def headers(self, opaque: str, encoding: str = 'identity') -> Dict[str, str]:
+        suffix = '' if encoding == 'identity' else f'-{encoding}'
+        return {
+            'ETag': f'"{opaque}{suffix}"',
+            'Cache-Control': f'public, max-age={self.max_age}',
+            'Vary': 'Accept-Encoding',
+        }
+
+    def respond(self, request: Request, version: Optional[str], key: Hashable, build: Callable[[], object],
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Resposta de `key` na versão `version`; `build` monta o conteúdo (JSON,
+        aceita RawJSON) e só roda quando o corpo não está no cache. Sem
+        versão (catálogo ainda carregando) responde sem ETag nem cache.
+        `headers` (ex.: X-Next-Cursor) vão também no 304, e devem depender
+        só de `key` e `version`, como o corpo.
+        """
+        extra = headers or {}
+        if version is None:
+            return Response(dumps(build()), media_type='application/json',
+                            headers={**extra, 'Cache-Control': 'no-cache'})
+
+        opaque = self.etag(version, key)
+        cached_encoding = matching_encoding(request.headers.get('if-none-match'), opaque)
+        if cached_encoding is not None:
+            # O 304 repete o ETag da variante que o cliente tem
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers={**extra, **self.headers(opaque, cached_encoding)})
+
+        cache_key = (key, version)
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            entry = CachedBody(dumps(build()))
+            self.cache.put(cache_key, entry, version=version)
+
+        encoding = negotiate(request.headers.get('accept-encoding'), len(entry.body))
+        headers = {**extra, **self.headers(opaque, encoding)}
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        with self._lock:
+            self.served[encoding] += 1
+        return Response(entry.encoded(encoding), media_type='application/json', headers=headers)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.cache.stats(), max_age=self.max_age, not_modified=self.not_modified,
+                        served=dict(self.served))
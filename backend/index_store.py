@@ -0,0 +1,372 @@
+"""
+Artefatos de índice versionados
+===============================
+
+Construção e leitura do índice lexical (features processadas, TF-IDF e BM25)
+em um diretório versionado:
+
+    data/index/<perfil>/
+        CURRENT                  -> nome da versão ativa
+        <versão>/
+            manifest.json        -> configuração, estatísticas e checksums
+            features.arrow       -> features processadas (Arrow IPC)
+            tfidf_terms.json     -> vocabulário TF-IDF (ordem das colunas)
+            idf.npy, tfidf_*.npy -> IDF e matriz CSR (linhas L2-normalizadas),
+                                    também transposta (termo-documento)
+            bm25_*.npy, bm25_terms.json -> pesos BM25 (CSR termo-documento)
+            synonyms.json        -> sinônimos WordNet podados ao vocabulário
+
+Os arrays são abertos com memory-map, então os servidores sobem sem refazer
+lemmatização, TF-IDF ou BM25 e vários workers compartilham as mesmas páginas.
+Sem índice gravado, `ensure_index` constrói e grava a versão uma única vez
+(lock entre processos) e todos os workers abrem essa mesma versão.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from scipy import sparse
+
+from sparse_scoring import SparseBM25
+from synonyms import build_synonym_table
+from shared_artifacts import build_lock
+from text_processing import combine_features_text, get_analyzer, process_corpus, resolve_workers
+
+if TYPE_CHECKING:
+    # scikit-learn é importado só ao construir/abrir o índice (carga em segundo plano)
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+INDEX_ROOT = "data/index"
+INDEX_FORMAT_VERSION = 4
+
+# Configuração de cada perfil de índice (analisador + parâmetros dos modelos)
+INDEX_PROFILES = {
+    # main.py: sem lemmatização e sem poda do vocabulário TF-IDF
+    'basic': {
+        'analyzer': {'use_lemmatization': False, 'min_token_length': 1},
+        'tfidf': {'ngram_range': (1, 2)},
+        'bm25': False,
+        'synonyms': False,
+    },
+    # main_enhanced.py / main_semantic.py
+    'lexical': {
+        'analyzer': {'use_lemmatization': True, 'min_token_length': 2},
+        'tfidf': {'ngram_range': (1, 2), 'max_features': 50000, 'min_df': 2, 'max_df': 0.95},
+        'bm25': True,
+        'synonyms': True,
+    },
+}
+
+
+class LexicalIndex:
+    """Componentes lexicais prontos para servir"""
+
+    def __init__(self, profile: str, features: Sequence[str], tfidf: 'TfidfVectorizer',
+                 tfidf_matrix: sparse.csr_matrix, bm25: Optional[SparseBM25] = None,
+                 version: Optional[str] = None, tfidf_postings: Optional[sparse.csr_matrix] = None,
+                 synonyms: Optional[Dict[str, List[str]]] = None):
+        self.profile = profile
+        self.features = features
+        self.tfidf = tfidf
+        # Linhas já normalizadas (norm='l2' do TfidfVectorizer): cosseno = produto escalar
+        self.tfidf_matrix = tfidf_matrix
+        # Mesma matriz em formato termo-documento, para pontuar só os postings da query
+        self.tfidf_postings = tfidf_postings if tfidf_postings is not None else tfidf_matrix.T.tocsr()
+        self.bm25 = bm25
+        # Palavra da query -> sinônimos (vazio nos perfis sem expansão)
+        self.synonyms = synonyms if synonyms is not None else {}
+        self.version = version
+
+
+def file_sha256(path) -> str:
+    """SHA-256 do conteúdo de um arquivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _profile_config(profile: str) -> Dict:
+    """Configuração do perfil na forma em que é gravada no manifest (JSON)"""
+    return json.loads(json.dumps(INDEX_PROFILES[profile]))
+
+
+# =============================================================================
+# CONSTRUÇÃO
+# =============================================================================
+
+def _log_stage(stage: str, num_docs: int, elapsed: float):
+    """Tempo e vazão (docs/s) de uma etapa da construção"""
+    rate = num_docs / elapsed if elapsed > 0 else float('inf')
+    logger.info(f"{stage}: {num_docs} docs em {elapsed:.2f}s ({rate:.0f} docs/s)")
+
+
+def build_index(df: pd.DataFrame, profile: str, workers: Optional[int] = None) -> LexicalIndex:
+    """
+    Processa o catálogo e ajusta TF-IDF/BM25 em memória.
+
+    O pré-processamento (tokenização, stopwords, lemmatização) roda em
+    `workers` processos (None = todos os núcleos) e mantém a ordem do catálogo.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    config = INDEX_PROFILES[profile]
+    num_docs = len(df)
+
+    start = time.perf_counter()
+    texts = [combine_features_text(row) for row in df.to_dict(orient='records')]
+    _log_stage("Combinação de features", num_docs, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = resolve_workers(workers)
+    features = process_corpus(texts, workers=workers, **config['analyzer'])
+    _log_stage(f"Pré-processamento ({workers} workers)", num_docs, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    tfidf = TfidfVectorizer(**config['tfidf'])
+    tfidf_matrix = tfidf.fit_transform(features)
+    _log_stage("TF-IDF", num_docs, time.perf_counter() - start)
+    logger.info(f"TF-IDF matrix: {tfidf_matrix.shape}")
+
+    bm25 = None
+    if config['bm25']:
+        start = time.perf_counter()
+        bm25 = SparseBM25.fit(doc.split() for doc in features)
+        _log_stage("BM25", num_docs, time.perf_counter() - start)
+        logger.info("BM25 inicializado")
+
+    synonyms = None
+    if config['synonyms']:
+        start = time.perf_counter()
+        analyzer = get_analyzer(**config['analyzer'])
+        # Chaves: palavras do catálogo como aparecem nas queries (antes da lemmatização)
+        words = {token for text in texts for token in analyzer.tokenize(analyzer.normalize(text))}
+        vocabulary = {token for doc in features for token in doc.split()}
+        synonyms = build_synonym_table(words, vocabulary, analyzer)
+        _log_stage("Sinônimos", num_docs, time.perf_counter() - start)
+        logger.info(f"Tabela de sinônimos: {len(synonyms)} palavras")
+
+    return LexicalIndex(profile, features, tfidf, tfidf_matrix, bm25, synonyms=synonyms)
+
+
+def write_index(index: LexicalIndex, ids, source_fingerprint: str, root: str = INDEX_ROOT) -> Path:
+    """
+    Grava o índice em um novo diretório versionado, o marca como CURRENT e
+    remove as versões além da anterior. Chamado sob `build_lock` do perfil.
+    """
+    profile_dir = Path(root) / index.profile
+    # Sufixo aleatório: dois builds do mesmo catálogo no mesmo segundo não colidem no rename
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{source_fingerprint[:8]}-{uuid.uuid4().hex[:6]}"
+    tmp_dir = profile_dir / f".tmp-{version}"
+    tmp_dir.mkdir(parents=True)
+
+    matrix = index.tfidf_matrix.tocsr()
+    terms = [None] * len(index.tfidf.vocabulary_)
+    for term, col in index.tfidf.vocabulary_.items():
+        terms[col] = term
+
+    arrays = {
+        'ids': np.asarray(ids, dtype=np.int64),
+        'idf': index.tfidf.idf_,
+        'tfidf_data': matrix.data,
+        'tfidf_indices': matrix.indices,
+        'tfidf_indptr': matrix.indptr,
+        'tfidf_postings_data': index.tfidf_postings.data,
+        'tfidf_postings_indices': index.tfidf_postings.indices,
+        'tfidf_postings_indptr': index.tfidf_postings.indptr,
+    }
+    documents = {'tfidf_terms.json': terms}
+
+    manifest = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'version': version,
+        'profile': index.profile,
+        'config': _profile_config(index.profile),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'num_docs': len(index.features),
+        'source_fingerprint': source_fingerprint,
+        'tfidf_shape': list(matrix.shape),
+    }
+
+    if index.bm25 is not None:
+        bm25 = index.bm25
+        weights = bm25.weights
+        arrays.update({
+            'bm25_weights_data': weights.data,
+            'bm25_weights_indices': weights.indices,
+            'bm25_weights_indptr': weights.indptr,
+            'bm25_idf': bm25.idf,
+            'bm25_doc_len': bm25.doc_len,
+        })
+        documents['bm25_terms.json'] = bm25.terms
+        manifest['bm25'] = {
+            'k1': bm25.k1, 'b': bm25.b, 'epsilon': bm25.epsilon,
+            'avgdl': bm25.avgdl, 'average_idf': bm25.average_idf,
+        }
+
+    if INDEX_PROFILES[index.profile]['synonyms']:
+        documents['synonyms.json'] = index.synonyms
+
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", array)
+    for name, content in documents.items():
+        with open(tmp_dir / name, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+    feather.write_feather(pa.table({'features': index.features}), tmp_dir / 'features.arrow',
+                          compression='uncompressed')
+
+    artifacts = sorted(tmp_dir.iterdir())
+    manifest['files'] = {path.name: file_sha256(path) for path in artifacts}
+    manifest['sizes'] = {path.name: path.stat().st_size for path in artifacts}
+    with open(tmp_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Publicação atômica: renomeia o diretório e troca o ponteiro CURRENT
+    version_dir = profile_dir / version
+    os.rename(tmp_dir, version_dir)
+    pointer = profile_dir / 'CURRENT'
+    previous = pointer.read_text().strip() if pointer.exists() else None
+    tmp_pointer = profile_dir / f".CURRENT-{os.getpid()}"
+    tmp_pointer.write_text(version)
+    os.replace(tmp_pointer, pointer)
+
+    # A versão anterior fica para workers que ainda não trocaram de índice
+    prune_versions(profile_dir, {version, previous})
+    index.version = version
+    return version_dir
+
+
+def prune_versions(profile_dir: Path, keep):
+    """Remove as versões gravadas fora de `keep` (diretórios temporários de builds em andamento ficam)"""
+    for entry in profile_dir.iterdir():
+        if entry.is_dir() and not entry.name.startswith('.') and entry.name not in keep:
+            shutil.rmtree(entry, ignore_errors=True)
+            logger.info(f"Versão antiga do índice removida: {entry}")
+
+
+# =============================================================================
+# LEITURA
+# =============================================================================
+
+def load_index(profile: str, source_fingerprint: str, root: str = INDEX_ROOT,
+               verify_checksums: bool = False) -> Optional[LexicalIndex]:
+    """
+    Abre a versão CURRENT do perfil, se ela existir e corresponder ao catálogo.
+
+    Retorna None quando não há índice, quando ele foi gerado a partir de outro
+    catálogo/configuração ou quando falta algum arquivo ou o tamanho não
+    confere. O SHA-256 de cada arquivo (`verify_checksums`) lê o índice
+    inteiro e fica para `build_index.py --verify`.
+    """
+    profile_dir = Path(root) / profile
+    pointer = profile_dir / 'CURRENT'
+    if not pointer.exists():
+        return None
+
+    path = profile_dir / pointer.read_text().strip()
+    try:
+        with open(path / 'manifest.json', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Manifest do índice ilegível em {path}: {e}")
+        return None
+
+    if manifest.get('format_version') != INDEX_FORMAT_VERSION or manifest.get('config') != _profile_config(profile):
+        logger.info(f"Índice em {path} foi gerado com outra configuração; ignorando")
+        return None
+    if manifest.get('source_fingerprint') != source_fingerprint:
+        logger.info(f"Índice em {path} foi gerado a partir de outro catálogo; ignorando")
+        return None
+
+    sizes = manifest.get('sizes', {})
+    for name, digest in manifest['files'].items():
+        file_path = path / name
+        if not file_path.is_file() or sizes.get(name, file_path.stat().st_size) != file_path.stat().st_size:
+            logger.warning(f"Arquivo ausente ou truncado: {file_path}; ignorando índice")
+            return None
+        if verify_checksums and file_sha256(file_path) != digest:
+            logger.warning(f"Checksum inválido para {file_path}; ignorando índice")
+            return None
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    def array(name):
+        return np.load(path / f"{name}.npy", mmap_mode='r')
+
+    with open(path / 'tfidf_terms.json', encoding='utf-8') as f:
+        terms = json.load(f)
+    config = INDEX_PROFILES[profile]
+    tfidf = TfidfVectorizer(**config['tfidf'], vocabulary={term: i for i, term in enumerate(terms)})
+    tfidf.idf_ = np.asarray(array('idf'))
+    tfidf_matrix = sparse.csr_matrix(
+        (array('tfidf_data'), array('tfidf_indices'), array('tfidf_indptr')),
+        shape=tuple(manifest['tfidf_shape']), copy=False
+    )
+    tfidf_postings = sparse.csr_matrix(
+        (array('tfidf_postings_data'), array('tfidf_postings_indices'), array('tfidf_postings_indptr')),
+        shape=tuple(reversed(manifest['tfidf_shape'])), copy=False
+    )
+
+    bm25 = None
+    if config['bm25']:
+        with open(path / 'bm25_terms.json', encoding='utf-8') as f:
+            bm25_terms = json.load(f)
+        weights = sparse.csr_matrix(
+            (array('bm25_weights_data'), array('bm25_weights_indices'), array('bm25_weights_indptr')),
+            shape=(len(bm25_terms), manifest['num_docs']), copy=False
+        )
+        bm25 = SparseBM25(bm25_terms, weights, array('bm25_idf'), array('bm25_doc_len'), **manifest['bm25'])
+
+    synonyms = None
+    if config['synonyms']:
+        with open(path / 'synonyms.json', encoding='utf-8') as f:
+            synonyms = json.load(f)
+
+    # Série sobre a coluna Arrow (memory-map), sem uma cópia das strings por worker quando o pandas usa Arrow
+    features = feather.read_table(path / 'features.arrow', memory_map=True).column('features').to_pandas()
+
+    logger.info(f"Índice '{profile}' carregado de {path}")
+    return LexicalIndex(profile, features, tfidf, tfidf_matrix, bm25, version=manifest['version'],
+                        tfidf_postings=tfidf_postings, synonyms=synonyms)
+
+
+def ensure_index(df: pd.DataFrame, profile: str, source_path: str, workers: Optional[int] = None,
+                 root: str = INDEX_ROOT) -> LexicalIndex:
+    """
+    Índice do catálogo aberto do disco (memory-map).
+
+    Se não houver versão válida, um único processo constrói e grava o índice
+    enquanto os demais workers aguardam o lock e depois abrem a versão gravada.
+    """
+    fingerprint = file_sha256(source_path)
+    index = load_index(profile, fingerprint, root)
+    if index is not None:
+        return index
+
+    with build_lock(Path(root) / profile):
+        # Outro worker pode ter gravado o índice enquanto este aguardava o lock
+        index = load_index(profile, fingerprint, root)
+        if index is not None:
+            return index
+        logger.info(f"Índice '{profile}' não encontrado; construindo e gravando (backend/build_index.py faz o mesmo offline)")
+        index = build_index(df, profile, workers=workers)
+        try:
+            write_index(index, df['id'], fingerprint, root)
+        except OSError as e:
+            logger.warning(f"Erro ao gravar índice '{profile}': {e}; usando a versão em memória")
+            return index
+    return load_index(profile, fingerprint, root) or index
@@ -1,25 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 # Trigger reload
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import List, Optional
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import string
-import unicodedata
+import numpy as np
 import os
 import subprocess
-import ast
+from catalog import (catalog_source, load_movies, build_genre_index, build_genre_rows, build_id_index,
+                     build_popularity_index, catalog_fingerprint)
+from index_store import INDEX_PROFILES, ensure_index
+from text_processing import get_analyzer
+from nltk_resources import required_resources, require_resources
+from ranking import top_k
+from sparse_scoring import sparse_dot_scores
+from neighbors import ensure_neighbor_table, lookup_similar
+from shared_artifacts import process_memory
+from admission import BoundedExecutor, Overloaded
+from readiness import StartupProgress
+from payloads import MoviePayloads, PayloadResponse, json_array
+from result_cache import ResultCache
+from http_cache import CatalogResponses
+from pagination import paginate
 
-# Download NLTK resources
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('punkt_tab')
-
-app = FastAPI()
+app = FastAPI(default_response_class=PayloadResponse)
 
 # CORS configuration
 app.add_middleware(
@@ -28,163 +33,252 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor of the next page (pagination.py)
 )
 
 # Data Loading and Startup Check
-DATA_PATH = "data/processed_movies.csv"
+DATA_PATH = "data/processed_movies.arrow"
+CSV_DATA_PATH = "data/processed_movies.csv"  # Legacy export, still accepted
 PROCESSOR_SCRIPT = "backend/data_processor.py"
+NEIGHBORS_PATH = "data/neighbors_basic.npz"
+SIMILAR_MOVIES_K = 20
+INDEX_PROFILE = "basic"  # Index profile built by backend/build_index.py --profile basic
+PREPROCESS_WORKERS = None  # Worker processes when fitting without a prebuilt index (None = all cores)
+SCORING_WORKERS = None  # Scoring threads for /recommend (None = one per core)
+SCORING_QUEUE_SIZE = 64  # Requests allowed to wait; beyond that /recommend answers 503 + Retry-After
+STARTUP_RETRY_AFTER = 5  # Seconds suggested to clients while data is still loading
 
-if not os.path.exists(DATA_PATH):
-    print(f"Processed data not found at {DATA_PATH}. Running data processor...")
-    try:
-        subprocess.run(["python", PROCESSOR_SCRIPT], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error running data processor: {e}")
-        # Try to load fallback or exit? For now, we'll let pandas fail if file still missing
-
-try:
-    df_movies = pd.read_csv(DATA_PATH)
-    # Ensure list columns are parsed correctly if they were saved as strings
-    # But for TF-IDF we might just treat them as strings.
-    # Let's fill NaNs first
-    df_movies = df_movies.fillna('')
-except FileNotFoundError:
-    print("Error: Data file not found even after attempting to generate it.")
-    df_movies = pd.DataFrame() # Empty fallback
-
-# Text Preprocessing
-def preprocess_text(text):
-    if not isinstance(text, str):
-        return ""
-    
-    # Normalization
-    text = text.lower()
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    
-    # Tokenization
-    tokens = word_tokenize(text)
-    
-    # Stopwords
-    stop_words = set(stopwords.words('english'))
-    tokens = [t for t in tokens if t not in stop_words]
-    
-    return " ".join(tokens)
-
-def create_combined_features(row):
-    # Combine title, genre, description, director, cast, and keywords
-    # Weighting (optimized for keyword matching): 
-    # Keywords (6x) - HIGHEST PRIORITY for keyword-based searches
-    # Title (3x)
-    # Director (3x)
-    # Cast (2x), Genre (2x)
-    # Description (1x)
-    
-    # Helper to handle list-like strings or lists
-    def get_str(val):
-        if isinstance(val, list):
-            return " ".join(val)
-        if isinstance(val, str) and val.startswith('['):
+# Largest limit for home-page genre rows (cached by limit and fields) and genre pages
+MAX_GENRE_ROW_LIMIT = 100
+
+# Largest (and default) /movies page
+MOVIES_PAGE_LIMIT = 200
+
+# HTTP caching of the catalog endpoints (ETag/304 + precompressed bodies per index version)
+CATALOG_CACHE_MAX_AGE = 60  # Cache-Control max-age in seconds; browsers revalidate with the ETag after that
+RESPONSE_CACHE_SIZE = 256  # Bodies kept (endpoint + parameter combinations)
+RESPONSE_CACHE_TTL = 3600  # seconds
+
+# Text analyzer shared with the offline index (no lemmatization), created by load_data()
+analyzer = None
+
+# Served state, filled in by load_data() on a background thread
+df_movies = pd.DataFrame()
+payloads = MoviePayloads()  # Pre-serialized JSON of each df_movies row (see payloads.py)
+popular_rows = np.zeros(0, dtype=np.int64)  # Row positions by descending popularity (/movies pages)
+genre_index, all_genres, id_to_row, genre_rows_cache = {}, [], {}, {}
+tfidf = tfidf_matrix = tfidf_postings = None
+index_version = None  # Version of the loaded index; ETags of the catalog endpoints derive from it
+neighbor_ids, neighbor_scores = None, None
+
+# Startup progress per component; /recommend needs data + tfidf
+startup = StartupProgress(('data', 'tfidf', 'neighbors'), ('data', 'tfidf'))
+
+def load_data():
+    """Load the catalog, index and neighbor table; each stage publishes its component when done."""
+    global df_movies, payloads, popular_rows, genre_index, all_genres, id_to_row, genre_rows_cache
+    global tfidf, tfidf_matrix, tfidf_postings, index_version, neighbor_ids, neighbor_scores, analyzer
+
+    with startup.stage('data'):
+        if not os.path.exists(DATA_PATH) and not os.path.exists(CSV_DATA_PATH):
+            print(f"Processed data not found at {DATA_PATH}. Running data processor...")
             try:
-                # It's a string representation of a list
-                return " ".join(ast.literal_eval(val))
-            except:
-                return val
-        return str(val)
-
-    genre_str = get_str(row['genre'])
-    cast_str = get_str(row['cast'])
-    keyword_str = get_str(row.get('keywords', '')) # Handle missing keywords column gracefully
-    director_str = str(row['director'])
-    
-    features = [
-        keyword_str * 6,  # Increased from 3x to 6x for better keyword matching
-        str(row['title']) * 3,
-        director_str * 3,
-        cast_str * 2,
-        genre_str * 2,
-        str(row['description'])
-    ]
-    combined_text = " ".join(features)
-    return preprocess_text(combined_text)
-
-# Prepare TF-IDF
-if not df_movies.empty:
-    df_movies['processed_features'] = df_movies.apply(create_combined_features, axis=1)
-    # Use n-grams (1, 2) to capture phrases
-    tfidf = TfidfVectorizer(ngram_range=(1, 2))
-    tfidf_matrix = tfidf.fit_transform(df_movies['processed_features'])
-else:
-    tfidf_matrix = None
+                subprocess.run(["python", PROCESSOR_SCRIPT], check=True)
+            except subprocess.CalledProcessError as e:
+                print(f"Error running data processor: {e}")
+
+        # Memory-mapped Arrow catalog with native list columns (CSV as fallback)
+        df_movies = load_movies(DATA_PATH, CSV_DATA_PATH)
+        payloads = MoviePayloads.from_frame(df_movies)
+
+        # Popularity order, and the genre inverted index (genre -> row positions) in that order
+        popular_rows = build_popularity_index(df_movies)
+        genre_index = build_genre_index(df_movies, order=popular_rows)
+        all_genres = sorted(genre_index)
+        id_to_row = build_id_index(df_movies)
+        genre_rows_cache = {}
+
+    with startup.stage('tfidf'):
+        # Vendored NLTK data is only checked, never downloaded at startup
+        config = INDEX_PROFILES[INDEX_PROFILE]['analyzer']
+        require_resources(required_resources(config['use_lemmatization']))
+        analyzer = get_analyzer(**config)
+        # Memory-mapped versioned index; when missing, one worker builds and writes it
+        # and the others wait and open the same files
+        index = ensure_index(df_movies, INDEX_PROFILE, catalog_source(DATA_PATH, CSV_DATA_PATH), PREPROCESS_WORKERS)
+        # New frame instead of inserting a column into the one being served
+        df_movies = df_movies.assign(processed_features=index.features)
+        payloads = MoviePayloads.from_frame(df_movies)
+        genre_rows_cache = {}
+        tfidf, tfidf_matrix, tfidf_postings = index.tfidf, index.tfidf_matrix, index.tfidf_postings
+        # Set last: a response cached under this version is always built from the rows above
+        catalog_responses.cache.bind_version(index.version)
+        index_version = index.version
+
+    with startup.stage('neighbors'):
+        # Item-to-item neighbor table, loaded from disk when the catalog is unchanged
+        neighbor_ids, neighbor_scores = ensure_neighbor_table(
+            NEIGHBORS_PATH, [(tfidf_matrix, 1.0)], catalog_fingerprint(df_movies), "tfidf", SIMILAR_MOVIES_K
+        )
+
+def require_ready(*components):
+    """503 + Retry-After while a component the endpoint needs is still loading."""
+    missing = startup.not_ready(*components)
+    if missing:
+        raise HTTPException(status_code=503, detail=f"Loading: {', '.join(missing)}",
+                            headers={"Retry-After": str(STARTUP_RETRY_AFTER)})
+
+# Serialized, precompressed catalog responses, dropped when the index version changes
+catalog_responses = CatalogResponses(ResultCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL), CATALOG_CACHE_MAX_AGE,
+                                     "basic")
+
+# Dedicated scoring pool with a bounded admission queue (instead of the AnyIO threadpool)
+scoring_executor = BoundedExecutor(SCORING_WORKERS, SCORING_QUEUE_SIZE)
+
+@app.on_event("startup")
+async def startup_event():
+    # Load in the background so the port answers (/health/live) right away
+    startup.start_background(load_data)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    scoring_executor.shutdown()
 
 class RecommendationRequest(BaseModel):
     query: str
 
+def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """Fields requested with `fields=` (None means all of them); 400 on unknown fields."""
+    try:
+        return payloads.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def catalog_page(request: Request, key: tuple, order, limit: int, cursor: Optional[str], fields: Optional[str]):
+    """One page of `order` (pre-sorted rows), with the next page's cursor in the X-Next-Cursor header."""
+    fields = parse_fields(fields)
+    try:
+        rows, next_page = paginate(order, limit, cursor, id_to_row, df_movies['id'].to_numpy())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {'X-Next-Cursor': next_page} if next_page else None
+    return catalog_responses.respond(request, index_version, key + (limit, cursor, fields),
+                                     lambda: payloads.rows(rows, fields), headers)
+
 @app.get("/movies")
-def get_movies():
+def get_movies(request: Request, limit: int = MOVIES_PAGE_LIMIT, cursor: Optional[str] = None,
+               fields: Optional[str] = None):
+    require_ready('data')
     if df_movies.empty:
         return []
-    # Return top 200 movies sorted by popularity
-    return df_movies.nlargest(200, 'popularity').to_dict(orient="records")
+    # Pages of the precomputed popularity order, from the pre-serialized rows
+    limit = min(max(limit, 0), MOVIES_PAGE_LIMIT)
+    return catalog_page(request, ('movies',), popular_rows, limit, cursor, fields)
 
 @app.get("/genres")
-def get_genres():
+def get_genres(request: Request):
     """Get all unique genres from the dataset."""
-    if df_movies.empty:
-        return []
-    
-    # Extract all genres from all movies
-    all_genres = set()
-    for genres_str in df_movies['genre']:
-        try:
-            if isinstance(genres_str, str):
-                genres_list = ast.literal_eval(genres_str)
-                if isinstance(genres_list, list):
-                    all_genres.update(genres_list)
-        except:
-            pass
-    
-    return sorted(list(all_genres))
+    require_ready('data')
+    return catalog_responses.respond(request, index_version, ('genres',), lambda: all_genres)
+
+@app.get("/movies/by-genre")
+def get_movies_by_genres(request: Request, genres: Optional[List[str]] = Query(None), limit: int = 20,
+                         fields: Optional[str] = None):
+    """Get the top movies of several genres (all genres by default) in one response, with next-page cursors."""
+    require_ready('data')
+    limit = min(max(limit, 0), MAX_GENRE_ROW_LIMIT)
+    fields = parse_fields(fields)
+
+    def build():
+        ids = df_movies['id'].to_numpy() if not df_movies.empty else []
+        if genres:
+            return build_genre_rows(payloads, genre_index, genres, limit, ids, fields)
+        if (limit, fields) not in genre_rows_cache:
+            genre_rows_cache[limit, fields] = build_genre_rows(payloads, genre_index, all_genres, limit, ids, fields)
+        return genre_rows_cache[limit, fields]
+    return catalog_responses.respond(request, index_version, ('genre-rows', tuple(genres or ()), limit, fields),
+                                     build)
 
 @app.get("/movies/by-genre/{genre}")
-def get_movies_by_genre(genre: str, limit: int = 20):
-    """Get movies filtered by genre, sorted by popularity."""
-    if df_movies.empty:
+def get_movies_by_genre(request: Request, genre: str, limit: int = 20, cursor: Optional[str] = None,
+                        fields: Optional[str] = None):
+    """Get movies filtered by genre, sorted by popularity, one cursor page at a time."""
+    require_ready('data')
+    rows = genre_index.get(genre)
+    if rows is None:
         return []
-    
-    # Filter movies that contain the specified genre
-    filtered_movies = []
-    for idx, row in df_movies.iterrows():
-        try:
-            genres_str = row['genre']
-            if isinstance(genres_str, str):
-                genres_list = ast.literal_eval(genres_str)
-                if isinstance(genres_list, list) and genre in genres_list:
-                    filtered_movies.append(row.to_dict())
-        except:
-            pass
-    
-    # Sort by popularity and limit
-    filtered_df = pd.DataFrame(filtered_movies)
-    if not filtered_df.empty:
-        filtered_df = filtered_df.nlargest(limit, 'popularity')
-        return filtered_df.to_dict(orient="records")
-    
-    return []
+
+    # Posting lists are already sorted by popularity, so each page is a slice
+    limit = min(max(limit, 0), MAX_GENRE_ROW_LIMIT)
+    return catalog_page(request, ('by-genre', genre), rows, limit, cursor, fields)
+
+@app.get("/movies/{movie_id}")
+def get_movie(request: Request, movie_id: int, fields: Optional[str] = None):
+    """Get one movie's record (e.g. full details for a card that only carries a few fields)."""
+    require_ready('data')
+    row = id_to_row.get(movie_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    fields = parse_fields(fields)
+    return catalog_responses.respond(request, index_version, ('movie', movie_id, fields),
+                                     lambda: payloads.record(row, fields))
+
+@app.get("/movies/{movie_id}/similar")
+def get_similar_movies(request: Request, movie_id: int, limit: int = 10):
+    """Get the movies most similar to a catalog movie from the precomputed neighbor table."""
+    require_ready('neighbors')
+    row = id_to_row.get(movie_id)
+    if row is None or neighbor_ids is None:
+        raise HTTPException(status_code=404, detail="Movie not found")
+    return catalog_responses.respond(request, index_version, ('similar', movie_id, limit),
+                                     lambda: lookup_similar(payloads, neighbor_ids, neighbor_scores, row, limit))
+
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """200 once /recommend can be served, 503 while loading or after a failed load."""
+    return JSONResponse(
+        status_code=200 if startup.serving() else 503,
+        content={"status": startup.status(), "components": startup.snapshot()}
+    )
+
+@app.get("/health")
+def health_check():
+    status = startup.status()
+    return {
+        "status": "healthy" if status == "ready" else status,
+        "components": startup.snapshot(),
+        "movies_loaded": len(df_movies),
+        "response_cache": catalog_responses.stats(),
+        "scoring_executor": scoring_executor.stats(),
+        "memory": process_memory(),
+    }
 
 @app.post("/recommend")
-def recommend(request: RecommendationRequest):
+async def recommend(request: RecommendationRequest):
+    require_ready('data', 'tfidf')
     if df_movies.empty or tfidf_matrix is None:
         return []
 
-    query_processed = preprocess_text(request.query)
+    # Scoring runs on the bounded pool; a full queue is rejected right away
+    try:
+        return PayloadResponse(await scoring_executor.run(score_query, request.query))
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def score_query(query: str):
+    query_processed = analyzer.process(query)
     query_vec = tfidf.transform([query_processed])
     
-    similarity = cosine_similarity(query_vec, tfidf_matrix).flatten()
+    # Rows are L2-normalized at build time: cosine similarity is a dot product
+    # over the postings of the query terms
+    similarity = sparse_dot_scores(tfidf_postings, query_vec)
     
-    # Get top 10 recommendations
-    indices = similarity.argsort()[-10:][::-1]
+    # Get top 10 recommendations (partial selection, no full sort)
+    indices, _ = top_k(similarity, 10)
     
     recommendations = []
     
@@ -195,24 +289,16 @@ def recommend(request: RecommendationRequest):
     
     for i in indices:
         if similarity[i] > 0: 
-            movie = df_movies.iloc[i].to_dict()
-            
             # Normalize score
             if max_score > 0:
                 normalized_score = (similarity[i] / max_score) * 0.95
             else:
                 normalized_score = 0
                 
-            movie['score'] = float(normalized_score)
-            
-            # Handle NaN in dictionary
-            for k, v in movie.items():
-                if pd.isna(v):
-                    movie[k] = ""
-                    
-            recommendations.append(movie)
+            # Movie fields are serialized once at load; only the score is encoded here
+            recommendations.append(payloads.with_fields(i, {'score': float(normalized_score)}))
             
-    return recommendations
+    return json_array(recommendations)
 
 if __name__ == "__main__":
     import uvicorn
@@ -16,45 +16,47 @@ Autor: NetRecs Team
 Versão: 2.0
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from rank_bm25 import BM25Okapi
-import nltk
-from nltk.corpus import stopwords, wordnet
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from nltk import pos_tag
-import string
-import unicodedata
+import hmac
 import os
 import subprocess
-import ast
-from functools import lru_cache
-import hashlib
+import time
+from catalog import (catalog_source, load_movies, build_genre_index, build_genre_rows, build_id_index,
+                     build_popularity_index, catalog_fingerprint)
+from index_store import INDEX_PROFILES, ensure_index
+from text_processing import AnalyzedQuery, get_analyzer
+from nltk_resources import required_resources, require_resources
+from result_cache import ResultCache
+from http_cache import CatalogResponses
+from pagination import paginate
+from admission import BoundedExecutor, Overloaded
+from readiness import StartupProgress
+from synonyms import expand_query
+from ranking import fuse_top_k
+from sparse_scoring import sparse_dot_scores
+from neighbors import ensure_neighbor_table, lookup_similar, similar_records
+from shared_artifacts import process_memory
+from hot_reload import CatalogWatcher, ServingState, StateHolder, file_signature
+from payloads import MoviePayloads, PayloadResponse, RawJSON
+from segments import DeltaJournal, DeltaSegment, concat_scores, dead_rows, drop_dead, live_top_k, segment_view
+from data_processor import save_movies
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Download NLTK resources
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
-nltk.download('punkt_tab', quiet=True)
-nltk.download('wordnet', quiet=True)
-nltk.download('averaged_perceptron_tagger', quiet=True)
-nltk.download('averaged_perceptron_tagger_eng', quiet=True)
-
 app = FastAPI(
     title="NetRecs API",
     description="Sistema de Recomendação de Filmes com Algoritmos Híbridos",
-    version="2.0"
+    version="2.0",
+    default_response_class=PayloadResponse
 )
 
 # CORS configuration
@@ -64,14 +66,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor da próxima página (pagination.py)
 )
 
 # =============================================================================
 # CONFIGURAÇÕES E CONSTANTES
 # =============================================================================
 
-DATA_PATH = "data/processed_movies.csv"
+DATA_PATH = "data/processed_movies.arrow"
+CSV_DATA_PATH = "data/processed_movies.csv"  # Exportação legada, ainda aceita
+INDEX_PROFILE = "lexical"  # Perfil do índice gerado por backend/build_index.py
 PROCESSOR_SCRIPT = "backend/data_processor.py"
+NEIGHBORS_PATH = "data/neighbors_enhanced.npz"
+SIMILAR_MOVIES_K = 20
+PREPROCESS_WORKERS = None  # Processos no pré-processamento sem índice pronto (None = todos os núcleos)
 
 # Pesos para o sistema híbrido
 HYBRID_WEIGHTS = {
@@ -89,6 +97,48 @@ RERANK_WEIGHTS = {
     'confidence': 0.10     # Confiança (baseada em vote_count)
 }
 
+# Campos de score acrescentados ao JSON pré-serializado de cada filme do /recommend
+RESULT_FIELDS = ('similarity_score', 'final_score', 'score_breakdown', 'score')
+
+# Fusão híbrida: funde só a união dos FUSION_CANDIDATE_DEPTH melhores de cada sinal;
+# se o limite superior de quem ficou de fora não garantir o top-k, refaz a fusão no
+# corpus inteiro (ranking.py). FUSION_VERIFY compara cada resultado com a fusão completa
+FUSION_CANDIDATE_DEPTH = 100
+FUSION_VERIFY = False
+
+# Cache de resultados do /recommend (LRU + TTL, invalidado ao trocar de índice)
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_TTL = 600  # segundos
+
+# Cache HTTP dos endpoints de catálogo (ETag/304 + corpo pré-comprimido, invalidado pela versão)
+CATALOG_CACHE_MAX_AGE = 60   # segundos de Cache-Control; depois o navegador revalida com o ETag
+RESPONSE_CACHE_SIZE = 256    # Corpos guardados (combinações de endpoint e parâmetros)
+RESPONSE_CACHE_TTL = 3600    # segundos
+
+# Pool de scoring do /recommend: threads dedicadas e fila de admissão limitada
+SCORING_WORKERS = None    # None = um por núcleo
+SCORING_QUEUE_SIZE = 64   # Requisições aguardando; além disso responde 503 + Retry-After
+
+# Inicialização em segundo plano: componentes e os necessários para o /recommend
+STARTUP_COMPONENTS = ('data', 'tfidf', 'bm25', 'neighbors')
+REQUIRED_COMPONENTS = ('data', 'tfidf', 'bm25')
+STARTUP_RETRY_AFTER = 5  # segundos sugeridos enquanto os dados carregam
+
+# Recarga do catálogo sem reiniciar: POST /admin/reload e/ou monitoramento dos arquivos
+CATALOG_WATCH = False         # Recarrega sozinho quando DATA_PATH/CSV_DATA_PATH mudam
+CATALOG_WATCH_INTERVAL = 5.0  # segundos entre verificações
+ADMIN_TOKEN = os.getenv('NETRECS_ADMIN_TOKEN', '')  # Exigido em /admin/* (header X-Admin-Token); vazio = só localhost
+
+# Alterações incrementais (/admin/movies): segmento delta + journal, incorporados ao catálogo no merge
+DELTA_JOURNAL_PATH = "data/catalog_delta.jsonl"
+DELTA_MERGE_THRESHOLD = 200  # Filmes no delta (incluídos + removidos) que disparam o merge em segundo plano
+
+# Limite de filmes por linha no endpoint de gêneros em lote e por página de um gênero
+MAX_GENRE_ROW_LIMIT = 100
+
+# Tamanho máximo (e padrão) de uma página do /movies
+MOVIES_PAGE_LIMIT = 200
+
 # Gêneros conhecidos para detecção de query
 KNOWN_GENRES = [
     'action', 'adventure', 'animation', 'comedy', 'crime', 'documentary',
@@ -111,96 +161,75 @@ class RecommendationResponse(BaseModel):
     query_info: Dict
     algorithm_used: str
 
+class MovieUpsert(BaseModel):
+    id: Optional[int] = None  # Obrigatório no lote; no PUT vem do caminho
+    title: str
+    description: Optional[str] = ""
+    genre: Optional[List[str]] = []
+    image_url: Optional[str] = ""
+    director: Optional[str] = ""
+    cast: Optional[List[str]] = []
+    keywords: Optional[List[str]] = []
+    vote_average: Optional[float] = 0.0
+    vote_count: Optional[int] = 0
+    popularity: Optional[float] = 0.0
+
+class SearchState(ServingState):
+    """Catálogo e índices de uma versão, publicados juntos (ver hot_reload.py)"""
+
+    def __init__(self, **fields):
+        self.df_movies = pd.DataFrame()
+        self.payloads = MoviePayloads()  # JSON de cada linha de df_movies (payloads.py)
+        self.source = None             # Arquivo do catálogo carregado
+        self.catalog_signature = None  # mtime/tamanho dos arquivos do catálogo na carga
+        self.loaded_at = None
+        self.popular_rows = np.zeros(0, dtype=np.int64)  # Linhas vivas por popularidade (páginas do /movies)
+        self.genre_index = {}
+        self.all_genres = []
+        self.genre_rows_cache = {}
+        self.id_to_row = {}
+        self.tfidf = None
+        self.tfidf_matrix = None
+        self.tfidf_postings = None
+        self.bm25 = None
+        self.synonym_table = {}
+        self.index_version = None      # Versão do índice lexical
+        self.main_movies = pd.DataFrame()  # Segmento principal (df_movies = principal + delta)
+        self.main_payloads = MoviePayloads()
+        self.delta = DeltaSegment()
+        self.deleted_ids = frozenset()  # Ids removidos do segmento principal
+        self.alive = None              # Máscara de linhas vivas de df_movies (None = todas)
+        self.applied_seq = 0           # Última operação do journal aplicada
+        self.neighbor_ids = None
+        self.neighbor_scores = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def version(self) -> Optional[str]:
+        """Versão servida: índice lexical + operações incrementais aplicadas"""
+        if not self.applied_seq:
+            return self.index_version
+        return f"{self.index_version}+{self.applied_seq}"
+
 # =============================================================================
 # PROCESSAMENTO DE TEXTO AVANÇADO
 # =============================================================================
 
-lemmatizer = WordNetLemmatizer()
-
-def get_wordnet_pos(tag: str) -> str:
-    """Converte POS tag do Penn Treebank para formato WordNet"""
-    if tag.startswith('J'):
-        return wordnet.ADJ
-    elif tag.startswith('V'):
-        return wordnet.VERB
-    elif tag.startswith('N'):
-        return wordnet.NOUN
-    elif tag.startswith('R'):
-        return wordnet.ADV
-    return wordnet.NOUN
-
-def lemmatize_tokens(tokens: List[str]) -> List[str]:
-    """Aplica lemmatização considerando POS tags"""
-    if not tokens:
-        return []
-    try:
-        pos_tags = pos_tag(tokens)
-        return [lemmatizer.lemmatize(word, get_wordnet_pos(tag)) 
-                for word, tag in pos_tags]
-    except Exception as e:
-        logger.warning(f"Erro na lemmatização: {e}")
-        return tokens
-
-def get_synonyms(word: str, max_synonyms: int = 2) -> List[str]:
-    """Retorna sinônimos de uma palavra usando WordNet"""
-    synonyms = set()
-    try:
-        for syn in wordnet.synsets(word):
-            for lemma in syn.lemmas():
-                synonym = lemma.name().replace('_', ' ').lower()
-                if synonym != word and len(synonym) > 2:
-                    synonyms.add(synonym)
-                if len(synonyms) >= max_synonyms:
-                    return list(synonyms)
-    except Exception as e:
-        logger.warning(f"Erro ao buscar sinônimos para '{word}': {e}")
-    return list(synonyms)
-
-def expand_query_with_synonyms(query: str) -> str:
-    """Expande a query adicionando sinônimos relevantes"""
-    words = query.lower().split()
-    expanded = words.copy()
-    
-    # Palavras para não expandir (stopwords, números, etc.)
-    stop_words = set(stopwords.words('english'))
-    
-    for word in words:
-        if word not in stop_words and len(word) > 3:
-            synonyms = get_synonyms(word)
-            expanded.extend(synonyms)
-    
-    return " ".join(expanded)
+# Analisador compartilhado com o índice (mesmas etapas para documentos e queries),
+# criado pela carga em segundo plano depois de verificar os recursos do NLTK
+analyzer = None
 
-def preprocess_text_advanced(text: str, use_lemmatization: bool = True) -> str:
-    """Pré-processamento avançado de texto com lemmatização"""
-    if not isinstance(text, str):
-        return ""
-    
-    # 1. Lowercase
-    text = text.lower()
-    
-    # 2. Normalização Unicode (remove acentos)
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
-    
-    # 3. Remove pontuação
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    
-    # 4. Tokenização
-    try:
-        tokens = word_tokenize(text)
-    except Exception:
-        tokens = text.split()
-    
-    # 5. Remove stopwords
-    stop_words = set(stopwords.words('english'))
-    tokens = [t for t in tokens if t not in stop_words and len(t) > 1]
-    
-    # 6. Lemmatização (opcional)
-    if use_lemmatization:
-        tokens = lemmatize_tokens(tokens)
-    
-    return " ".join(tokens)
+def load_analyzer():
+    """Verifica os recursos do NLTK (sem download) e cria o analisador do perfil"""
+    global analyzer
+    config = INDEX_PROFILES[INDEX_PROFILE]['analyzer']
+    require_resources(required_resources(config['use_lemmatization']))
+    analyzer = get_analyzer(**config)
+
+def expand_query_with_synonyms(state: SearchState, query: str) -> str:
+    """Expande a query com a tabela de sinônimos pré-calculada no índice"""
+    return expand_query(query, state.synonym_table, analyzer.stop_words)
 
 def detect_query_type(query: str) -> str:
     """Detecta o tipo de busca para ajustar pesos do algoritmo"""
@@ -226,139 +255,179 @@ def detect_query_type(query: str) -> str:
 # CARREGAMENTO E PROCESSAMENTO DE DADOS
 # =============================================================================
 
-def load_data():
-    """Carrega e processa os dados dos filmes"""
-    global df_movies, tfidf, tfidf_matrix, bm25, tokenized_corpus
-    
-    if not os.path.exists(DATA_PATH):
-        logger.info(f"Dados não encontrados em {DATA_PATH}. Executando processador...")
-        try:
-            subprocess.run(["python", PROCESSOR_SCRIPT], check=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Erro ao executar processador: {e}")
+def load_catalog_state() -> SearchState:
+    """Catálogo e índices auxiliares (popularidade, gêneros, id -> linha) em um novo estado"""
+    signature = file_signature([DATA_PATH, CSV_DATA_PATH])
+    df = load_movies(DATA_PATH, CSV_DATA_PATH)
+    logger.info(f"Carregados {len(df)} filmes")
+
+    # Ordem de popularidade e índice invertido de gêneros (postings na mesma ordem)
+    popular_rows = build_popularity_index(df)
+    genre_index = build_genre_index(df, order=popular_rows)
+    return SearchState(
+        df_movies=df, payloads=MoviePayloads.from_frame(df), source=catalog_source(DATA_PATH, CSV_DATA_PATH), catalog_signature=signature,
+        loaded_at=time.strftime('%Y-%m-%dT%H:%M:%S'), popular_rows=popular_rows, genre_index=genre_index,
+        all_genres=sorted(genre_index), id_to_row=build_id_index(df)
+    )
 
-    try:
-        df_movies = pd.read_csv(DATA_PATH)
-        df_movies = df_movies.fillna('')
-        logger.info(f"Carregados {len(df_movies)} filmes")
-    except FileNotFoundError:
-        logger.error("Arquivo de dados não encontrado")
-        df_movies = pd.DataFrame()
-        return
-
-    # Criar features combinadas
-    df_movies['processed_features'] = df_movies.apply(create_combined_features, axis=1)
-    
-    # Inicializar TF-IDF
-    tfidf = TfidfVectorizer(
-        ngram_range=(1, 2),
-        max_features=50000,
-        min_df=2,
-        max_df=0.95
+def with_lexical_index(state: SearchState) -> SearchState:
+    """Estado com TF-IDF e BM25 do catálogo de `state`"""
+    # Índice lexical gravado (build_index.py) aberto com memory-map; se ausente,
+    # um único worker o constrói e grava e os demais abrem a mesma versão
+    index = ensure_index(state.df_movies, INDEX_PROFILE, state.source, PREPROCESS_WORKERS)
+    df = state.df_movies.assign(processed_features=index.features)
+    payloads = MoviePayloads.from_frame(df)
+    return state.evolve(
+        df_movies=df,
+        payloads=payloads,
+        main_movies=df,
+        main_payloads=payloads,
+        genre_rows_cache={},
+        tfidf=index.tfidf, tfidf_matrix=index.tfidf_matrix, tfidf_postings=index.tfidf_postings, bm25=index.bm25,
+        synonym_table=index.synonyms,
+        index_version=index.version
     )
-    tfidf_matrix = tfidf.fit_transform(df_movies['processed_features'])
-    logger.info(f"TF-IDF matrix: {tfidf_matrix.shape}")
-    
-    # Inicializar BM25
-    tokenized_corpus = [doc.split() for doc in df_movies['processed_features']]
-    bm25 = BM25Okapi(tokenized_corpus)
-    logger.info("BM25 inicializado")
-
-def create_combined_features(row) -> str:
-    """Combina features com pesos para criar representação textual do filme"""
-    def get_str(val):
-        if isinstance(val, list):
-            return " ".join(val)
-        if isinstance(val, str) and val.startswith('['):
+
+def with_neighbors(state: SearchState) -> SearchState:
+    """Estado com a tabela de vizinhos item-a-item"""
+    neighbor_ids, neighbor_scores = ensure_neighbor_table(
+        NEIGHBORS_PATH, [(state.tfidf_matrix, 1.0)], catalog_fingerprint(state.main_movies), "tfidf", SIMILAR_MOVIES_K
+    )
+    return state.evolve(neighbor_ids=neighbor_ids, neighbor_scores=neighbor_scores)
+
+def load_data():
+    """Primeira carga (thread de fundo): cada etapa publica um estado com seu componente"""
+    with startup.stage('data'):
+        if not os.path.exists(DATA_PATH) and not os.path.exists(CSV_DATA_PATH):
+            logger.info(f"Dados não encontrados em {DATA_PATH}. Executando processador...")
             try:
-                return " ".join(ast.literal_eval(val))
-            except:
-                return val
-        return str(val) if val else ""
-
-    genre_str = get_str(row.get('genre', ''))
-    cast_str = get_str(row.get('cast', ''))
-    keyword_str = get_str(row.get('keywords', ''))
-    director_str = str(row.get('director', ''))
-    title_str = str(row.get('title', ''))
-    description_str = str(row.get('description', ''))
-    
-    # Pesos otimizados (repetição = peso maior)
-    features = [
-        keyword_str * 6,   # Keywords: peso 6x
-        title_str * 3,     # Título: peso 3x
-        director_str * 3,  # Diretor: peso 3x
-        cast_str * 2,      # Elenco: peso 2x
-        genre_str * 2,     # Gênero: peso 2x
-        description_str    # Descrição: peso 1x
-    ]
-    
-    combined_text = " ".join(features)
-    return preprocess_text_advanced(combined_text)
+                subprocess.run(["python", PROCESSOR_SCRIPT], check=True)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Erro ao executar processador: {e}")
+        search.swap(load_catalog_state())
+
+    with startup.stage('tfidf', 'bm25'):
+        load_analyzer()
+        state = with_lexical_index(search.current)
+        # Alterações incrementais ainda não incorporadas ao catálogo, reaplicadas antes de o índice
+        # ficar pronto: nenhuma busca ou alteração vê o catálogo sem elas, mesmo que as etapas
+        # seguintes falhem
+        with search.lock:
+            search.swap(replay_journal(state))
+    
+    with startup.stage('neighbors'):
+        # Calculada sobre o segmento principal; alterações feitas durante a etapa vêm do journal
+        state = with_neighbors(search.current)
+        with search.lock:
+            search.swap(replay_journal(state))
+
+    if CATALOG_WATCH:
+        catalog_watcher.start()
+
+def build_state() -> SearchState:
+    """Nova versão completa do catálogo, construída ao lado da que está servindo"""
+    return with_neighbors(with_lexical_index(load_catalog_state()))
+
+# =============================================================================
+# ALTERAÇÕES INCREMENTAIS (SEGMENTO DELTA)
+# =============================================================================
+
+def with_delta(state: SearchState, delta: DeltaSegment, deleted_ids) -> SearchState:
+    """Estado com outro delta/conjunto de remoções sobre o mesmo segmento principal"""
+    deleted_ids = frozenset(deleted_ids)
+    return state.evolve(delta=delta, deleted_ids=deleted_ids, **segment_view(state.main_movies, state.main_payloads, delta, deleted_ids))
+
+def apply_operation(state: SearchState, operation: Dict) -> SearchState:
+    """Aplica um upsert/delete sobre `state` com o vocabulário e o IDF do segmento principal"""
+    if operation['op'] == 'upsert':
+        movies = pd.DataFrame(operation['movies'])
+        delta = state.delta.upsert(movies, analyzer, state.tfidf, state.bm25)
+        return with_delta(state, delta, state.deleted_ids - set(movies['id'].tolist()))
+    ids = set(operation['ids'])
+    return with_delta(state, state.delta.remove(ids, state.tfidf, state.bm25), state.deleted_ids | ids)
+
+def mutate(operation: Dict) -> SearchState:
+    """Aplica, grava no journal e publica uma alteração; dispara o merge acima do limite"""
+    with search.lock:
+        # Aplicada antes de gravar: uma operação inválida não entra no journal
+        state = apply_operation(search.current, operation)
+        state = state.evolve(applied_seq=delta_journal.append(operation))
+        search.swap(state)
+    # O merge reconstrói todos os componentes: só depois que a inicialização terminou
+    if len(state.delta) + len(state.deleted_ids) >= DELTA_MERGE_THRESHOLD and startup.is_ready(*STARTUP_COMPONENTS):
+        search.reload(merge_state, "merge")
+    return state
+
+def replay_journal(state: SearchState) -> SearchState:
+    """Reaplica as operações do journal que `state` ainda não contém (inicialização, recarga, merge)"""
+    for entry in delta_journal.read(state.applied_seq):
+        try:
+            state = apply_operation(state, entry).evolve(applied_seq=entry['seq'])
+        except Exception as e:
+            logger.error(f"Operação {entry['seq']} do journal ignorada: {e}")
+    return state
+
+def merge_state() -> SearchState:
+    """Grava o catálogo com o delta incorporado e reconstrói o índice (roda como uma recarga)"""
+    with search.lock:
+        s = search.current
+    if len(s.delta) or s.deleted_ids:
+        movies = s.df_movies if s.alive is None else s.df_movies[s.alive]
+        save_movies(movies.drop(columns=['processed_features']), DATA_PATH)
+        delta_journal.compact(s.applied_seq)
+    return build_state()
+
+def delta_stats(state: SearchState) -> Dict:
+    return {
+        "movies": len(state.delta),
+        "deleted": len(state.deleted_ids),
+        "applied_seq": state.applied_seq,
+        "journal_pending": delta_journal.pending,
+        "merge_threshold": DELTA_MERGE_THRESHOLD,
+    }
 
 # =============================================================================
 # ALGORITMOS DE SIMILARIDADE
 # =============================================================================
 
-def tfidf_similarity(query: str, top_n: int = 10) -> tuple:
+def tfidf_similarity(state: SearchState, query: AnalyzedQuery, top_n: int = 10) -> tuple:
     """Calcula similaridade usando TF-IDF + Cosine Similarity"""
-    query_processed = preprocess_text_advanced(query)
-    query_vec = tfidf.transform([query_processed])
-    similarities = cosine_similarity(query_vec, tfidf_matrix).flatten()
-    
-    top_indices = similarities.argsort()[-top_n:][::-1]
-    top_scores = similarities[top_indices]
+    query_vec = state.tfidf.transform([query.text])
+    similarities = concat_scores(sparse_dot_scores(state.tfidf_postings, query_vec), state.delta.tfidf_scores(query_vec))
     
-    return top_indices, top_scores
+    return live_top_k(similarities, top_n, state.alive)
 
-def bm25_similarity(query: str, top_n: int = 10) -> tuple:
+def bm25_similarity(state: SearchState, query: AnalyzedQuery, top_n: int = 10) -> tuple:
     """Calcula similaridade usando BM25"""
-    query_processed = preprocess_text_advanced(query)
-    query_tokens = query_processed.split()
+    scores = concat_scores(state.bm25.get_scores(query.tokens), state.delta.bm25_scores(query.tokens))
     
-    scores = bm25.get_scores(query_tokens)
-    
-    top_indices = scores.argsort()[-top_n:][::-1]
-    top_scores = scores[top_indices]
-    
-    return top_indices, top_scores
+    return live_top_k(scores, top_n, state.alive)
 
-def normalize_scores(scores: np.ndarray) -> np.ndarray:
-    """Normaliza scores para o intervalo [0, 1]"""
-    min_s, max_s = scores.min(), scores.max()
-    if max_s - min_s > 0:
-        return (scores - min_s) / (max_s - min_s)
-    return np.zeros_like(scores)
-
-def hybrid_similarity(query: str, query_type: str, top_n: int = 10) -> tuple:
+def hybrid_similarity(state: SearchState, query: AnalyzedQuery, query_type: str, top_n: int = 10) -> tuple:
     """Combina TF-IDF e BM25 com pesos dinâmicos"""
     weights = HYBRID_WEIGHTS.get(query_type, HYBRID_WEIGHTS['general'])
     
-    # Obter scores de ambos os algoritmos
-    query_processed = preprocess_text_advanced(query)
-    
     # TF-IDF
-    query_vec = tfidf.transform([query_processed])
-    tfidf_scores = cosine_similarity(query_vec, tfidf_matrix).flatten()
+    query_vec = state.tfidf.transform([query.text])
+    tfidf_scores = concat_scores(sparse_dot_scores(state.tfidf_postings, query_vec), state.delta.tfidf_scores(query_vec))
     
     # BM25
-    query_tokens = query_processed.split()
-    bm25_scores = bm25.get_scores(query_tokens)
+    bm25_scores = concat_scores(state.bm25.get_scores(query.tokens), state.delta.bm25_scores(query.tokens))
     
-    # Normalizar
-    tfidf_norm = normalize_scores(tfidf_scores)
-    bm25_norm = normalize_scores(bm25_scores)
-    
-    # Combinar
-    combined_scores = (
-        weights['tfidf'] * tfidf_norm +
-        weights['bm25'] * bm25_norm
+    # Normalizar (min/max do corpus) e combinar apenas os melhores candidatos de cada sinal
+    indices, scores = fuse_top_k(
+        [(tfidf_scores, weights['tfidf']), (bm25_scores, weights['bm25'])],
+        top_n + dead_rows(state.alive), FUSION_CANDIDATE_DEPTH, FUSION_VERIFY
     )
-    
-    top_indices = combined_scores.argsort()[-top_n:][::-1]
-    top_scores = combined_scores[top_indices]
-    
-    return top_indices, top_scores
+    return drop_dead(indices, scores, state.alive, top_n)
+
+def similar_to_delta_movie(state: SearchState, row: int, limit: int) -> RawJSON:
+    """Similares de um filme do delta (fora da tabela de vizinhos), calculados na hora pelo TF-IDF"""
+    vec = state.delta.tfidf_matrix[row - len(state.main_movies)]
+    scores = concat_scores(sparse_dot_scores(state.tfidf_postings, vec), state.delta.tfidf_scores(vec))
+    scores[row] = -np.inf  # Um filme não é similar a si mesmo
+    indices, values = live_top_k(scores, min(max(limit, 0), SIMILAR_MOVIES_K), state.alive)
+    return similar_records(state.payloads, indices, values)
 
 # =============================================================================
 # RE-RANKING
@@ -412,16 +481,53 @@ def rerank_results(recommendations: List[Dict]) -> List[Dict]:
 # CACHE
 # =============================================================================
 
-@lru_cache(maxsize=500)
-def cached_recommend(query_hash: str, algorithm: str, use_synonyms: bool, top_n: int) -> str:
-    """Cache para queries frequentes (retorna JSON string)"""
-    # Este é um placeholder - a lógica real está em recommend()
-    pass
+# Respostas do /recommend por (query normalizada, algoritmo, sinônimos, top_n)
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+# Respostas de /movies, /genres, gêneros e similares, serializadas e comprimidas por versão
+catalog_responses = CatalogResponses(ResultCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL), CATALOG_CACHE_MAX_AGE,
+                                     f"{app.title} {app.version}")
+
+def bind_caches(state: SearchState):
+    result_cache.bind_version(state.version)
+    catalog_responses.cache.bind_version(state.version)
+
+# Estado servido: cada requisição lê `search.current` uma vez e usa só essa versão;
+# ao trocar de versão os caches de resultados e de respostas são esvaziados
+search = StateHolder(SearchState(), on_swap=bind_caches, catch_up=lambda state: replay_journal(state))
+
+# Operações incrementais ainda não incorporadas ao catálogo
+delta_journal = DeltaJournal(DELTA_JOURNAL_PATH)
+
+# Recarga automática quando os arquivos do catálogo mudam (CATALOG_WATCH)
+catalog_watcher = CatalogWatcher(
+    [DATA_PATH, CSV_DATA_PATH],
+    lambda: search.current.catalog_signature,
+    lambda: search.reload(build_state, "watch"),
+    CATALOG_WATCH_INTERVAL
+)
+
+# Estado da carga em segundo plano (liveness/readiness)
+startup = StartupProgress(STARTUP_COMPONENTS, REQUIRED_COMPONENTS)
+
+def require_ready(*components):
+    """503 + Retry-After enquanto algum componente necessário ainda carrega"""
+    missing = startup.not_ready(*components)
+    if missing:
+        raise HTTPException(status_code=503, detail=f"Carregando: {', '.join(missing)}",
+                            headers={"Retry-After": str(STARTUP_RETRY_AFTER)})
 
-def get_query_hash(query: str, algorithm: str, use_synonyms: bool) -> str:
-    """Gera hash único para a query"""
-    key = f"{query.lower().strip()}:{algorithm}:{use_synonyms}"
-    return hashlib.md5(key.encode()).hexdigest()
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Endpoints /admin/*: X-Admin-Token igual a ADMIN_TOKEN ou, sem token configurado, só localhost"""
+    if ADMIN_TOKEN:
+        allowed = hmac.compare_digest((x_admin_token or '').encode(), ADMIN_TOKEN.encode())
+    else:
+        allowed = request.client is not None and request.client.host in ('127.0.0.1', '::1')
+    if not allowed:
+        raise HTTPException(status_code=403, detail="Acesso administrativo negado")
+
+# Scoring fora do threadpool do AnyIO, com no máximo SCORING_QUEUE_SIZE requisições na fila
+scoring_executor = BoundedExecutor(SCORING_WORKERS, SCORING_QUEUE_SIZE)
 
 # =============================================================================
 # ENDPOINTS DA API
@@ -429,130 +535,188 @@ def get_query_hash(query: str, algorithm: str, use_synonyms: bool) -> str:
 
 @app.on_event("startup")
 async def startup_event():
-    """Carrega dados na inicialização"""
-    load_data()
+    """Carrega os dados em segundo plano: a porta responde (/health/live) desde já"""
+    startup.start_background(load_data)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    catalog_watcher.stop()
+    scoring_executor.shutdown()
 
 @app.get("/")
 def root():
     return {
         "message": "NetRecs API v2.0",
         "endpoints": {
-            "/movies": "Lista filmes populares",
+            "/movies": "Lista filmes populares (paginada por cursor, com projeção de campos)",
             "/genres": "Lista gêneros disponíveis",
-            "/movies/by-genre/{genre}": "Filmes por gênero",
+            "/movies/by-genre": "Primeira página de vários gêneros",
+            "/movies/by-genre/{genre}": "Filmes por gênero (paginada por cursor)",
+            "/movies/{movie_id}": "Dados completos de um filme",
+            "/movies/{movie_id}/similar": "Filmes similares a um filme",
             "/recommend": "Recomendações (POST)",
-            "/health": "Status da API"
+            "/health": "Status da API",
+            "/health/live": "Liveness (processo no ar)",
+            "/health/ready": "Readiness (pronto para o /recommend)",
+            "/admin/reload": "Recarrega o catálogo sem downtime (POST)",
+            "/admin/movies": "Inclui/altera (PUT, POST em lote) ou remove (DELETE) filmes sem reconstruir o índice",
+            "/admin/merge": "Incorpora as alterações ao catálogo e reconstrói o índice (POST)"
         }
     }
 
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """200 quando o /recommend já pode ser servido; 503 enquanto carrega ou se falhou"""
+    return JSONResponse(
+        status_code=200 if startup.serving() else 503,
+        content={"status": startup.status(), "components": startup.snapshot()}
+    )
+
 @app.get("/health")
 def health_check():
+    s = search.current
+    status = startup.status()
     return {
-        "status": "healthy",
-        "movies_loaded": len(df_movies) if not df_movies.empty else 0,
-        "tfidf_ready": tfidf_matrix is not None,
-        "bm25_ready": bm25 is not None
+        "status": "healthy" if status == "ready" else status,
+        "components": startup.snapshot(),
+        "movies_loaded": len(s.df_movies) - dead_rows(s.alive) if not s.df_movies.empty else 0,
+        "tfidf_ready": s.tfidf_matrix is not None,
+        "bm25_ready": s.bm25 is not None,
+        "index_version": s.index_version,
+        "version": s.version,
+        "delta": delta_stats(s),
+        "catalog": {"source": s.source, "loaded_at": s.loaded_at},
+        "reload": dict(search.stats(), watching=catalog_watcher.running),
+        "result_cache": result_cache.stats(),
+        "response_cache": catalog_responses.stats(),
+        "scoring_executor": scoring_executor.stats(),
+        "memory": process_memory()
     }
 
+def parse_fields(state: SearchState, fields: Optional[str]) -> Optional[tuple]:
+    """Campos do parâmetro `fields=` (None = todos); 400 se algum não existir"""
+    try:
+        return state.payloads.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def catalog_page(request: Request, state: SearchState, key: tuple, order: np.ndarray, limit: int,
+                 cursor: Optional[str], fields: Optional[str]):
+    """Página de `order` (linhas já ordenadas) com o cursor da seguinte no cabeçalho X-Next-Cursor"""
+    fields = parse_fields(state, fields)
+    try:
+        rows, next_page = paginate(order, limit, cursor, state.id_to_row, state.df_movies['id'].to_numpy())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {'X-Next-Cursor': next_page} if next_page else None
+    return catalog_responses.respond(request, state.version, key + (limit, cursor, fields),
+                                     lambda: state.payloads.rows(rows, fields), headers)
+
 @app.get("/movies")
-def get_movies():
-    if df_movies.empty:
+def get_movies(request: Request, limit: int = MOVIES_PAGE_LIMIT, cursor: Optional[str] = None,
+               fields: Optional[str] = None):
+    """Filmes por popularidade, em páginas de até MOVIES_PAGE_LIMIT (slices da ordem pré-computada)"""
+    require_ready('data')
+    s = search.current
+    if s.df_movies.empty:
         return []
-    return df_movies.nlargest(200, 'popularity').to_dict(orient="records")
+    limit = min(max(limit, 0), MOVIES_PAGE_LIMIT)
+    return catalog_page(request, s, ('movies',), s.popular_rows, limit, cursor, fields)
 
 @app.get("/genres")
-def get_genres():
-    if df_movies.empty:
-        return []
-    
-    all_genres = set()
-    for genres_str in df_movies['genre']:
-        try:
-            if isinstance(genres_str, str):
-                genres_list = ast.literal_eval(genres_str)
-                if isinstance(genres_list, list):
-                    all_genres.update(genres_list)
-        except:
-            pass
-    
-    return sorted(list(all_genres))
+def get_genres(request: Request):
+    require_ready('data')
+    s = search.current
+    return catalog_responses.respond(request, s.version, ('genres',), lambda: s.all_genres)
+
+@app.get("/movies/by-genre")
+def get_movies_by_genres(request: Request, genres: Optional[List[str]] = Query(None), limit: int = 20,
+                         fields: Optional[str] = None):
+    """Top-N filmes de vários gêneros (ou de todos) em uma única resposta, com o cursor da página seguinte"""
+    require_ready('data')
+    s = search.current
+    limit = min(max(limit, 0), MAX_GENRE_ROW_LIMIT)
+    fields = parse_fields(s, fields)
+
+    def build():
+        ids = s.df_movies['id'].to_numpy() if not s.df_movies.empty else []
+        if genres:
+            return build_genre_rows(s.payloads, s.genre_index, genres, limit, ids, fields)
+        # Linhas de todos os gêneros são serializadas uma vez por limite e campos (e por versão do catálogo)
+        if (limit, fields) not in s.genre_rows_cache:
+            s.genre_rows_cache[limit, fields] = build_genre_rows(s.payloads, s.genre_index, s.all_genres, limit,
+                                                                 ids, fields)
+        return s.genre_rows_cache[limit, fields]
+    return catalog_responses.respond(request, s.version, ('genre-rows', tuple(genres or ()), limit, fields), build)
 
 @app.get("/movies/by-genre/{genre}")
-def get_movies_by_genre(genre: str, limit: int = 20):
-    if df_movies.empty:
+def get_movies_by_genre(request: Request, genre: str, limit: int = 20, cursor: Optional[str] = None,
+                        fields: Optional[str] = None):
+    require_ready('data')
+    s = search.current
+    rows = s.genre_index.get(genre)
+    if rows is None:
         return []
-    
-    filtered_movies = []
-    for idx, row in df_movies.iterrows():
-        try:
-            genres_str = row['genre']
-            if isinstance(genres_str, str):
-                genres_list = ast.literal_eval(genres_str)
-                if isinstance(genres_list, list) and genre in genres_list:
-                    filtered_movies.append(row.to_dict())
-        except:
-            pass
-    
-    filtered_df = pd.DataFrame(filtered_movies)
-    if not filtered_df.empty:
-        filtered_df = filtered_df.nlargest(limit, 'popularity')
-        return filtered_df.to_dict(orient="records")
-    
-    return []
 
-@app.post("/recommend")
-def recommend(request: RecommendationRequest):
-    """
-    Endpoint principal de recomendação com múltiplos algoritmos.
-    
-    Parâmetros:
-    - query: Texto de busca
-    - algorithm: "tfidf", "bm25", ou "hybrid" (padrão)
-    - use_synonyms: Expandir query com sinônimos (padrão: True)
-    - top_n: Número de resultados (padrão: 10)
-    """
-    if df_movies.empty or tfidf_matrix is None:
-        return {"movies": [], "query_info": {}, "algorithm_used": "none"}
+    # Cada página é um slice da lista pré-ordenada do gênero
+    limit = min(max(limit, 0), MAX_GENRE_ROW_LIMIT)
+    return catalog_page(request, s, ('by-genre', genre), rows, limit, cursor, fields)
+
+@app.get("/movies/{movie_id}")
+def get_movie(request: Request, movie_id: int, fields: Optional[str] = None):
+    """Dados de um filme (ex.: o modal, a partir de um card com só alguns campos)"""
+    require_ready('data')
+    s = search.current
+    row = s.id_to_row.get(movie_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    fields = parse_fields(s, fields)
+    return catalog_responses.respond(request, s.version, ('movie', movie_id, fields),
+                                     lambda: s.payloads.record(row, fields))
+
+@app.get("/movies/{movie_id}/similar")
+def get_similar_movies(request: Request, movie_id: int, limit: int = 10):
+    """Filmes mais parecidos com um filme do catálogo (tabela de vizinhos pré-computada)"""
+    require_ready('neighbors')
+    s = search.current
+    row = s.id_to_row.get(movie_id)
+    if row is None or s.neighbor_ids is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    key = ('similar', movie_id, limit)
+    if row >= len(s.main_movies):
+        return catalog_responses.respond(request, s.version, key, lambda: similar_to_delta_movie(s, row, limit))
+    return catalog_responses.respond(
+        request, s.version, key,
+        lambda: lookup_similar(s.payloads, s.neighbor_ids, s.neighbor_scores, row, limit, s.alive)
+    )
 
-    query = request.query
-    algorithm = request.algorithm
-    use_synonyms = request.use_synonyms
-    top_n = request.top_n
-    
-    # Detectar tipo de query
-    query_type = detect_query_type(query)
-    
-    # Expandir com sinônimos se solicitado
-    expanded_query = query
-    if use_synonyms:
-        expanded_query = expand_query_with_synonyms(query)
+def compute_recommendations(state: SearchState, expanded_query: str, query_type: str, algorithm: str,
+                            top_n: int) -> list:
+    """Busca, re-ranking e scores finais (parte cacheada do /recommend), sobre uma única versão do estado"""
+    # Analisar a query uma única vez para todos os algoritmos
+    analyzed = analyzer.analyze_query(expanded_query)
     
     # Selecionar algoritmo
     if algorithm == "tfidf":
-        indices, scores = tfidf_similarity(expanded_query, top_n * 2)
+        indices, scores = tfidf_similarity(state, analyzed, top_n * 2)
     elif algorithm == "bm25":
-        indices, scores = bm25_similarity(expanded_query, top_n * 2)
+        indices, scores = bm25_similarity(state, analyzed, top_n * 2)
     else:  # hybrid
-        indices, scores = hybrid_similarity(expanded_query, query_type, top_n * 2)
+        indices, scores = hybrid_similarity(state, analyzed, query_type, top_n * 2)
     
     # Normalizar scores
     if len(scores) > 0 and scores.max() > 0:
         scores = scores / scores.max()
     
-    # Construir lista de recomendações
-    recommendations = []
-    for i, idx in enumerate(indices):
-        if scores[i] > 0:
-            movie = df_movies.iloc[idx].to_dict()
-            
-            movie['similarity_score'] = float(scores[i])
-            
-            # Limpar NaN
-            for k, v in movie.items():
-                if pd.isna(v):
-                    movie[k] = ""
-            
-            recommendations.append(movie)
+    # Construir lista de recomendações (só os campos do re-ranking; o filme já está serializado)
+    recommendations = [
+        state.payloads.hit(idx, similarity_score=float(scores[i]))
+        for i, idx in enumerate(indices) if scores[i] > 0
+    ]
     
     # Re-ranking
     recommendations = rerank_results(recommendations)
@@ -566,6 +730,44 @@ def recommend(request: RecommendationRequest):
         for rec in recommendations:
             rec['score'] = round(rec['final_score'] / max_final * 0.95, 4) if max_final > 0 else 0
     
+    return state.payloads.render(recommendations, RESULT_FIELDS)
+
+async def run_scoring(fn, *args):
+    """Executa o scoring no pool limitado; com a fila cheia responde 503 + Retry-After"""
+    try:
+        return await scoring_executor.run(fn, *args)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def recommendation_payload(request: RecommendationRequest) -> Dict:
+    """Corpo do /recommend; os filmes já vêm serializados (RawJSON)"""
+    require_ready(*REQUIRED_COMPONENTS)
+    # Versão lida uma única vez: uma recarga no meio da requisição não a afeta
+    s = search.current
+    if s.df_movies.empty or s.tfidf_matrix is None:
+        return {"movies": [], "query_info": {}, "algorithm_used": "none"}
+
+    query = request.query
+    algorithm = request.algorithm
+    use_synonyms = request.use_synonyms
+    top_n = request.top_n
+    
+    # Detectar tipo de query
+    query_type = detect_query_type(query)
+    
+    # Expansão por requisição (consulta à tabela de sinônimos): o texto ecoado em query_info
+    # é sempre o desta query, mesmo quando os filmes vêm do cache
+    expanded_query = expand_query_with_synonyms(s, query) if use_synonyms else query
+    
+    # Filmes cacheados pela query normalizada (maiúsculas/espaços não mudam a busca)
+    cache_key = result_cache.make_key(query, algorithm, use_synonyms, top_n)
+    recommendations = result_cache.get(cache_key)
+    if recommendations is None:
+        recommendations = await run_scoring(
+            compute_recommendations, s, expanded_query, query_type, algorithm, top_n
+        )
+        result_cache.put(cache_key, recommendations, version=s.version)
+    
     # Informações sobre a query
     query_info = {
         "original_query": query,
@@ -580,24 +782,75 @@ def recommend(request: RecommendationRequest):
         "algorithm_used": algorithm
     }
 
+@app.post("/recommend")
+async def recommend(request: RecommendationRequest):
+    """
+    Endpoint principal de recomendação com múltiplos algoritmos.
+    
+    Parâmetros:
+    - query: Texto de busca
+    - algorithm: "tfidf", "bm25", ou "hybrid" (padrão)
+    - use_synonyms: Expandir query com sinônimos (padrão: True)
+    - top_n: Número de resultados (padrão: 10)
+    """
+    return PayloadResponse(await recommendation_payload(request))
+
 # Endpoint simplificado para compatibilidade com frontend existente
 @app.post("/recommend/simple")
-def recommend_simple(request: RecommendationRequest):
+async def recommend_simple(request: RecommendationRequest):
     """Endpoint simplificado que retorna apenas a lista de filmes"""
-    result = recommend(request)
-    return result["movies"]
+    result = await recommendation_payload(request)
+    return PayloadResponse(result["movies"])
+
+@app.post("/admin/reload", status_code=202)
+def admin_reload(_: None = Depends(require_admin)):
+    """Recarrega catálogo e índices em segundo plano; a versão atual serve até a troca"""
+    require_ready(*STARTUP_COMPONENTS)
+    if not search.reload(build_state, "admin"):
+        raise HTTPException(status_code=409, detail="Recarga já em andamento")
+    return {"status": "reloading", "index_version": search.current.index_version}
+
+def movie_records(movies: List[MovieUpsert]) -> List[Dict]:
+    if not movies:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if any(movie.id is None for movie in movies):
+        raise HTTPException(status_code=400, detail="Todo filme precisa de id")
+    return [movie.model_dump() for movie in movies]
+
+@app.put("/admin/movies/{movie_id}")
+def upsert_movie(movie_id: int, movie: MovieUpsert, _: None = Depends(require_admin)):
+    """Inclui ou altera um filme no segmento delta (sem reconstruir o índice)"""
+    movie.id = movie_id
+    return upsert_movies([movie])
+
+@app.post("/admin/movies")
+def upsert_movies(movies: List[MovieUpsert], _: None = Depends(require_admin)):
+    """Inclui ou altera filmes em lote no segmento delta"""
+    require_ready(*REQUIRED_COMPONENTS)
+    state = mutate({"op": "upsert", "movies": movie_records(movies)})
+    return {"status": "ok", "version": state.version, "delta": delta_stats(state)}
+
+@app.delete("/admin/movies/{movie_id}")
+def delete_movie(movie_id: int, _: None = Depends(require_admin)):
+    """Remove um filme (tombstone no segmento principal ou remoção do delta)"""
+    require_ready(*REQUIRED_COMPONENTS)
+    if movie_id not in search.current.id_to_row:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    state = mutate({"op": "delete", "ids": [movie_id]})
+    return {"status": "ok", "version": state.version, "delta": delta_stats(state)}
+
+@app.post("/admin/merge", status_code=202)
+def admin_merge(_: None = Depends(require_admin)):
+    """Incorpora o delta ao catálogo e reconstrói o índice em segundo plano"""
+    require_ready(*STARTUP_COMPONENTS)
+    if not search.reload(merge_state, "merge"):
+        raise HTTPException(status_code=409, detail="Recarga já em andamento")
+    return {"status": "merging", "delta": delta_stats(search.current)}
 
 # =============================================================================
 # INICIALIZAÇÃO
 # =============================================================================
 
-# Variáveis globais
-df_movies = pd.DataFrame()
-tfidf = None
-tfidf_matrix = None
-bm25 = None
-tokenized_corpus = []
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
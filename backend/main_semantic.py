@@ -12,48 +12,52 @@ Autor: Wagner Approves Team
 Versão: 3.0 (Semantic)
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from rank_bm25 import BM25Okapi
-from sentence_transformers import SentenceTransformer
-import nltk
-from nltk.corpus import stopwords, wordnet
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from nltk import pos_tag
-import string
-import unicodedata
+import hmac
 import os
 import subprocess
+import time
 import ast
-from functools import lru_cache
-import hashlib
+from catalog import (catalog_source, load_movies, build_genre_index, build_genre_rows, build_id_index,
+                     build_popularity_index, catalog_fingerprint)
+from index_store import INDEX_PROFILES, ensure_index
+from text_processing import AnalyzedQuery, get_analyzer
+from nltk_resources import required_resources, require_resources
+from result_cache import ResultCache
+from http_cache import CatalogResponses
+from pagination import paginate
+from admission import BoundedExecutor, Overloaded
+from readiness import StartupProgress
+from ranking import fuse_top_k, normalize_scores
+from sparse_scoring import sparse_dot_scores
+from neighbors import ensure_neighbor_table, lookup_similar, similar_records
+from shared_artifacts import process_memory
+from hot_reload import CatalogWatcher, ServingState, StateHolder, file_signature
+from payloads import MoviePayloads, PayloadResponse, RawJSON
+from segments import (DeltaJournal, DeltaSegment, concat_scores, dead_rows, drop_dead, live_top_k, merge_candidates,
+                      segment_view)
+from data_processor import save_movies
+from embedding_store import sync_store
+from ann_index import ANN_BACKENDS, dense_scores, load_or_build, min_score
+from query_encoder import QueryEncoder
+from onnx_encoder import OnnxSentenceEncoder, exported_model_exists, onnx_runtime_available
 import logging
-import pickle
-from pathlib import Path
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Download NLTK resources
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
-nltk.download('punkt_tab', quiet=True)
-nltk.download('wordnet', quiet=True)
-nltk.download('averaged_perceptron_tagger', quiet=True)
-nltk.download('averaged_perceptron_tagger_eng', quiet=True)
-
 app = FastAPI(
     title="Wagner Approves API",
     description="Sistema de Recomendação de Filmes com Busca Semântica (SBERT)",
-    version="3.0"
+    version="3.0",
+    default_response_class=PayloadResponse
 )
 
 # CORS configuration
@@ -63,19 +67,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor da próxima página (pagination.py)
 )
 
 # =============================================================================
 # CONFIGURAÇÕES E CONSTANTES
 # =============================================================================
 
-DATA_PATH = "data/processed_movies.csv"
+DATA_PATH = "data/processed_movies.arrow"
+CSV_DATA_PATH = "data/processed_movies.csv"  # Exportação legada, ainda aceita
+INDEX_PROFILE = "lexical"  # Perfil do índice gerado por backend/build_index.py
 PROCESSOR_SCRIPT = "backend/data_processor.py"
-EMBEDDINGS_CACHE_PATH = "data/sbert_embeddings.pkl"
+EMBEDDINGS_STORE_PATH = "data/sbert_embeddings"  # Store .npy memory-mapped (manifest + gerações)
+EMBEDDINGS_DTYPE = "int8"  # "int8" (escala por linha, 4x menor que float32) ou "float16"
+NEIGHBORS_PATH = "data/neighbors_semantic.npz"
+
+# Busca SBERT: "exact" (varredura completa), "ivf" ou "hnsw" (requer hnswlib).
+# Os índices ANN ficam em EMBEDDINGS_STORE_PATH; a requisição pode escolher outro backend
+ANN_BACKEND = "exact"
+ANN_BUILD = ("ivf", "hnsw")  # Índices construídos na inicialização, além do exact
+IVF_NPROBE = 8   # Listas visitadas por query no IVF
+HNSW_EF = 64     # Largura da busca no HNSW
 
 # Modelo SBERT (leve e eficiente)
 SBERT_MODEL_NAME = "all-MiniLM-L6-v2"  # ~80MB, rápido e preciso
 
+# Runtime do encoder: "onnx" (ONNX Runtime, sem torch), "torch" (SentenceTransformer)
+# ou "auto" (ONNX se o modelo exportado por backend/export_onnx.py existir)
+SBERT_BACKEND = "auto"
+ONNX_MODEL_DIR = f"data/onnx/{SBERT_MODEL_NAME}"
+ONNX_QUANTIZED = False  # Usa model.int8.onnx (export_onnx.py --quantize)
+
+# Codificação de queries: cache LRU de embeddings e micro-batching de requisições concorrentes
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+ENCODE_MAX_BATCH = 32     # Queries por forward pass
+ENCODE_MAX_WAIT_MS = 5.0  # Espera máxima por outras queries após a primeira
+
 # Pesos para o sistema híbrido triplo
 HYBRID_WEIGHTS = {
     'semantic': {        # Query semântica complexa
@@ -100,6 +127,11 @@ HYBRID_WEIGHTS = {
     }
 }
 
+# Pesos das fontes na tabela de vizinhos (/movies/{id}/similar)
+SIMILAR_WEIGHTS = {'tfidf': 0.4, 'sbert': 0.6}
+SIMILAR_MOVIES_K = 20
+PREPROCESS_WORKERS = None  # Processos no pré-processamento sem índice pronto (None = todos os núcleos)
+
 # Pesos para re-ranking
 RERANK_WEIGHTS = {
     'similarity': 0.60,
@@ -108,6 +140,49 @@ RERANK_WEIGHTS = {
     'confidence': 0.10
 }
 
+# Campos de score acrescentados ao JSON pré-serializado de cada filme do /recommend
+RESULT_FIELDS = ('similarity_score', 'final_score', 'score', 'score_breakdown')
+
+# Fusão híbrida: funde só a união dos FUSION_CANDIDATE_DEPTH melhores de cada sinal;
+# se o limite superior de quem ficou de fora não garantir o top-k, refaz a fusão no
+# corpus inteiro (ranking.py). FUSION_VERIFY compara cada resultado com a fusão completa
+FUSION_CANDIDATE_DEPTH = 100
+FUSION_VERIFY = False
+
+# Cache de resultados do /recommend (LRU + TTL, invalidado ao trocar de índice)
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_TTL = 600  # segundos
+
+# Cache HTTP dos endpoints de catálogo (ETag/304 + corpo pré-comprimido, invalidado pela versão)
+CATALOG_CACHE_MAX_AGE = 60   # segundos de Cache-Control; depois o navegador revalida com o ETag
+RESPONSE_CACHE_SIZE = 256    # Corpos guardados (combinações de endpoint e parâmetros)
+RESPONSE_CACHE_TTL = 3600    # segundos
+
+# Pool de scoring do /recommend: threads dedicadas e fila de admissão limitada
+SCORING_WORKERS = None    # None = um por núcleo
+SCORING_QUEUE_SIZE = 64   # Requisições aguardando; além disso responde 503 + Retry-After
+
+# Inicialização em segundo plano: o /recommend responde com TF-IDF + BM25 assim
+# que o índice lexical fica pronto, antes de o SBERT terminar de carregar
+STARTUP_COMPONENTS = ('data', 'tfidf', 'bm25', 'sbert', 'neighbors')
+REQUIRED_COMPONENTS = ('data', 'tfidf', 'bm25')
+STARTUP_RETRY_AFTER = 5  # segundos sugeridos enquanto os dados carregam
+
+# Recarga do catálogo sem reiniciar: POST /admin/reload e/ou monitoramento dos arquivos
+CATALOG_WATCH = False         # Recarrega sozinho quando DATA_PATH/CSV_DATA_PATH mudam
+CATALOG_WATCH_INTERVAL = 5.0  # segundos entre verificações
+ADMIN_TOKEN = os.getenv('NETRECS_ADMIN_TOKEN', '')  # Exigido em /admin/* (header X-Admin-Token); vazio = só localhost
+
+# Alterações incrementais (/admin/movies): segmento delta + journal, incorporados ao catálogo no merge
+DELTA_JOURNAL_PATH = "data/catalog_delta.jsonl"
+DELTA_MERGE_THRESHOLD = 200  # Filmes no delta (incluídos + removidos) que disparam o merge em segundo plano
+
+# Limite de filmes por linha no endpoint de gêneros em lote e por página de um gênero
+MAX_GENRE_ROW_LIMIT = 100
+
+# Tamanho máximo (e padrão) de uma página do /movies
+MOVIES_PAGE_LIMIT = 200
+
 # Gêneros conhecidos
 KNOWN_GENRES = [
     'action', 'adventure', 'animation', 'comedy', 'crime', 'documentary',
@@ -126,13 +201,97 @@ SEMANTIC_INDICATORS = [
 # VARIÁVEIS GLOBAIS
 # =============================================================================
 
-df_movies = pd.DataFrame()
-tfidf = None
-tfidf_matrix = None
-bm25 = None
-tokenized_corpus = None
+class SearchState(ServingState):
+    """Catálogo, índices e embeddings de uma versão, publicados juntos (ver hot_reload.py)"""
+
+    def __init__(self, **fields):
+        self.df_movies = pd.DataFrame()
+        self.payloads = MoviePayloads()  # JSON de cada linha de df_movies (payloads.py)
+        self.source = None             # Arquivo do catálogo carregado
+        self.catalog_signature = None  # mtime/tamanho dos arquivos do catálogo na carga
+        self.loaded_at = None
+        self.popular_rows = np.zeros(0, dtype=np.int64)  # Linhas vivas por popularidade (páginas do /movies)
+        self.genre_index = {}
+        self.all_genres = []
+        self.genre_rows_cache = {}
+        self.id_to_row = {}
+        self.tfidf = None
+        self.tfidf_matrix = None
+        self.tfidf_postings = None
+        self.bm25 = None
+        self.index_version = None      # Versão do índice lexical
+        self.main_movies = pd.DataFrame()  # Segmento principal (df_movies = principal + delta)
+        self.main_payloads = MoviePayloads()
+        self.delta = DeltaSegment()
+        self.deleted_ids = frozenset()  # Ids removidos do segmento principal
+        self.alive = None              # Máscara de linhas vivas de df_movies (None = todas)
+        self.applied_seq = 0           # Última operação do journal aplicada
+        self.embedding_store = None
+        self.ann_searchers = {}
+        self.neighbor_ids = None
+        self.neighbor_scores = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def version(self) -> Optional[str]:
+        """Versão servida: índice lexical + operações incrementais aplicadas"""
+        if not self.applied_seq:
+            return self.index_version
+        return f"{self.index_version}+{self.applied_seq}"
+
+# Modelo SBERT: carregado uma vez, não muda com o catálogo
 sbert_model = None
-sbert_embeddings = None
+sbert_model_id = SBERT_MODEL_NAME  # Espaço de embeddings (muda com o ONNX int8)
+query_encoder = None
+
+# Respostas do /recommend por (query normalizada, algoritmo, top_n)
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+# Respostas de /movies, /genres, gêneros e similares, serializadas e comprimidas por versão
+catalog_responses = CatalogResponses(ResultCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL), CATALOG_CACHE_MAX_AGE,
+                                     f"{app.title} {app.version}")
+
+def bind_caches(state: SearchState):
+    result_cache.bind_version(state.version)
+    catalog_responses.cache.bind_version(state.version)
+
+# Estado servido: cada requisição lê `search.current` uma vez e usa só essa versão;
+# ao trocar de versão os caches de resultados e de respostas são esvaziados
+search = StateHolder(SearchState(), on_swap=bind_caches, catch_up=lambda state: replay_journal(state))
+
+# Operações incrementais ainda não incorporadas ao catálogo
+delta_journal = DeltaJournal(DELTA_JOURNAL_PATH)
+
+# Recarga automática quando os arquivos do catálogo mudam (CATALOG_WATCH)
+catalog_watcher = CatalogWatcher(
+    [DATA_PATH, CSV_DATA_PATH],
+    lambda: search.current.catalog_signature,
+    lambda: search.reload(build_state, "watch"),
+    CATALOG_WATCH_INTERVAL
+)
+
+# Estado da carga em segundo plano (liveness/readiness)
+startup = StartupProgress(STARTUP_COMPONENTS, REQUIRED_COMPONENTS)
+
+def require_ready(*components):
+    """503 + Retry-After enquanto algum componente necessário ainda carrega"""
+    missing = startup.not_ready(*components)
+    if missing:
+        raise HTTPException(status_code=503, detail=f"Carregando: {', '.join(missing)}",
+                            headers={"Retry-After": str(STARTUP_RETRY_AFTER)})
+
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Endpoints /admin/*: X-Admin-Token igual a ADMIN_TOKEN ou, sem token configurado, só localhost"""
+    if ADMIN_TOKEN:
+        allowed = hmac.compare_digest((x_admin_token or '').encode(), ADMIN_TOKEN.encode())
+    else:
+        allowed = request.client is not None and request.client.host in ('127.0.0.1', '::1')
+    if not allowed:
+        raise HTTPException(status_code=403, detail="Acesso administrativo negado")
+
+# Scoring fora do threadpool do AnyIO, com no máximo SCORING_QUEUE_SIZE requisições na fila
+scoring_executor = BoundedExecutor(SCORING_WORKERS, SCORING_QUEUE_SIZE)
 
 # =============================================================================
 # CLASSES E MODELOS
@@ -142,64 +301,42 @@ class RecommendationRequest(BaseModel):
     query: str
     algorithm: Optional[str] = "hybrid"  # "tfidf", "bm25", "sbert", "hybrid"
     top_n: Optional[int] = 10
+    ann: Optional[str] = None  # "exact", "ivf", "hnsw" (padrão: ANN_BACKEND)
+    nprobe: Optional[int] = None  # IVF: listas visitadas
+    ef: Optional[int] = None  # HNSW: largura da busca
 
 class RecommendationResponse(BaseModel):
     movies: List[Dict]
     query_info: Dict
     algorithm_used: str
 
+class MovieUpsert(BaseModel):
+    id: Optional[int] = None  # Obrigatório no lote; no PUT vem do caminho
+    title: str
+    description: Optional[str] = ""
+    genre: Optional[List[str]] = []
+    image_url: Optional[str] = ""
+    director: Optional[str] = ""
+    cast: Optional[List[str]] = []
+    keywords: Optional[List[str]] = []
+    vote_average: Optional[float] = 0.0
+    vote_count: Optional[int] = 0
+    popularity: Optional[float] = 0.0
+
 # =============================================================================
 # PROCESSAMENTO DE TEXTO
 # =============================================================================
 
-lemmatizer = WordNetLemmatizer()
-
-def get_wordnet_pos(tag: str) -> str:
-    """Converte POS tag do Penn Treebank para formato WordNet"""
-    if tag.startswith('J'):
-        return wordnet.ADJ
-    elif tag.startswith('V'):
-        return wordnet.VERB
-    elif tag.startswith('N'):
-        return wordnet.NOUN
-    elif tag.startswith('R'):
-        return wordnet.ADV
-    return wordnet.NOUN
-
-def lemmatize_tokens(tokens: List[str]) -> List[str]:
-    """Aplica lemmatização considerando POS tags"""
-    if not tokens:
-        return []
-    try:
-        pos_tags = pos_tag(tokens)
-        return [lemmatizer.lemmatize(word, get_wordnet_pos(tag)) 
-                for word, tag in pos_tags]
-    except Exception as e:
-        logger.warning(f"Erro na lemmatização: {e}")
-        return tokens
+# Analisador compartilhado com o índice (mesmas etapas para documentos e queries),
+# criado pela carga em segundo plano depois de verificar os recursos do NLTK
+analyzer = None
 
-def preprocess_text(text: str, use_lemmatization: bool = True) -> str:
-    """Pré-processamento de texto para TF-IDF/BM25"""
-    if not isinstance(text, str):
-        return ""
-    
-    text = text.lower()
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    
-    try:
-        tokens = word_tokenize(text)
-    except Exception:
-        tokens = text.split()
-    
-    stop_words = set(stopwords.words('english'))
-    tokens = [t for t in tokens if t not in stop_words and len(t) > 1]
-    
-    if use_lemmatization:
-        tokens = lemmatize_tokens(tokens)
-    
-    return " ".join(tokens)
+def load_analyzer():
+    """Verifica os recursos do NLTK (sem download) e cria o analisador do perfil"""
+    global analyzer
+    config = INDEX_PROFILES[INDEX_PROFILE]['analyzer']
+    require_resources(required_resources(config['use_lemmatization']))
+    analyzer = get_analyzer(**config)
 
 def detect_query_type(query: str) -> str:
     """Detecta o tipo de busca para ajustar pesos"""
@@ -231,9 +368,21 @@ def detect_query_type(query: str) -> str:
 
 def load_sbert_model():
     """Carrega o modelo Sentence-BERT"""
-    global sbert_model
-    logger.info(f"Carregando modelo SBERT: {SBERT_MODEL_NAME}...")
-    sbert_model = SentenceTransformer(SBERT_MODEL_NAME)
+    global sbert_model, sbert_model_id, query_encoder
+    use_onnx = SBERT_BACKEND == "onnx" or (
+        SBERT_BACKEND == "auto" and onnx_runtime_available() and exported_model_exists(ONNX_MODEL_DIR, ONNX_QUANTIZED)
+    )
+    if use_onnx:
+        logger.info(f"Carregando modelo SBERT (ONNX Runtime): {ONNX_MODEL_DIR}...")
+        sbert_model = OnnxSentenceEncoder(ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED)
+        sbert_model_id = sbert_model.model_id
+    else:
+        # Importa torch: só quando não há modelo ONNX exportado
+        from sentence_transformers import SentenceTransformer
+        logger.info(f"Carregando modelo SBERT: {SBERT_MODEL_NAME}...")
+        sbert_model = SentenceTransformer(SBERT_MODEL_NAME)
+        sbert_model_id = SBERT_MODEL_NAME
+    query_encoder = QueryEncoder(sbert_model, QUERY_EMBEDDING_CACHE_SIZE, ENCODE_MAX_BATCH, ENCODE_MAX_WAIT_MS)
     logger.info("Modelo SBERT carregado com sucesso!")
 
 def create_movie_text_for_sbert(row) -> str:
@@ -261,183 +410,246 @@ def create_movie_text_for_sbert(row) -> str:
     
     return text
 
-def generate_sbert_embeddings():
-    """Gera embeddings SBERT para todos os filmes"""
-    global sbert_embeddings
-    
-    # Verificar cache
-    if os.path.exists(EMBEDDINGS_CACHE_PATH):
-        logger.info("Carregando embeddings do cache...")
-        try:
-            with open(EMBEDDINGS_CACHE_PATH, 'rb') as f:
-                cached_data = pickle.load(f)
-                if cached_data.get('num_movies') == len(df_movies):
-                    sbert_embeddings = cached_data['embeddings']
-                    logger.info(f"Embeddings carregados do cache: {sbert_embeddings.shape}")
-                    return
-        except Exception as e:
-            logger.warning(f"Erro ao carregar cache: {e}")
-    
-    # Gerar novos embeddings
-    logger.info("Gerando embeddings SBERT para todos os filmes...")
-    
-    movie_texts = df_movies.apply(create_movie_text_for_sbert, axis=1).tolist()
-    
-    # Gera embeddings em batch para eficiência
-    sbert_embeddings = sbert_model.encode(
-        movie_texts,
+def encode_movie_texts(texts: List[str]) -> np.ndarray:
+    """Gera embeddings SBERT em batch"""
+    return sbert_model.encode(
+        texts,
         show_progress_bar=True,
         convert_to_numpy=True,
         batch_size=32
     )
-    
-    logger.info(f"Embeddings gerados: {sbert_embeddings.shape}")
-    
-    # Salvar cache
-    try:
-        Path(EMBEDDINGS_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
-        with open(EMBEDDINGS_CACHE_PATH, 'wb') as f:
-            pickle.dump({
-                'embeddings': sbert_embeddings,
-                'num_movies': len(df_movies)
-            }, f)
-        logger.info("Embeddings salvos no cache!")
-    except Exception as e:
-        logger.warning(f"Erro ao salvar cache: {e}")
 
-def load_data():
-    """Carrega e processa os dados dos filmes"""
-    global df_movies, tfidf, tfidf_matrix, bm25, tokenized_corpus
-    
-    if not os.path.exists(DATA_PATH):
-        logger.info(f"Dados não encontrados em {DATA_PATH}. Executando processador...")
-        try:
-            subprocess.run(["python", PROCESSOR_SCRIPT], check=True)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Erro ao executar processador: {e}")
+def load_catalog_state() -> SearchState:
+    """Catálogo e índices auxiliares (popularidade, gêneros, id -> linha) em um novo estado"""
+    signature = file_signature([DATA_PATH, CSV_DATA_PATH])
+    df = load_movies(DATA_PATH, CSV_DATA_PATH)
+    logger.info(f"Carregados {len(df)} filmes")
 
-    try:
-        df_movies = pd.read_csv(DATA_PATH)
-        df_movies = df_movies.fillna('')
-        logger.info(f"Carregados {len(df_movies)} filmes")
-    except FileNotFoundError:
-        logger.error("Arquivo de dados não encontrado")
-        df_movies = pd.DataFrame()
-        return
-
-    # Criar features para TF-IDF/BM25
-    df_movies['processed_features'] = df_movies.apply(create_combined_features, axis=1)
-    
-    # Inicializar TF-IDF
-    tfidf = TfidfVectorizer(
-        ngram_range=(1, 2),
-        max_features=50000,
-        min_df=2,
-        max_df=0.95
+    # Ordem de popularidade e índice invertido de gêneros (postings na mesma ordem)
+    popular_rows = build_popularity_index(df)
+    genre_index = build_genre_index(df, order=popular_rows)
+    return SearchState(
+        df_movies=df, payloads=MoviePayloads.from_frame(df), source=catalog_source(DATA_PATH, CSV_DATA_PATH), catalog_signature=signature,
+        loaded_at=time.strftime('%Y-%m-%dT%H:%M:%S'), popular_rows=popular_rows, genre_index=genre_index,
+        all_genres=sorted(genre_index), id_to_row=build_id_index(df)
     )
-    tfidf_matrix = tfidf.fit_transform(df_movies['processed_features'])
-    logger.info(f"TF-IDF matrix: {tfidf_matrix.shape}")
-    
-    # Inicializar BM25
-    tokenized_corpus = [doc.split() for doc in df_movies['processed_features']]
-    bm25 = BM25Okapi(tokenized_corpus)
-    logger.info("BM25 inicializado")
-    
-    # Carregar SBERT e gerar embeddings
-    load_sbert_model()
-    generate_sbert_embeddings()
 
-def create_combined_features(row) -> str:
-    """Combina features para TF-IDF/BM25"""
-    def get_str(val):
-        if isinstance(val, list):
-            return " ".join(val)
-        if isinstance(val, str) and val.startswith('['):
+def with_lexical_index(state: SearchState) -> SearchState:
+    """Estado com TF-IDF e BM25 do catálogo de `state`"""
+    # Índice lexical gravado (build_index.py) aberto com memory-map; se ausente,
+    # um único worker o constrói e grava e os demais abrem a mesma versão
+    index = ensure_index(state.df_movies, INDEX_PROFILE, state.source, PREPROCESS_WORKERS)
+    df = state.df_movies.assign(processed_features=index.features)
+    payloads = MoviePayloads.from_frame(df)
+    return state.evolve(
+        df_movies=df,
+        payloads=payloads,
+        main_movies=df,
+        main_payloads=payloads,
+        genre_rows_cache={},
+        tfidf=index.tfidf, tfidf_matrix=index.tfidf_matrix, tfidf_postings=index.tfidf_postings, bm25=index.bm25,
+        index_version=index.version
+    )
+
+def with_sbert_embeddings(state: SearchState) -> SearchState:
+    """Estado com o store de embeddings sincronizado (recodifica só filmes novos ou alterados) e os índices ANN"""
+    movie_texts = state.main_movies.apply(create_movie_text_for_sbert, axis=1).tolist()
+    embedding_store = sync_store(
+        EMBEDDINGS_STORE_PATH, movie_texts, sbert_model_id, encode_movie_texts, EMBEDDINGS_DTYPE
+    )
+    ann_searchers = load_or_build(embedding_store, EMBEDDINGS_STORE_PATH, ANN_BUILD)
+    return state.evolve(embedding_store=embedding_store, ann_searchers=ann_searchers)
+
+def with_neighbors(state: SearchState) -> SearchState:
+    """Estado com a tabela de vizinhos item-a-item (TF-IDF + SBERT)"""
+    signature = f"tfidf:{SIMILAR_WEIGHTS['tfidf']}+sbert:{SIMILAR_WEIGHTS['sbert']}:{sbert_model_id}:{EMBEDDINGS_DTYPE}"
+    neighbor_ids, neighbor_scores = ensure_neighbor_table(
+        NEIGHBORS_PATH,
+        # Embeddings em float32 só se a tabela precisar ser recalculada
+        lambda: [(state.tfidf_matrix, SIMILAR_WEIGHTS['tfidf']),
+                 (state.embedding_store.dequantize(), SIMILAR_WEIGHTS['sbert'])],
+        catalog_fingerprint(state.main_movies), signature, SIMILAR_MOVIES_K
+    )
+    return state.evolve(neighbor_ids=neighbor_ids, neighbor_scores=neighbor_scores)
+
+def load_data():
+    """Primeira carga (thread de fundo): cada etapa publica um estado com seu componente"""
+    with startup.stage('data'):
+        if not os.path.exists(DATA_PATH) and not os.path.exists(CSV_DATA_PATH):
+            logger.info(f"Dados não encontrados em {DATA_PATH}. Executando processador...")
             try:
-                return " ".join(ast.literal_eval(val))
-            except:
-                return val
-        return str(val) if val else ""
+                subprocess.run(["python", PROCESSOR_SCRIPT], check=True)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Erro ao executar processador: {e}")
+        search.swap(load_catalog_state())
 
-    genre_str = get_str(row.get('genre', ''))
-    cast_str = get_str(row.get('cast', ''))
-    keyword_str = get_str(row.get('keywords', ''))
-    director_str = str(row.get('director', ''))
-    title_str = str(row.get('title', ''))
-    description_str = str(row.get('description', ''))
+    with startup.stage('tfidf', 'bm25'):
+        load_analyzer()
+        state = with_lexical_index(search.current)
+        # Alterações incrementais ainda não incorporadas ao catálogo, reaplicadas antes de o índice
+        # ficar pronto: nenhuma busca ou alteração vê o catálogo sem elas, mesmo que o SBERT ou os
+        # vizinhos falhem. Os filmes do delta ficam sem embedding até o SBERT carregar
+        with search.lock:
+            search.swap(replay_journal(state))
     
-    features = [
-        keyword_str * 6,
-        title_str * 3,
-        director_str * 3,
-        cast_str * 2,
-        genre_str * 2,
-        description_str
-    ]
+    with startup.stage('sbert'):
+        # Carregar SBERT e gerar embeddings (segmento principal; alterações feitas durante a
+        # etapa vêm do journal)
+        load_sbert_model()
+        state = with_sbert_embeddings(search.current)
+        with search.lock:
+            state = replay_journal(state)
+            search.swap(state.evolve(delta=state.delta.with_embeddings(embed_movies)))
     
-    combined_text = " ".join(features)
-    return preprocess_text(combined_text)
+    with startup.stage('neighbors'):
+        state = with_neighbors(search.current)
+        with search.lock:
+            search.swap(replay_journal(state))
+
+    if CATALOG_WATCH:
+        catalog_watcher.start()
+
+def build_state() -> SearchState:
+    """Nova versão completa do catálogo, construída ao lado da que está servindo"""
+    return with_neighbors(with_sbert_embeddings(with_lexical_index(load_catalog_state())))
+
+# =============================================================================
+# ALTERAÇÕES INCREMENTAIS (SEGMENTO DELTA)
+# =============================================================================
+
+def embed_movies(movies: pd.DataFrame) -> np.ndarray:
+    """Embeddings SBERT dos filmes incluídos no delta"""
+    return encode_movie_texts(movies.apply(create_movie_text_for_sbert, axis=1).tolist())
+
+def with_delta(state: SearchState, delta: DeltaSegment, deleted_ids) -> SearchState:
+    """Estado com outro delta/conjunto de remoções sobre o mesmo segmento principal"""
+    deleted_ids = frozenset(deleted_ids)
+    return state.evolve(delta=delta, deleted_ids=deleted_ids, **segment_view(state.main_movies, state.main_payloads, delta, deleted_ids))
+
+def apply_operation(state: SearchState, operation: Dict) -> SearchState:
+    """Aplica um upsert/delete sobre `state` com o vocabulário e o IDF do segmento principal"""
+    if operation['op'] == 'upsert':
+        movies = pd.DataFrame(operation['movies'])
+        # Sem o SBERT (ainda carregando ou com falha) o delta fica sem embeddings até a etapa 'sbert'
+        embed = embed_movies if sbert_model is not None else None
+        delta = state.delta.upsert(movies, analyzer, state.tfidf, state.bm25, embed)
+        return with_delta(state, delta, state.deleted_ids - set(movies['id'].tolist()))
+    ids = set(operation['ids'])
+    return with_delta(state, state.delta.remove(ids, state.tfidf, state.bm25), state.deleted_ids | ids)
+
+def mutate(operation: Dict) -> SearchState:
+    """Aplica, grava no journal e publica uma alteração; dispara o merge acima do limite"""
+    with search.lock:
+        # Aplicada antes de gravar: uma operação inválida não entra no journal
+        state = apply_operation(search.current, operation)
+        state = state.evolve(applied_seq=delta_journal.append(operation))
+        search.swap(state)
+    # O merge reconstrói todos os componentes: só depois que a inicialização terminou
+    if len(state.delta) + len(state.deleted_ids) >= DELTA_MERGE_THRESHOLD and startup.is_ready(*STARTUP_COMPONENTS):
+        search.reload(merge_state, "merge")
+    return state
+
+def replay_journal(state: SearchState) -> SearchState:
+    """Reaplica as operações do journal que `state` ainda não contém (inicialização, recarga, merge)"""
+    for entry in delta_journal.read(state.applied_seq):
+        try:
+            state = apply_operation(state, entry).evolve(applied_seq=entry['seq'])
+        except Exception as e:
+            logger.error(f"Operação {entry['seq']} do journal ignorada: {e}")
+    return state
+
+def merge_state() -> SearchState:
+    """Grava o catálogo com o delta incorporado e reconstrói o índice (roda como uma recarga)"""
+    with search.lock:
+        s = search.current
+    if len(s.delta) or s.deleted_ids:
+        movies = s.df_movies if s.alive is None else s.df_movies[s.alive]
+        save_movies(movies.drop(columns=['processed_features']), DATA_PATH)
+        delta_journal.compact(s.applied_seq)
+    # Store de embeddings: só os filmes novos ou alterados são recodificados
+    return build_state()
+
+def delta_stats(state: SearchState) -> Dict:
+    return {
+        "movies": len(state.delta),
+        "deleted": len(state.deleted_ids),
+        "applied_seq": state.applied_seq,
+        "journal_pending": delta_journal.pending,
+        "merge_threshold": DELTA_MERGE_THRESHOLD,
+    }
 
 # =============================================================================
 # ALGORITMOS DE SIMILARIDADE
 # =============================================================================
 
-def tfidf_similarity(query: str, top_n: int = 10) -> tuple:
+def tfidf_similarity(state: SearchState, query: AnalyzedQuery) -> np.ndarray:
     """Calcula similaridade usando TF-IDF + Cosine Similarity"""
-    query_processed = preprocess_text(query)
-    query_vec = tfidf.transform([query_processed])
-    similarities = cosine_similarity(query_vec, tfidf_matrix).flatten()
+    query_vec = state.tfidf.transform([query.text])
+    similarities = concat_scores(sparse_dot_scores(state.tfidf_postings, query_vec), state.delta.tfidf_scores(query_vec))
     return similarities
 
-def bm25_similarity(query: str) -> np.ndarray:
+def bm25_similarity(state: SearchState, query: AnalyzedQuery) -> np.ndarray:
     """Calcula similaridade usando BM25"""
-    query_processed = preprocess_text(query)
-    query_tokens = query_processed.split()
-    scores = bm25.get_scores(query_tokens)
+    scores = concat_scores(state.bm25.get_scores(query.tokens), state.delta.bm25_scores(query.tokens))
     return scores
 
-def sbert_similarity(query: str) -> np.ndarray:
+def encode_query(query: AnalyzedQuery) -> np.ndarray:
+    """Embedding da query original (normalizado, float32), do cache ou do micro-batcher"""
+    return query_encoder.encode(query.raw)
+
+def sbert_similarity(state: SearchState, query: AnalyzedQuery) -> np.ndarray:
     """Calcula similaridade semântica usando Sentence-BERT"""
-    # Gera embedding da query
-    query_embedding = sbert_model.encode([query], convert_to_numpy=True)
-    
-    # Calcula similaridade cosseno com todos os filmes
-    similarities = cosine_similarity(query_embedding, sbert_embeddings).flatten()
+    # Embeddings do catálogo já normalizados: cosseno = GEMV em blocos convertidos para float32
+    embedding = encode_query(query)
+    similarities = concat_scores(state.embedding_store.scores(embedding), state.delta.sbert_scores(embedding))
     
     return similarities
 
-def normalize_scores(scores: np.ndarray) -> np.ndarray:
-    """Normaliza scores para o intervalo [0, 1]"""
-    min_s, max_s = scores.min(), scores.max()
-    if max_s - min_s > 0:
-        return (scores - min_s) / (max_s - min_s)
-    return np.zeros_like(scores)
+def sbert_search(state: SearchState, query: AnalyzedQuery, k: int, ann: dict) -> tuple:
+    """Top-k SBERT pelo backend escolhido (exato ou aproximado)"""
+    searcher = state.ann_searchers.get(ann['backend'], state.ann_searchers['exact'])
+    embedding = encode_query(query)
+    main = searcher.search(embedding, k + dead_rows(state.alive), nprobe=ann['nprobe'], ef=ann['ef'])
+    # Delta pequeno: varredura exata, unida aos candidatos do segmento principal
+    return merge_candidates(main, state.delta.sbert_scores(embedding), len(state.main_movies), k, state.alive)
+
+def sbert_candidate_scores(state: SearchState, query: AnalyzedQuery, ann: dict) -> np.ndarray:
+    """Scores SBERT do corpus para a fusão: completos (exact) ou a partir dos candidatos ANN"""
+    if ann['backend'] == 'exact' or ann['backend'] not in state.ann_searchers:
+        return sbert_similarity(state, query)
+    indices, scores = sbert_search(state, query, FUSION_CANDIDATE_DEPTH, ann)
+    # Piso dos não candidatos: menor score do corpus (principal e delta), como na busca exata
+    embedding = encode_query(query)
+    floor = min_score(state.ann_searchers[ann['backend']], embedding, nprobe=ann['nprobe'], ef=ann['ef'])
+    delta_scores = state.delta.sbert_scores(embedding)
+    if len(delta_scores):
+        floor = min(floor, float(delta_scores.min()))
+    return dense_scores(len(state.df_movies), indices, scores, floor)
 
-def hybrid_similarity(query: str, query_type: str, top_n: int = 10) -> tuple:
-    """Combina TF-IDF, BM25 e SBERT com pesos dinâmicos"""
+def hybrid_similarity(state: SearchState, query: AnalyzedQuery, query_type: str, top_n: int = 10,
+                      ann: Optional[dict] = None, semantic: bool = True) -> tuple:
+    """Combina TF-IDF, BM25 e SBERT com pesos dinâmicos (sem SBERT se `semantic` for False)"""
     weights = HYBRID_WEIGHTS.get(query_type, HYBRID_WEIGHTS['general'])
     
-    # Obter scores de todos os algoritmos
-    tfidf_scores = tfidf_similarity(query)
-    bm25_scores = bm25_similarity(query)
-    sbert_scores = sbert_similarity(query)
+    # Obter scores de todos os algoritmos (query analisada uma única vez)
+    signals = [(tfidf_similarity(state, query), weights['tfidf']), (bm25_similarity(state, query), weights['bm25'])]
+    if semantic:
+        signals.append((sbert_candidate_scores(state, query, ann or default_ann_params()), weights['sbert']))
     
-    # Normalizar
-    tfidf_norm = normalize_scores(tfidf_scores)
-    bm25_norm = normalize_scores(bm25_scores)
-    sbert_norm = normalize_scores(sbert_scores)
-    
-    # Combinar com pesos
-    combined_scores = (
-        weights['tfidf'] * tfidf_norm +
-        weights['bm25'] * bm25_norm +
-        weights['sbert'] * sbert_norm
-    )
-    
-    top_indices = combined_scores.argsort()[-top_n:][::-1]
-    top_scores = combined_scores[top_indices]
-    
-    return top_indices, top_scores
+    # Normalizar (min/max do corpus) e combinar apenas os melhores candidatos de cada sinal
+    indices, scores = fuse_top_k(signals, top_n + dead_rows(state.alive), FUSION_CANDIDATE_DEPTH, FUSION_VERIFY)
+    return drop_dead(indices, scores, state.alive, top_n)
+
+def similar_to_delta_movie(state: SearchState, row: int, limit: int) -> RawJSON:
+    """Similares de um filme do delta (fora da tabela de vizinhos), calculados na hora com os pesos da tabela"""
+    offset = len(state.main_movies)
+    vec, embedding = state.delta.tfidf_matrix[row - offset], state.delta.embeddings[row - offset]
+    tfidf_scores = concat_scores(sparse_dot_scores(state.tfidf_postings, vec), state.delta.tfidf_scores(vec))
+    sbert_scores = concat_scores(state.embedding_store.scores(embedding), state.delta.sbert_scores(embedding))
+    scores = SIMILAR_WEIGHTS['tfidf'] * tfidf_scores + SIMILAR_WEIGHTS['sbert'] * sbert_scores
+    scores[row] = -np.inf  # Um filme não é similar a si mesmo
+    indices, values = live_top_k(scores, min(max(limit, 0), SIMILAR_MOVIES_K), state.alive)
+    return similar_records(state.payloads, indices, values)
 
 # =============================================================================
 # RE-RANKING
@@ -489,8 +701,13 @@ def rerank_results(recommendations: List[Dict]) -> List[Dict]:
 
 @app.on_event("startup")
 async def startup_event():
-    """Carrega dados na inicialização"""
-    load_data()
+    """Carrega os dados em segundo plano: a porta responde (/health/live) desde já"""
+    startup.start_background(load_data)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    catalog_watcher.stop()
+    scoring_executor.shutdown()
 
 @app.get("/")
 def root():
@@ -502,142 +719,313 @@ def root():
             "Compreensão de queries complexas"
         ],
         "endpoints": {
-            "/movies": "Lista filmes populares",
+            "/movies": "Lista filmes populares (paginada por cursor, com projeção de campos)",
             "/genres": "Lista gêneros disponíveis",
-            "/movies/by-genre/{genre}": "Filmes por gênero",
+            "/movies/by-genre": "Primeira página de vários gêneros",
+            "/movies/by-genre/{genre}": "Filmes por gênero (paginada por cursor)",
+            "/movies/{movie_id}": "Dados completos de um filme",
+            "/movies/{movie_id}/similar": "Filmes similares a um filme",
             "/recommend": "Recomendações semânticas (POST)",
-            "/health": "Status da API"
+            "/health": "Status da API",
+            "/health/live": "Liveness (processo no ar)",
+            "/health/ready": "Readiness (pronto para o /recommend)",
+            "/admin/reload": "Recarrega o catálogo sem downtime (POST)",
+            "/admin/movies": "Inclui/altera (PUT, POST em lote) ou remove (DELETE) filmes sem reconstruir o índice",
+            "/admin/merge": "Incorpora as alterações ao catálogo e reconstrói o índice (POST)"
         }
     }
 
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """200 quando o /recommend já pode ser servido (mesmo sem SBERT); 503 enquanto carrega ou se falhou"""
+    return JSONResponse(
+        status_code=200 if startup.serving() else 503,
+        content={"status": startup.status(), "components": startup.snapshot()}
+    )
+
 @app.get("/health")
 def health_check():
+    s = search.current
+    status = startup.status()
     return {
-        "status": "healthy",
-        "movies_loaded": len(df_movies) if not df_movies.empty else 0,
-        "tfidf_ready": tfidf_matrix is not None,
-        "bm25_ready": bm25 is not None,
+        "status": "healthy" if status == "ready" else status,
+        "components": startup.snapshot(),
+        "movies_loaded": len(s.df_movies) - dead_rows(s.alive) if not s.df_movies.empty else 0,
+        "tfidf_ready": s.tfidf_matrix is not None,
+        "bm25_ready": s.bm25 is not None,
+        "index_version": s.index_version,
+        "version": s.version,
+        "delta": delta_stats(s),
+        "catalog": {"source": s.source, "loaded_at": s.loaded_at},
+        "reload": dict(search.stats(), watching=catalog_watcher.running),
         "sbert_ready": sbert_model is not None,
-        "sbert_model": SBERT_MODEL_NAME,
-        "embeddings_shape": sbert_embeddings.shape if sbert_embeddings is not None else None
+        "sbert_model": sbert_model_id,
+        "sbert_backend": "onnx" if isinstance(sbert_model, OnnxSentenceEncoder) else "torch",
+        "query_encoder": query_encoder.stats() if query_encoder is not None else None,
+        "embeddings_shape": s.embedding_store.shape if s.embedding_store is not None else None,
+        "embeddings_dtype": s.embedding_store.dtype if s.embedding_store is not None else None,
+        "ann_backends": sorted(s.ann_searchers),
+        "result_cache": result_cache.stats(),
+        "response_cache": catalog_responses.stats(),
+        "scoring_executor": scoring_executor.stats(),
+        "memory": process_memory()
     }
 
+def parse_fields(state: SearchState, fields: Optional[str]) -> Optional[tuple]:
+    """Campos do parâmetro `fields=` (None = todos); 400 se algum não existir"""
+    try:
+        return state.payloads.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def catalog_page(request: Request, state: SearchState, key: tuple, order: np.ndarray, limit: int,
+                 cursor: Optional[str], fields: Optional[str]):
+    """Página de `order` (linhas já ordenadas) com o cursor da seguinte no cabeçalho X-Next-Cursor"""
+    fields = parse_fields(state, fields)
+    try:
+        rows, next_page = paginate(order, limit, cursor, state.id_to_row, state.df_movies['id'].to_numpy())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {'X-Next-Cursor': next_page} if next_page else None
+    return catalog_responses.respond(request, state.version, key + (limit, cursor, fields),
+                                     lambda: state.payloads.rows(rows, fields), headers)
+
 @app.get("/movies")
-def get_movies():
-    if df_movies.empty:
+def get_movies(request: Request, limit: int = MOVIES_PAGE_LIMIT, cursor: Optional[str] = None,
+               fields: Optional[str] = None):
+    """Filmes por popularidade, em páginas de até MOVIES_PAGE_LIMIT (slices da ordem pré-computada)"""
+    require_ready('data')
+    s = search.current
+    if s.df_movies.empty:
         return []
-    return df_movies.nlargest(200, 'popularity').to_dict(orient="records")
+    limit = min(max(limit, 0), MOVIES_PAGE_LIMIT)
+    return catalog_page(request, s, ('movies',), s.popular_rows, limit, cursor, fields)
 
 @app.get("/genres")
-def get_genres():
-    if df_movies.empty:
-        return []
-    
-    all_genres = set()
-    for genres_str in df_movies['genre']:
-        try:
-            if isinstance(genres_str, str):
-                genres_list = ast.literal_eval(genres_str)
-                if isinstance(genres_list, list):
-                    all_genres.update(genres_list)
-        except:
-            pass
-    
-    return sorted(list(all_genres))
+def get_genres(request: Request):
+    require_ready('data')
+    s = search.current
+    return catalog_responses.respond(request, s.version, ('genres',), lambda: s.all_genres)
+
+@app.get("/movies/by-genre")
+def get_movies_by_genres(request: Request, genres: Optional[List[str]] = Query(None), limit: int = 20,
+                         fields: Optional[str] = None):
+    """Top-N filmes de vários gêneros (ou de todos) em uma única resposta, com o cursor da página seguinte"""
+    require_ready('data')
+    s = search.current
+    limit = min(max(limit, 0), MAX_GENRE_ROW_LIMIT)
+    fields = parse_fields(s, fields)
+
+    def build():
+        ids = s.df_movies['id'].to_numpy() if not s.df_movies.empty else []
+        if genres:
+            return build_genre_rows(s.payloads, s.genre_index, genres, limit, ids, fields)
+        # Linhas de todos os gêneros são serializadas uma vez por limite e campos (e por versão do catálogo)
+        if (limit, fields) not in s.genre_rows_cache:
+            s.genre_rows_cache[limit, fields] = build_genre_rows(s.payloads, s.genre_index, s.all_genres, limit,
+                                                                 ids, fields)
+        return s.genre_rows_cache[limit, fields]
+    return catalog_responses.respond(request, s.version, ('genre-rows', tuple(genres or ()), limit, fields), build)
 
 @app.get("/movies/by-genre/{genre}")
-def get_movies_by_genre(genre: str, limit: int = 20):
-    if df_movies.empty:
+def get_movies_by_genre(request: Request, genre: str, limit: int = 20, cursor: Optional[str] = None,
+                        fields: Optional[str] = None):
+    require_ready('data')
+    s = search.current
+    rows = s.genre_index.get(genre)
+    if rows is None:
         return []
-    
-    filtered_movies = []
-    for idx, row in df_movies.iterrows():
-        try:
-            genres_str = row['genre']
-            if isinstance(genres_str, str):
-                genres_list = ast.literal_eval(genres_str)
-                if isinstance(genres_list, list) and genre in genres_list:
-                    filtered_movies.append(row.to_dict())
-        except:
-            pass
-    
-    filtered_df = pd.DataFrame(filtered_movies)
-    if not filtered_df.empty:
-        filtered_df = filtered_df.nlargest(limit, 'popularity')
-        return filtered_df.to_dict(orient="records")
-    
-    return []
 
-@app.post("/recommend")
-def recommend(request: RecommendationRequest):
-    """Endpoint principal de recomendação com busca semântica"""
-    if df_movies.empty:
-        raise HTTPException(status_code=500, detail="Dados não carregados")
-    
-    query = request.query.strip()
-    if not query:
-        raise HTTPException(status_code=400, detail="Query não pode ser vazia")
-    
-    algorithm = request.algorithm
-    top_n = min(request.top_n, 50)  # Limita a 50 resultados
-    
-    # Detectar tipo de query
-    query_type = detect_query_type(query)
-    
-    logger.info(f"Query: '{query}' | Tipo: {query_type} | Algoritmo: {algorithm}")
-    
+    # Cada página é um slice da lista pré-ordenada do gênero
+    limit = min(max(limit, 0), MAX_GENRE_ROW_LIMIT)
+    return catalog_page(request, s, ('by-genre', genre), rows, limit, cursor, fields)
+
+@app.get("/movies/{movie_id}")
+def get_movie(request: Request, movie_id: int, fields: Optional[str] = None):
+    """Dados de um filme (ex.: o modal, a partir de um card com só alguns campos)"""
+    require_ready('data')
+    s = search.current
+    row = s.id_to_row.get(movie_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    fields = parse_fields(s, fields)
+    return catalog_responses.respond(request, s.version, ('movie', movie_id, fields),
+                                     lambda: s.payloads.record(row, fields))
+
+@app.get("/movies/{movie_id}/similar")
+def get_similar_movies(request: Request, movie_id: int, limit: int = 10):
+    """Filmes mais parecidos com um filme do catálogo (tabela de vizinhos pré-computada)"""
+    require_ready('neighbors')
+    s = search.current
+    row = s.id_to_row.get(movie_id)
+    if row is None or s.neighbor_ids is None:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    key = ('similar', movie_id, limit)
+    if row >= len(s.main_movies):
+        return catalog_responses.respond(request, s.version, key, lambda: similar_to_delta_movie(s, row, limit))
+    return catalog_responses.respond(
+        request, s.version, key,
+        lambda: lookup_similar(s.payloads, s.neighbor_ids, s.neighbor_scores, row, limit, s.alive)
+    )
+
+def default_ann_params() -> dict:
+    return {'backend': ANN_BACKEND, 'nprobe': IVF_NPROBE, 'ef': HNSW_EF}
+
+def resolve_ann_params(state: SearchState, request: RecommendationRequest) -> dict:
+    """Backend ANN da requisição; sem o índice carregado (ex.: hnswlib ausente) usa a busca exata"""
+    backend = request.ann or ANN_BACKEND
+    if backend not in ANN_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Backend ANN inválido: {backend} (use {', '.join(ANN_BACKENDS)})")
+    if backend not in state.ann_searchers:
+        backend = 'exact'
+    return {'backend': backend, 'nprobe': request.nprobe or IVF_NPROBE, 'ef': request.ef or HNSW_EF}
+
+def compute_recommendations(state: SearchState, query: str, query_type: str, algorithm: str, top_n: int, ann: dict,
+                            semantic: bool = True) -> tuple:
+    """Busca e re-ranking (parte cacheada do /recommend) sobre uma única versão do estado;
+    sem `semantic`, sbert/hybrid usam só TF-IDF + BM25"""
     try:
+        # Analisar a query uma única vez para todos os algoritmos
+        analyzed = analyzer.analyze_query(query)
+        
         if algorithm == "tfidf":
-            scores = tfidf_similarity(query)
-            scores_norm = normalize_scores(scores)
-            top_indices = scores_norm.argsort()[-top_n:][::-1]
-            top_scores = scores_norm[top_indices]
+            scores = tfidf_similarity(state, analyzed)
+            top_indices, top_scores = live_top_k(normalize_scores(scores), top_n, state.alive)
             algorithm_used = "TF-IDF"
             
         elif algorithm == "bm25":
-            scores = bm25_similarity(query)
-            scores_norm = normalize_scores(scores)
-            top_indices = scores_norm.argsort()[-top_n:][::-1]
-            top_scores = scores_norm[top_indices]
+            scores = bm25_similarity(state, analyzed)
+            top_indices, top_scores = live_top_k(normalize_scores(scores), top_n, state.alive)
             algorithm_used = "BM25"
             
+        elif not semantic:
+            # SBERT ainda carregando: híbrido lexical em vez de recusar a requisição
+            top_indices, top_scores = hybrid_similarity(state, analyzed, query_type, top_n, ann, semantic=False)
+            algorithm_used = f"Hybrid (TF-IDF + BM25) - {query_type} (SBERT carregando)"
+            
         elif algorithm == "sbert":
-            scores = sbert_similarity(query)
-            top_indices = scores.argsort()[-top_n:][::-1]
-            top_scores = scores[top_indices]
+            top_indices, top_scores = sbert_search(state, analyzed, top_n, ann)
             algorithm_used = "Sentence-BERT"
             
         else:  # hybrid (default)
-            top_indices, top_scores = hybrid_similarity(query, query_type, top_n)
+            top_indices, top_scores = hybrid_similarity(state, analyzed, query_type, top_n, ann)
             algorithm_used = f"Hybrid (TF-IDF + BM25 + SBERT) - {query_type}"
         
-        # Construir resultados
-        recommendations = []
-        for idx, score in zip(top_indices, top_scores):
-            movie = df_movies.iloc[idx].to_dict()
-            movie['similarity_score'] = float(score)
-            recommendations.append(movie)
+        # Construir resultados (só os campos do re-ranking; o filme já está serializado)
+        recommendations = [
+            state.payloads.hit(idx, similarity_score=float(score)) for idx, score in zip(top_indices, top_scores)
+        ]
         
         # Re-ranking
-        recommendations = rerank_results(recommendations)
-        
-        # Pesos usados
-        weights_used = HYBRID_WEIGHTS.get(query_type, HYBRID_WEIGHTS['general'])
-        
-        return {
-            "movies": recommendations,
-            "query_info": {
-                "original_query": query,
-                "query_type": query_type,
-                "weights": weights_used
-            },
-            "algorithm_used": algorithm_used
-        }
+        return state.payloads.render(rerank_results(recommendations), RESULT_FIELDS), algorithm_used
         
     except Exception as e:
         logger.error(f"Erro na recomendação: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_scoring(fn, *args):
+    """Executa o scoring no pool limitado; com a fila cheia responde 503 + Retry-After"""
+    try:
+        return await scoring_executor.run(fn, *args)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@app.post("/recommend")
+async def recommend(request: RecommendationRequest):
+    """Endpoint principal de recomendação com busca semântica"""
+    require_ready(*REQUIRED_COMPONENTS)
+    # Versão lida uma única vez: uma recarga no meio da requisição não a afeta
+    s = search.current
+    if s.df_movies.empty:
+        raise HTTPException(status_code=500, detail="Dados não carregados")
+    
+    query = request.query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query não pode ser vazia")
+    
+    algorithm = request.algorithm
+    top_n = min(request.top_n, 50)  # Limita a 50 resultados
+    
+    # Detectar tipo de query
+    query_type = detect_query_type(query)
+    
+    logger.info(f"Query: '{query}' | Tipo: {query_type} | Algoritmo: {algorithm}")
+    
+    # Resultado cacheado pela query normalizada (maiúsculas/espaços não mudam a busca)
+    ann = resolve_ann_params(s, request)
+    # Resultados lexicais servidos antes do SBERT ficar pronto não são reaproveitados depois
+    semantic = s.embedding_store is not None
+    cache_key = result_cache.make_key(query, algorithm, False, top_n, ann['backend'], ann['nprobe'], ann['ef'], semantic)
+    cached = result_cache.get(cache_key)
+    if cached is None:
+        cached = await run_scoring(compute_recommendations, s, query, query_type, algorithm, top_n, ann, semantic)
+        result_cache.put(cache_key, cached, version=s.version)
+    recommendations, algorithm_used = cached
+    
+    # Pesos usados
+    weights_used = HYBRID_WEIGHTS.get(query_type, HYBRID_WEIGHTS['general'])
+    
+    return PayloadResponse({
+        "movies": recommendations,
+        "query_info": {
+            "original_query": query,
+            "query_type": query_type,
+            "weights": weights_used,
+            "ann_backend": ann['backend'],
+            "semantic_ready": semantic
+        },
+        "algorithm_used": algorithm_used
+    })
+
+@app.post("/admin/reload", status_code=202)
+def admin_reload(_: None = Depends(require_admin)):
+    """Recarrega catálogo, índices e embeddings em segundo plano; a versão atual serve até a troca"""
+    require_ready(*STARTUP_COMPONENTS)
+    if not search.reload(build_state, "admin"):
+        raise HTTPException(status_code=409, detail="Recarga já em andamento")
+    return {"status": "reloading", "index_version": search.current.index_version}
+
+def movie_records(movies: List[MovieUpsert]) -> List[Dict]:
+    if not movies:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if any(movie.id is None for movie in movies):
+        raise HTTPException(status_code=400, detail="Todo filme precisa de id")
+    return [movie.model_dump() for movie in movies]
+
+@app.put("/admin/movies/{movie_id}")
+def upsert_movie(movie_id: int, movie: MovieUpsert, _: None = Depends(require_admin)):
+    """Inclui ou altera um filme no segmento delta (sem reconstruir o índice)"""
+    movie.id = movie_id
+    return upsert_movies([movie])
+
+@app.post("/admin/movies")
+def upsert_movies(movies: List[MovieUpsert], _: None = Depends(require_admin)):
+    """Inclui ou altera filmes em lote no segmento delta"""
+    require_ready(*REQUIRED_COMPONENTS)
+    state = mutate({"op": "upsert", "movies": movie_records(movies)})
+    return {"status": "ok", "version": state.version, "delta": delta_stats(state)}
+
+@app.delete("/admin/movies/{movie_id}")
+def delete_movie(movie_id: int, _: None = Depends(require_admin)):
+    """Remove um filme (tombstone no segmento principal ou remoção do delta)"""
+    require_ready(*REQUIRED_COMPONENTS)
+    if movie_id not in search.current.id_to_row:
+        raise HTTPException(status_code=404, detail="Filme não encontrado")
+    state = mutate({"op": "delete", "ids": [movie_id]})
+    return {"status": "ok", "version": state.version, "delta": delta_stats(state)}
+
+@app.post("/admin/merge", status_code=202)
+def admin_merge(_: None = Depends(require_admin)):
+    """Incorpora o delta ao catálogo e reconstrói o índice em segundo plano"""
+    require_ready(*STARTUP_COMPONENTS)
+    if not search.reload(merge_state, "merge"):
+        raise HTTPException(status_code=409, detail="Recarga já em andamento")
+    return {"status": "merging", "delta": delta_stats(search.current)}
+
 # =============================================================================
 # INICIALIZAÇÃO
 # =============================================================================
@@ -0,0 +1,157 @@
+"""
+Tabela de vizinhos item-a-item
+==============================
+
+Pré-computa, para cada filme, os K filmes mais similares a partir da matriz
+TF-IDF e/ou dos embeddings SBERT. O cálculo é feito em blocos de linhas para
+limitar a memória e o resultado é salvo ao lado dos dados processados, de
+modo que o endpoint /movies/{id}/similar responde em O(K).
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+from payloads import MoviePayloads, RawJSON, json_array
+from shared_artifacts import build_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 20
+DEFAULT_CHUNK_SIZE = 256
+
+
+def l2_normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza as linhas de uma matriz densa para norma L2 unitária"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def compute_neighbor_table(sources: List[Tuple[object, float]], k: int = DEFAULT_K,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula os top-K vizinhos de cada linha.
+
+    `sources` é uma lista de (matriz, peso), com uma linha por filme e linhas
+    já normalizadas (L2), de forma que o produto escalar é a similaridade
+    cosseno. A similaridade final é a soma ponderada das fontes.
+    """
+    n_items = sources[0][0].shape[0]
+    k = max(min(k, n_items - 1), 0)
+
+    neighbors = np.zeros((n_items, k), dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+
+    for start in range(0, n_items, chunk_size):
+        stop = min(start + chunk_size, n_items)
+        rows = np.arange(stop - start)
+
+        sims = np.zeros((stop - start, n_items), dtype=np.float32)
+        for matrix, weight in sources:
+            block = matrix[start:stop] @ matrix.T
+            if sparse.issparse(block):
+                block = block.toarray()
+            sims += weight * np.asarray(block, dtype=np.float32)
+
+        # Um filme não é vizinho de si mesmo
+        sims[rows, rows + start] = -np.inf
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+
+        neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    return neighbors, scores
+
+
+def save_neighbor_table(path: str, neighbors: np.ndarray, scores: np.ndarray,
+                        fingerprint: str, signature: str) -> None:
+    """Salva a tabela de vizinhos junto com a assinatura do catálogo que a gerou"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        np.savez(f, neighbors=neighbors, scores=scores,
+                 fingerprint=np.array(fingerprint), signature=np.array(signature))
+
+
+def load_neighbor_table(path: str, fingerprint: str, signature: str,
+                        k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Carrega a tabela salva se ela corresponder ao catálogo e às fontes atuais"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data['fingerprint']) != fingerprint or str(data['signature']) != signature:
+                return None
+            neighbors, scores = data['neighbors'], data['scores']
+    except Exception as e:
+        logger.warning(f"Erro ao carregar tabela de vizinhos: {e}")
+        return None
+
+    if neighbors.shape[1] < min(k, neighbors.shape[0] - 1):
+        return None
+    return neighbors[:, :k], scores[:, :k]
+
+
+def ensure_neighbor_table(path: str, sources: Union[List[Tuple[object, float]], Callable[[], List[Tuple[object, float]]]],
+                          fingerprint: str, signature: str, k: int = DEFAULT_K) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Carrega a tabela de vizinhos do disco ou a recalcula e salva se estiver
+    ausente/desatualizada. `sources` pode ser uma função que monta as fontes,
+    chamada apenas quando é preciso recalcular.
+    """
+    table = load_neighbor_table(path, fingerprint, signature, k)
+    if table is not None:
+        logger.info(f"Tabela de vizinhos carregada de {path}")
+        return table
+
+    # Com vários workers, apenas um calcula; os demais leem a tabela salva
+    with build_lock(path):
+        table = load_neighbor_table(path, fingerprint, signature, k)
+        if table is not None:
+            logger.info(f"Tabela de vizinhos carregada de {path}")
+            return table
+
+        logger.info("Calculando tabela de vizinhos...")
+        if callable(sources):
+            sources = sources()
+        neighbors, scores = compute_neighbor_table(sources, k)
+        try:
+            save_neighbor_table(path, neighbors, scores, fingerprint, signature)
+            logger.info(f"Tabela de vizinhos salva em {path}: {neighbors.shape}")
+        except Exception as e:
+            logger.warning(f"Erro ao salvar tabela de vizinhos: {e}")
+        return neighbors, scores
+
+
+def similar_records(payloads: MoviePayloads, rows: np.ndarray, scores: np.ndarray) -> RawJSON:
+    """Filmes das linhas `rows` com o score de similaridade (só scores positivos)"""
+    keep = scores > 0
+    return json_array(
+        payloads.with_fields(row, {'score': round(float(score), 4)})
+        for row, score in zip(rows[keep].tolist(), scores[keep].tolist())
+    )
+
+
+def lookup_similar(payloads: MoviePayloads, neighbors: np.ndarray, scores: np.ndarray,
+                   row: int, limit: int, alive: Optional[np.ndarray] = None) -> RawJSON:
+    """
+    Monta a resposta de filmes similares a partir da tabela (O(K) por requisição).
+
+    Com `alive`, vizinhos apagados ou substituídos desde o último merge são
+    pulados (a lista pode ficar menor que `limit`).
+    """
+    limit = min(max(limit, 0), neighbors.shape[1])
+    row_neighbors, row_scores = neighbors[row], scores[row]
+    if alive is not None:
+        keep = alive[row_neighbors]
+        row_neighbors, row_scores = row_neighbors[keep], row_scores[keep]
+    return similar_records(payloads, row_neighbors[:limit], row_scores[:limit])
@@ -0,0 +1,107 @@
+"""
+Recursos do NLTK
+================
+
+Os servidores não baixam nada na inicialização: os dados do NLTK ficam em
+`data/nltk_data/` (ou em qualquer diretório do `NLTK_DATA`/caminhos padrão
+do NLTK) e são apenas verificados antes de montar o analisador de texto.
+Recursos ausentes geram um erro com o comando para baixá-los.
+
+Uso:
+    python backend/nltk_resources.py              # verifica (sai com 1 se faltar algo)
+    python backend/nltk_resources.py --download   # baixa para data/nltk_data/
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Diretório versionado junto com os dados; tem prioridade sobre os caminhos padrão
+VENDORED_DATA_DIR = "data/nltk_data"
+
+# Recurso -> caminhos aceitos em nltk.data (basta um; versões novas do NLTK usam *_tab/*_eng)
+RESOURCE_PATHS = {
+    'punkt': ('tokenizers/punkt_tab/english/', 'tokenizers/punkt/english.pickle'),
+    'stopwords': ('corpora/stopwords',),
+    'wordnet': ('corpora/wordnet',),
+    'averaged_perceptron_tagger': ('taggers/averaged_perceptron_tagger_eng/',
+                                   'taggers/averaged_perceptron_tagger/'),
+}
+
+# Pacotes baixados por --download (cobrem versões antigas e novas do NLTK)
+DOWNLOAD_PACKAGES = ('punkt', 'punkt_tab', 'stopwords', 'wordnet',
+                     'averaged_perceptron_tagger', 'averaged_perceptron_tagger_eng')
+
+TOKENIZE_RESOURCES = ('punkt', 'stopwords')
+LEMMATIZE_RESOURCES = TOKENIZE_RESOURCES + ('wordnet', 'averaged_perceptron_tagger')
+
+
+def required_resources(use_lemmatization: bool = True) -> Sequence[str]:
+    """Recursos usados pelo TextAnalyzer de uma configuração"""
+    return LEMMATIZE_RESOURCES if use_lemmatization else TOKENIZE_RESOURCES
+
+
+def configure_data_path(data_dir: str = VENDORED_DATA_DIR):
+    """Coloca o diretório versionado na frente dos caminhos de busca do NLTK"""
+    import nltk
+
+    data_dir = os.path.abspath(data_dir)
+    if os.path.isdir(data_dir) and data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+
+
+def _found(path: str) -> bool:
+    import nltk
+
+    try:
+        nltk.data.find(path)
+        return True
+    except LookupError:
+        return False
+
+
+def missing_resources(names: Sequence[str], data_dir: str = VENDORED_DATA_DIR) -> List[str]:
+    """Recursos de `names` não encontrados (sem acesso à rede)"""
+    configure_data_path(data_dir)
+    return [name for name in names if not any(_found(path) for path in RESOURCE_PATHS[name])]
+
+
+def require_resources(names: Sequence[str], data_dir: str = VENDORED_DATA_DIR):
+    """Falha com LookupError se algum recurso estiver ausente"""
+    missing = missing_resources(names, data_dir)
+    if missing:
+        raise LookupError(
+            f"Recursos do NLTK ausentes: {', '.join(missing)} "
+            f"(rode: python backend/nltk_resources.py --download)"
+        )
+
+
+def download(data_dir: str = VENDORED_DATA_DIR) -> bool:
+    import nltk
+
+    os.makedirs(data_dir, exist_ok=True)
+    return all(nltk.download(package, download_dir=data_dir, quiet=True) for package in DOWNLOAD_PACKAGES)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Verifica ou baixa os recursos do NLTK")
+    parser.add_argument('--download', action='store_true', help="baixa os recursos para --dir")
+    parser.add_argument('--dir', default=VENDORED_DATA_DIR, help="diretório dos dados do NLTK")
+    args = parser.parse_args()
+
+    if args.download and not download(args.dir):
+        logger.error("Falha ao baixar recursos do NLTK")
+    missing = missing_resources(LEMMATIZE_RESOURCES, args.dir)
+    if missing:
+        logger.error(f"Recursos ausentes: {', '.join(missing)}")
+        sys.exit(1)
+    logger.info(f"Recursos do NLTK disponíveis: {', '.join(LEMMATIZE_RESOURCES)}")
+
+
+if __name__ == "__main__":
+    main()
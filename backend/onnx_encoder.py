@@ -0,0 +1,115 @@
+"""
+Encoder SBERT via ONNX Runtime
+==============================
+
+Executa o transformer exportado por `backend/export_onnx.py` com ONNX
+Runtime e o tokenizador rápido da biblioteca `tokenizers`, sem importar
+torch nem sentence-transformers:
+
+    data/onnx/<modelo>/
+        config.json      -> modelo de origem, pooling, dimensão, tamanho máximo
+        model.onnx       -> transformer (float32)
+        model.int8.onnx  -> mesma rede com quantização dinâmica int8 (opcional)
+        tokenizer.json   -> tokenizador do modelo
+
+A interface de `encode` segue a do SentenceTransformer, então o servidor usa
+qualquer um dos dois sem mudanças.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = 'config.json'
+TOKENIZER_FILE = 'tokenizer.json'
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model.int8.onnx'
+
+
+def onnx_runtime_available() -> bool:
+    """onnxruntime e tokenizers são dependências opcionais"""
+    try:
+        import onnxruntime  # noqa: F401
+        import tokenizers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def exported_model_exists(model_dir, quantized: bool = False) -> bool:
+    model_dir = Path(model_dir)
+    model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+    return all((model_dir / name).exists() for name in (CONFIG_FILE, TOKENIZER_FILE, model_file))
+
+
+class OnnxSentenceEncoder:
+    """Tokenização + transformer ONNX + pooling, compatível com SentenceTransformer.encode"""
+
+    def __init__(self, model_dir, quantized: bool = False, num_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        with open(model_dir / CONFIG_FILE, encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.quantized = quantized
+        self.pooling = self.config['pooling']
+        if self.pooling not in ('mean', 'cls'):
+            raise ValueError(f"Pooling não suportado: {self.pooling}")
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = ort.InferenceSession(str(model_dir / model_file), options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        logger.info(f"Encoder ONNX carregado de {model_dir / model_file}")
+
+    @property
+    def model_id(self) -> str:
+        """Identifica o espaço de embeddings (a versão int8 não é intercambiável com a float32)"""
+        return f"{self.config['model_name']}:onnx-int8" if self.quantized else self.config['model_name']
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        features = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: features[name] for name in self.input_names})[0]
+        if self.pooling == 'cls':
+            return hidden[:, 0]
+        mask = features['attention_mask'][:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batches = [self._encode_batch(texts[start:start + batch_size])
+                   for start in range(0, len(texts), max(batch_size, 1))]
+        dimension = self.get_sentence_embedding_dimension()
+        embeddings = np.vstack(batches).astype(np.float32) if batches else np.empty((0, dimension), np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def parity_report(reference, candidate, texts: Sequence[str]) -> Dict[str, float]:
+    """Similaridade cosseno entre os embeddings de dois encoders para os mesmos textos"""
+    a = np.asarray(reference.encode(list(texts), convert_to_numpy=True), dtype=np.float32)
+    b = np.asarray(candidate.encode(list(texts), convert_to_numpy=True), dtype=np.float32)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {'texts': len(texts), 'min_cosine': float(cosine.min()), 'mean_cosine': float(cosine.mean())}
@@ -0,0 +1,69 @@
+"""
+Paginação por cursor
+====================
+
+As listagens de catálogo (/movies, /movies/by-genre) percorrem listas de
+linhas já ordenadas por popularidade, montadas uma vez por versão do
+catálogo (catalog.py). Uma página é um slice dessa lista: O(página), sem
+reordenar o DataFrame, por mais fundo que o cliente role.
+
+O cursor é opaco para o cliente e guarda a posição onde a página seguinte
+começa e o id do último filme entregue. Se a lista mudou entre as páginas
+(recarga, merge ou alteração incremental), a posição deixa de apontar para
+esse filme; a página seguinte recomeça logo depois dele na lista nova, sem
+repetir nem pular filmes que não mudaram de lugar. Se o filme saiu do
+catálogo, vale a posição guardada.
+"""
+
+import base64
+import binascii
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def encode_cursor(offset: int, last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{offset}:{last_id}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """(posição, id do último filme entregue); ValueError se o cursor for inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        offset, last_id = (int(part) for part in raw.split(':'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Cursor inválido: {cursor!r}") from None
+    if offset < 0:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    return offset, last_id
+
+
+def resume_offset(order: np.ndarray, cursor: Optional[str], id_to_row: Dict[int, int]) -> int:
+    """Posição em `order` onde começa a página do `cursor` (0 sem cursor)"""
+    if not cursor:
+        return 0
+    offset, last_id = decode_cursor(cursor)
+    row = id_to_row.get(last_id)
+    if row is None:
+        # Filme removido: segue da posição guardada
+        return min(offset, len(order))
+    if 0 < offset <= len(order) and order[offset - 1] == row:
+        return offset
+    # A lista mudou desde a página anterior: procura o último filme entregue
+    position = np.flatnonzero(order == row)
+    return int(position[0]) + 1 if len(position) else min(offset, len(order))
+
+
+def next_cursor(order: np.ndarray, stop: int, ids: Sequence[int]) -> Optional[str]:
+    """Cursor da página que começa em `stop`; None se a lista acabou"""
+    if stop <= 0 or stop >= len(order):
+        return None
+    return encode_cursor(stop, int(ids[order[stop - 1]]))
+
+
+def paginate(order: np.ndarray, limit: int, cursor: Optional[str], id_to_row: Dict[int, int],
+             ids: Sequence[int]) -> Tuple[np.ndarray, Optional[str]]:
+    """Linhas da página (slice de `order`) e o cursor da próxima; `ids` é o id de cada linha"""
+    start = resume_offset(order, cursor, id_to_row)
+    stop = start + max(limit, 0)
+    return order[start:stop], next_cursor(order, stop, ids)
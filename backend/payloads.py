@@ -0,0 +1,170 @@
+"""
+Respostas pré-serializadas
+==========================
+
+Os campos de um filme não mudam entre requisições: o JSON de cada linha do
+catálogo é gerado uma única vez, quando o estado é montado, e as respostas
+(/recommend, /movies, gêneros, similares) são montadas concatenando esses
+bytes com os campos que variam por requisição (scores). Com `fields=`, só
+os filmes da página são decodificados e reduzidos aos campos pedidos.
+
+`PayloadResponse` serializa o restante da resposta com orjson, sem passar
+pelo `jsonable_encoder` do FastAPI; valores `RawJSON` entram como estão.
+O orjson está no requirements.txt; se faltar, usa o json da biblioteca
+padrão (mesma saída, mais lento).
+"""
+
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Instalação sem o requirements.txt: mais lento, mesmo JSON
+    orjson = None
+
+# Colunas lidas pelo re-ranking (popularidade, avaliação, votos) sem decodificar o JSON
+RERANK_COLUMNS = ('popularity', 'vote_average', 'vote_count')
+
+
+def _to_builtin(value):
+    """Escalares e arrays numpy para o json da biblioteca padrão"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+def _encode(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_to_builtin).encode('utf-8')
+
+
+def _decode(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class RawJSON:
+    """JSON já serializado, inserido como está na resposta"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def dumps(value) -> bytes:
+    """Serializa `value`; RawJSON dentro de dicts/listas não é reserializado"""
+    if isinstance(value, RawJSON):
+        return value.data
+    if isinstance(value, dict):
+        return b'{' + b','.join(_encode(str(key)) + b':' + dumps(item) for key, item in value.items()) + b'}'
+    if isinstance(value, (list, tuple)):
+        return b'[' + b','.join(dumps(item) for item in value) + b']'
+    return _encode(value)
+
+
+def json_array(fragments: Iterable[bytes]) -> RawJSON:
+    return RawJSON(b'[' + b','.join(fragments) + b']')
+
+
+class PayloadResponse(Response):
+    """Resposta JSON serializada com orjson (aceita RawJSON)"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def clean_record(record: Dict) -> Dict:
+    """Nulos (None/NaN) viram string vazia, como nas respostas montadas a partir do DataFrame"""
+    return {
+        key: "" if value is None or (isinstance(value, float) and math.isnan(value)) else value
+        for key, value in record.items()
+    }
+
+
+class MoviePayloads:
+    """JSON de cada linha do DataFrame (mesma ordem) e as colunas usadas no re-ranking"""
+
+    def __init__(self, fragments: Optional[List[bytes]] = None, values: Optional[Dict[str, list]] = None,
+                 columns: Sequence[str] = ()):
+        self.fragments = fragments if fragments is not None else []
+        self.values = values if values is not None else {name: [] for name in RERANK_COLUMNS}
+        self.columns = tuple(columns)  # Campos de cada filme, na ordem do JSON
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'MoviePayloads':
+        records = [clean_record(record) for record in df.to_dict(orient="records")]
+        return cls(
+            [_encode(record) for record in records],
+            {name: [record.get(name, 0) for record in records] for name in RERANK_COLUMNS},
+            [str(name) for name in df.columns],
+        )
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def __add__(self, other: 'MoviePayloads') -> 'MoviePayloads':
+        """Linhas de `self` seguidas das de `other` (segmento principal + delta)"""
+        if not len(other):
+            return self
+        return MoviePayloads(self.fragments + other.fragments,
+                             {name: self.values[name] + other.values[name] for name in RERANK_COLUMNS},
+                             self.columns or other.columns)
+
+    def parse_fields(self, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        Campos pedidos em `fields=` ("id,title,image_url"), na ordem do JSON
+        completo; None sem projeção. ValueError para campos desconhecidos.
+        """
+        if fields is None:
+            return None
+        requested = {name.strip() for name in fields.split(',') if name.strip()}
+        unknown = requested.difference(self.columns)
+        if unknown:
+            raise ValueError(f"Campos desconhecidos: {', '.join(sorted(unknown))} "
+                             f"(disponíveis: {', '.join(self.columns)})")
+        return tuple(name for name in self.columns if name in requested)
+
+    def project(self, row: int, fields: Sequence[str]) -> bytes:
+        """JSON do filme da linha `row` só com `fields`"""
+        record = _decode(self.fragments[row])
+        return _encode({name: record[name] for name in fields if name in record})
+
+    def record(self, row: int, fields: Optional[Sequence[str]] = None) -> RawJSON:
+        """JSON do filme da linha `row` (só com `fields`, se dado)"""
+        return RawJSON(self.fragments[row] if fields is None else self.project(row, fields))
+
+    def rows(self, rows: Sequence[int], fields: Optional[Sequence[str]] = None) -> RawJSON:
+        """Lista JSON dos filmes das linhas `rows` (só com `fields`, se dado)"""
+        rows = np.asarray(rows, dtype=np.int64).tolist()
+        if fields is not None:
+            return json_array(self.project(row, fields) for row in rows)
+        fragments = self.fragments
+        return json_array(fragments[row] for row in rows)
+
+    def with_fields(self, row: int, fields: Dict) -> bytes:
+        """JSON do filme da linha `row` com `fields` acrescentados ao final"""
+        fragment = self.fragments[row]
+        extra = _encode(fields)
+        if len(fragment) == 2:  # '{}'
+            return extra
+        return fragment[:-1] + b',' + extra[1:]
+
+    def hit(self, row: int, **fields) -> Dict:
+        """Resultado leve para o re-ranking: linha, colunas de RERANK_COLUMNS e `fields`"""
+        hit = {name: self.values[name][row] for name in RERANK_COLUMNS}
+        hit.update(fields, row=int(row))
+        return hit
+
+    def render(self, hits: Iterable[Dict], fields: Sequence[str]) -> RawJSON:
+        """Lista JSON dos filmes de `hits` com os campos `fields` de cada um"""
+        return json_array(self.with_fields(hit['row'], {name: hit[name] for name in fields}) for hit in hits)
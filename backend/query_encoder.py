@@ -0,0 +1,151 @@
+"""
+Codificação de queries SBERT
+============================
+
+Embeddings de query com cache LRU e micro-batching:
+
+- queries repetidas saem do cache, sem passar pelo modelo;
+- requisições concorrentes que não estão no cache entram em uma fila; uma
+  thread coleta até `max_batch` textos, esperando no máximo `max_wait_ms`
+  após o primeiro, e roda um único `encode` para todos.
+
+O `encode` é chamado de dentro das threads do executor de scoring
+(BoundedExecutor, usado pelo /recommend assíncrono), e cada uma bloqueia no
+`Future` do seu texto. Como no máximo SCORING_WORKERS requisições esperam
+no batcher ao mesmo tempo, o tamanho efetivo do batch é limitado por
+SCORING_WORKERS, não só por `max_batch`. O histograma de tamanhos de batch
+fica disponível em `stats()` para o /health.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from neighbors import l2_normalize_rows
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+def _bucket(size: int) -> str:
+    """Faixa de potências de 2 do histograma: 1, 2, 3-4, 5-8, ..."""
+    if size <= 2:
+        return str(size)
+    upper = 1 << (size - 1).bit_length()
+    return f"{upper // 2 + 1}-{upper}"
+
+
+class MicroBatcher:
+    """Agrupa chamadas concorrentes de `encode_batch` em um único batch"""
+
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray],
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.encode_batch = encode_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.histogram: Dict[str, int] = {}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="sbert-micro-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """Bloqueia até o primeiro item e junta os que chegarem até o prazo"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Textos repetidos no mesmo batch são codificados uma vez
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.encode_batch(texts)
+                by_text = dict(zip(texts, embeddings))
+                for text, future in batch:
+                    future.set_result(by_text[text])
+            except Exception as e:
+                logger.error(f"Erro ao codificar batch de {len(texts)} queries: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                bucket = _bucket(len(batch))
+                self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self.batches,
+                "queries": self.items,
+                "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.histogram.items(), key=lambda kv: int(kv[0].split('-')[0]))),
+            }
+
+
+class QueryEncoder:
+    """Embedding normalizado (float32) de uma query, com cache LRU e micro-batching"""
+
+    def __init__(self, model, cache_size: int = DEFAULT_CACHE_SIZE,
+                 max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.model = model
+        # Embeddings não expiram: TTL infinito, apenas LRU por tamanho
+        self.cache = ResultCache(cache_size, float('inf'))
+        self.batcher = MicroBatcher(self._encode_batch, max_batch, max_wait_ms)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        embeddings = l2_normalize_rows(self.model.encode(texts, convert_to_numpy=True, batch_size=len(texts)))
+        embeddings.setflags(write=False)
+        return embeddings
+
+    def encode(self, text: str) -> np.ndarray:
+        embedding = self.cache.get(text)
+        if embedding is None:
+            embedding = self.batcher.encode(text)
+            self.cache.put(text, embedding)
+        return embedding
+
+    def stats(self) -> Dict:
+        cache = self.cache.stats()
+        return {
+            "cache": {key: cache[key] for key in ("entries", "max_entries", "hits", "misses", "hit_rate", "evictions")},
+            "batcher": self.batcher.stats(),
+        }
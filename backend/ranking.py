@@ -0,0 +1,134 @@
+"""
+Seleção top-k e fusão de scores
+===============================
+
+Seleção parcial (argpartition, O(N)) no lugar de argsort completo e fusão
+híbrida calculada apenas sobre a união dos melhores candidatos de cada sinal.
+
+Ordem dos resultados: score decrescente e, em caso de empate, menor índice
+primeiro.
+
+Fusão por candidatos
+--------------------
+A fusão é sum(w_i * minmax_i(s_i)), com min/max de cada sinal calculados
+sobre o corpus inteiro. Para cada sinal são tomados os `depth` melhores
+documentos; um documento fora da união tem, em cada sinal, score no máximo
+igual ao `depth`-ésimo valor t_i, então seu score fundido é no máximo
+sum(w_i * minmax_i(t_i)). Se o k-ésimo score entre os candidatos supera esse
+limite, o resultado é exatamente o da fusão completa; caso contrário a fusão
+é refeita sobre o corpus inteiro (uma passada vetorizada + seleção parcial).
+Sinais correlacionados (TF-IDF e BM25) quase sempre ficam no primeiro caso.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+DEFAULT_CANDIDATE_DEPTH = 100
+
+
+def normalize_scores(scores: np.ndarray) -> np.ndarray:
+    """Normaliza scores para o intervalo [0, 1]"""
+    min_s, max_s = scores.min(), scores.max()
+    if max_s - min_s > 0:
+        return (scores - min_s) / (max_s - min_s)
+    return np.zeros_like(scores)
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices e scores dos k maiores valores, em ordem decrescente"""
+    n = len(scores)
+    k = min(max(k, 0), n)
+    if k == 0:
+        return np.empty(0, dtype=np.intp), scores[:0]
+
+    if k < n:
+        # Sinais lexicais são quase todos iguais ao mínimo (zero); o partition
+        # degrada com muitos empates, então ele roda só sobre o que está acima
+        low = scores.min()
+        pool = np.flatnonzero(scores > low)
+        if len(pool) > k:
+            values = scores[pool]
+            kth = np.partition(values, len(pool) - k)[len(pool) - k]
+            above = pool[values > kth]
+            tied = pool[values == kth]
+        else:
+            above, kth = pool, low
+            tied = np.flatnonzero(scores == low)
+        # Empates na fronteira ficam com os menores índices
+        candidates = np.concatenate([above, tied[:k - len(above)]])
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    indices = candidates[order]
+    return indices, scores[indices]
+
+
+def _fuse(signals: List[Tuple[np.ndarray, float, float, float]], rows=None) -> np.ndarray:
+    """Soma ponderada dos sinais normalizados, no corpus inteiro ou só em `rows`"""
+    fused = None
+    for scores, weight, low, span in signals:
+        values = scores if rows is None else scores[rows]
+        term = weight * ((values - low) / span)
+        fused = term if fused is None else fused + term
+    return fused
+
+
+def _fuse_candidates(active, n: int, k: int, depth: int):
+    """Fusão restrita à união dos top-`depth` de cada sinal; None se o resultado não for garantidamente exato"""
+    parts, bound = [], None
+    for scores, weight, low, span in active:
+        rows, row_scores = top_k(scores, depth)
+        parts.append(rows)
+        # Maior score fundido possível para quem ficou fora dos candidatos
+        term = weight * ((row_scores[-1] - low) / span)
+        bound = term if bound is None else bound + term
+
+    candidates = np.unique(np.concatenate(parts))
+    local, fused_scores = top_k(_fuse(active, candidates), k)
+    if k > 0 and fused_scores[-1] <= bound:
+        return None
+    return candidates[local], fused_scores
+
+
+def full_fusion_top_k(signals: List[Tuple[np.ndarray, float]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Referência: normaliza e funde o corpus inteiro"""
+    combined = sum(weight * normalize_scores(scores) for scores, weight in signals)
+    return top_k(combined, k)
+
+
+def fuse_top_k(signals: List[Tuple[np.ndarray, float]], k: int,
+               depth: int = DEFAULT_CANDIDATE_DEPTH, verify: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k da fusão híbrida de (scores, peso) calculada sobre a união dos
+    candidatos de cada sinal.
+
+    Com `verify=True` o resultado é comparado com `full_fusion_top_k`.
+    """
+    n = len(signals[0][0])
+
+    # Sinais com peso nulo ou constantes não alteram a soma
+    active = []
+    for scores, weight in signals:
+        low = scores.min()
+        span = scores.max() - low
+        if weight > 0 and span > 0:
+            active.append((scores, weight, low, span))
+
+    depth = max(depth, k, 1)
+    if not active:
+        result = top_k(np.zeros(n), k)
+    elif depth >= n:
+        result = top_k(_fuse(active), k)
+    else:
+        result = _fuse_candidates(active, n, k, depth)
+        if result is None:
+            # Limite não garantido: funde o corpus inteiro (uma passada, sem argsort)
+            result = top_k(_fuse(active), k)
+
+    if verify:
+        expected = full_fusion_top_k(signals, k)
+        assert np.array_equal(result[0], expected[0]) and np.array_equal(result[1], expected[1]), \
+            "fusão por candidatos divergiu da fusão completa"
+    return result
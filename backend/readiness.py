@@ -0,0 +1,110 @@
+"""
+Progresso da inicialização
+==========================
+
+Os servidores carregam catálogo, índice lexical e modelo SBERT em uma thread
+de fundo, para que a porta responda (liveness) desde o primeiro instante.
+`StartupProgress` registra o estado de cada componente:
+
+    pending -> loading -> ready
+                       -> failed
+
+Os componentes `required` são os necessários para servir o /recommend; com
+eles prontos a instância já recebe tráfego (readiness), mesmo que os demais
+(ex.: SBERT) ainda estejam carregando.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class StartupProgress:
+    """Estado thread-safe dos componentes carregados na inicialização"""
+
+    def __init__(self, components: Sequence[str], required: Sequence[str]):
+        self.components = list(components)
+        self.required = list(required)
+        self._lock = threading.Lock()
+        self._state = {name: {'state': PENDING, 'started_at': None, 'elapsed_s': None, 'error': None}
+                       for name in self.components}
+        self.started_at = time.monotonic()
+
+    def begin(self, *names: str):
+        with self._lock:
+            for name in names:
+                self._state[name].update(state=LOADING, started_at=time.monotonic())
+
+    def finish(self, *names: str):
+        with self._lock:
+            for name in names:
+                entry = self._state[name]
+                entry.update(state=READY, elapsed_s=round(time.monotonic() - (entry['started_at'] or self.started_at), 3))
+
+    def fail(self, names: Sequence[str], error: str):
+        with self._lock:
+            for name in names:
+                self._state[name].update(state=FAILED, error=error)
+
+    @contextmanager
+    def stage(self, *names: str):
+        """Marca `names` como carregando durante o bloco e como prontos (ou com falha) ao final"""
+        self.begin(*names)
+        try:
+            yield
+        except Exception as e:
+            self.fail(names, str(e))
+            raise
+        self.finish(*names)
+
+    def is_ready(self, *names: str) -> bool:
+        with self._lock:
+            return all(self._state[name]['state'] == READY for name in names)
+
+    def not_ready(self, *names: str) -> List[str]:
+        with self._lock:
+            return [name for name in names if self._state[name]['state'] != READY]
+
+    def status(self) -> str:
+        """ready (tudo pronto), partial (servindo, faltam opcionais), starting ou failed"""
+        with self._lock:
+            states = {name: entry['state'] for name, entry in self._state.items()}
+        if all(state == READY for state in states.values()):
+            return 'ready'
+        if any(states[name] == FAILED for name in self.required):
+            return 'failed'
+        if all(states[name] == READY for name in self.required):
+            return 'partial'
+        return 'starting'
+
+    def serving(self) -> bool:
+        return self.status() in ('ready', 'partial')
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                name: {key: entry[key] for key in ('state', 'elapsed_s', 'error') if entry[key] is not None}
+                for name, entry in self._state.items()
+            }
+
+    def start_background(self, target: Callable[[], None]) -> threading.Thread:
+        """Roda `target` (o carregamento dos dados) em uma thread daemon"""
+        def run():
+            try:
+                target()
+                logger.info(f"Inicialização concluída em {time.monotonic() - self.started_at:.1f}s")
+            except Exception as e:
+                logger.error(f"Erro na inicialização: {e}")
+
+        thread = threading.Thread(target=run, name="startup-loader", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,108 @@
+"""
+Cache de resultados de recomendação
+===================================
+
+Cache LRU com expiração (TTL) para as respostas do /recommend. A chave é a
+query normalizada (minúsculas, espaços colapsados) junto com os parâmetros
+que alteram o resultado (algoritmo, sinônimos, top_n).
+
+As entradas pertencem a uma versão do índice: ao carregar outro índice
+(`bind_version`) o cache é esvaziado, então nunca se serve um resultado
+calculado sobre dados antigos. Uma requisição que começou antes da troca
+informa a versão em que calculou o resultado (`put(..., version=)`), e o
+resultado antigo não entra no cache da versão nova. Contadores de acertos, faltas, remoções por
+tamanho e por expiração ficam disponíveis em `stats()` para o /health.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 600.0
+
+
+def normalize_query(query: str) -> str:
+    """Forma canônica da query usada na chave do cache"""
+    return " ".join(query.lower().split())
+
+
+class ResultCache:
+    """LRU + TTL thread-safe, invalidado pela versão do índice carregado"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, algorithm: str, use_synonyms: bool, top_n: int, *options: Hashable) -> Tuple:
+        """Chave do cache; `options` inclui outros parâmetros da requisição que mudam o resultado"""
+        return (normalize_query(query), algorithm, bool(use_synonyms), top_n) + options
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Valor da chave, ou None se ausente ou expirado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, version: Optional[str] = None):
+        """Guarda o valor; com `version` diferente da vinculada (recarga no meio da requisição) é descartado"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def bind_version(self, version: Optional[str]):
+        """Associa o cache ao índice carregado, descartando entradas de outra versão"""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.invalidations += 1
+                self.version = version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "index_version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,253 @@
+"""
+Índice em segmentos
+===================
+
+O segmento principal (catálogo gravado, TF-IDF, BM25, embeddings, vizinhos)
+é imutável e só é reconstruído por inteiro no merge. Inclusões, alterações
+e remoções feitas pela API entram em um segmento delta pequeno:
+
+- upsert: o filme entra no delta, substituindo a versão anterior, se houver;
+- delete, ou filme substituído: a linha do segmento principal vira tombstone.
+
+As linhas do delta ficam depois das do principal (posições N..N+D-1 da
+visão servida). O delta é pontuado com o vocabulário e o IDF do segmento
+principal, sem reajustar TfidfVectorizer nem BM25: termos que só aparecem
+nos filmes novos não contam até o próximo merge, e o IDF não considera os
+filmes do delta. Os scores de cada sinal são concatenados (principal +
+delta) antes da fusão, e as linhas mortas saem do resultado.
+
+Cada operação é gravada em um journal (JSON lines) e reaplicada sobre todo
+estado reconstruído (inicialização, recarga, merge). O merge grava o
+catálogo com o delta incorporado, descarta do journal as operações já
+incorporadas e reconstrói o índice em segundo plano (ver hot_reload.py).
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import AbstractSet, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from catalog import build_genre_index, build_id_index, build_popularity_index
+from neighbors import l2_normalize_rows
+from payloads import MoviePayloads
+from ranking import top_k
+from shared_artifacts import build_lock
+from text_processing import TextAnalyzer, combine_features_text
+
+logger = logging.getLogger(__name__)
+
+
+class DeltaSegment:
+    """Filmes incluídos ou alterados desde o último merge; imutável (cada operação gera outro)"""
+
+    def __init__(self, movies: Optional[pd.DataFrame] = None, tfidf_matrix: Optional[sparse.csr_matrix] = None,
+                 bm25=None, embeddings: Optional[np.ndarray] = None, payloads: Optional[MoviePayloads] = None):
+        self.movies = movies if movies is not None else pd.DataFrame()  # Inclui processed_features
+        self.tfidf_matrix = tfidf_matrix  # Filmes x termos do TF-IDF principal, linhas normalizadas (L2)
+        self.bm25 = bm25                  # SparseBM25 dos filmes do delta com o IDF do principal
+        self.embeddings = embeddings      # Filmes x dim (float32, normalizados), só no servidor semântico
+        self.payloads = payloads if payloads is not None else MoviePayloads()  # JSON de cada filme do delta
+
+    def __len__(self) -> int:
+        return len(self.movies)
+
+    @property
+    def ids(self) -> List[int]:
+        return [int(movie_id) for movie_id in self.movies['id'].tolist()] if len(self) else []
+
+    def tfidf_scores(self, query_vec: sparse.spmatrix) -> np.ndarray:
+        if not len(self):
+            return np.zeros(0)
+        return (self.tfidf_matrix @ query_vec.T).toarray().ravel()
+
+    def bm25_scores(self, tokens: List[str]) -> np.ndarray:
+        if not len(self) or self.bm25 is None:
+            return np.zeros(len(self))
+        return self.bm25.get_scores(tokens)
+
+    def sbert_scores(self, query: np.ndarray) -> np.ndarray:
+        if not len(self) or self.embeddings is None:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.embeddings @ query
+
+    def upsert(self, movies: pd.DataFrame, analyzer: TextAnalyzer, tfidf, bm25=None,
+               embed: Optional[Callable[[pd.DataFrame], np.ndarray]] = None) -> 'DeltaSegment':
+        """Novo delta com `movies` incluídos (substitui filmes de mesmo id já no delta)"""
+        movies = movies.drop_duplicates('id', keep='last').reset_index(drop=True)
+        texts = [combine_features_text(row) for row in movies.to_dict(orient='records')]
+        movies = movies.assign(processed_features=[analyzer.process(text) for text in texts])
+
+        keep = self._rows_without(movies['id'].tolist())
+        combined = pd.concat([self.movies.iloc[keep], movies], ignore_index=True) if len(self) else movies
+        embeddings = None
+        if embed is not None:
+            new_embeddings = l2_normalize_rows(np.asarray(embed(movies), dtype=np.float32))
+            embeddings = (np.vstack([self.with_embeddings(embed).embeddings[keep], new_embeddings])
+                          if len(self) else new_embeddings)
+        return _build_segment(combined, tfidf, bm25, embeddings)
+
+    def with_embeddings(self, embed: Callable[[pd.DataFrame], np.ndarray]) -> 'DeltaSegment':
+        """Mesmo delta com embeddings (ex.: reaplicado do journal antes de o SBERT carregar)"""
+        if not len(self) or self.embeddings is not None:
+            return self
+        embeddings = l2_normalize_rows(np.asarray(embed(self.movies), dtype=np.float32))
+        return DeltaSegment(self.movies, self.tfidf_matrix, self.bm25, embeddings, self.payloads)
+
+    def remove(self, ids: Iterable[int], tfidf, bm25=None) -> 'DeltaSegment':
+        """Novo delta sem os filmes de `ids`"""
+        keep = self._rows_without(ids)
+        if len(keep) == len(self):
+            return self
+        embeddings = self.embeddings[keep] if self.embeddings is not None else None
+        return _build_segment(self.movies.iloc[keep].reset_index(drop=True), tfidf, bm25, embeddings)
+
+    def _rows_without(self, ids: Iterable[int]) -> np.ndarray:
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(~self.movies['id'].isin(list(ids)).to_numpy())
+
+
+def _build_segment(movies: pd.DataFrame, tfidf, bm25, embeddings: Optional[np.ndarray]) -> DeltaSegment:
+    """Matrizes do delta a partir dos textos já processados (transform, sem reajuste)"""
+    if movies.empty:
+        return DeltaSegment()
+    features = movies['processed_features'].tolist()
+    tfidf_matrix = tfidf.transform(features).tocsr()
+    delta_bm25 = bm25.for_documents(doc.split() for doc in features) if bm25 is not None else None
+    return DeltaSegment(movies, tfidf_matrix, delta_bm25, embeddings, MoviePayloads.from_frame(movies))
+
+
+# =============================================================================
+# VISÃO SERVIDA (PRINCIPAL + DELTA)
+# =============================================================================
+
+def segment_view(main: pd.DataFrame, main_payloads: MoviePayloads, delta: DeltaSegment,
+                 deleted_ids: AbstractSet[int]) -> Dict:
+    """
+    Campos do estado servido para o segmento principal `main` com o delta e
+    as remoções aplicados: DataFrame combinado e seu JSON pré-serializado,
+    máscara de linhas vivas (None se todas estão vivas) e os índices de
+    navegação (ordem de popularidade, gêneros, id -> linha).
+    """
+    if not len(delta) and not deleted_ids:
+        df, alive = main, None
+    else:
+        df = pd.concat([main, delta.movies], ignore_index=True) if len(delta) else main
+        replaced = set(deleted_ids) | set(delta.ids)
+        alive = np.concatenate([~main['id'].isin(list(replaced)).to_numpy(), np.ones(len(delta), dtype=bool)])
+    popular_rows = build_popularity_index(df, alive)
+    genre_index = build_genre_index(df, alive, popular_rows)
+    return {
+        'df_movies': df,
+        'payloads': main_payloads + delta.payloads,
+        'alive': alive,
+        'popular_rows': popular_rows,
+        'genre_index': genre_index,
+        'all_genres': sorted(genre_index),
+        'genre_rows_cache': {},
+        'id_to_row': build_id_index(df, alive),
+    }
+
+
+def concat_scores(main_scores: np.ndarray, delta_scores: np.ndarray) -> np.ndarray:
+    """Scores na ordem da visão servida (principal, depois delta)"""
+    if not len(delta_scores):
+        return main_scores
+    return np.concatenate([main_scores, delta_scores.astype(main_scores.dtype, copy=False)])
+
+
+def dead_rows(alive: Optional[np.ndarray]) -> int:
+    return 0 if alive is None else int(len(alive) - np.count_nonzero(alive))
+
+
+def drop_dead(indices: np.ndarray, scores: np.ndarray, alive: Optional[np.ndarray],
+              k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k sem as linhas mortas; quem chama seleciona k + dead_rows(alive) candidatos"""
+    if alive is not None:
+        keep = alive[indices]
+        indices, scores = indices[keep], scores[keep]
+    return indices[:k], scores[:k]
+
+
+def live_top_k(scores: np.ndarray, k: int, alive: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """top_k ignorando linhas mortas (mesmo resultado de top_k quando todas estão vivas)"""
+    indices, values = top_k(scores, k + dead_rows(alive))
+    return drop_dead(indices, values, alive, k)
+
+
+def merge_candidates(main: Tuple[np.ndarray, np.ndarray], delta_scores: np.ndarray, offset: int,
+                     k: int, alive: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Une os candidatos de uma busca no principal (ex.: ANN) com o delta inteiro e devolve o top-k vivo"""
+    indices, scores = main
+    if len(delta_scores):
+        indices = np.concatenate([indices, offset + np.arange(len(delta_scores))])
+        scores = np.concatenate([scores, delta_scores.astype(scores.dtype, copy=False)])
+        order = np.lexsort((indices, -scores))
+        indices, scores = indices[order], scores[order]
+    return drop_dead(indices, scores, alive, k)
+
+
+# =============================================================================
+# JOURNAL
+# =============================================================================
+
+class DeltaJournal:
+    """Operações (upsert/delete) ainda não incorporadas ao catálogo, uma por linha JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        entries = self.read()
+        self.last_seq = entries[-1]['seq'] if entries else 0
+        self.pending = len(entries)
+
+    def read(self, after_seq: int = 0) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha incompleta (queda durante a escrita): a operação não foi confirmada
+                    logger.warning(f"Linha inválida ignorada em {self.path}")
+                    continue
+                if entry['seq'] > after_seq:
+                    entries.append(entry)
+        return entries
+
+    def append(self, operation: Dict) -> int:
+        """Grava a operação (fsync) e devolve seu número de sequência"""
+        with self._lock, build_lock(self.path):
+            # Relido sob o lock: outro worker pode ter gravado desde a última operação deste
+            entries = self.read()
+            seq = (entries[-1]['seq'] if entries else 0) + 1
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(operation, seq=seq), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.last_seq = seq
+            self.pending = len(entries) + 1
+            return seq
+
+    def compact(self, through_seq: int):
+        """Descarta as operações até `through_seq` (já gravadas no catálogo pelo merge)"""
+        with self._lock, build_lock(self.path):
+            remaining = self.read(through_seq)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in remaining:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.pending = len(remaining)
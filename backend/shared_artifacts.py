@@ -0,0 +1,98 @@
+"""
+Artefatos compartilhados entre workers
+======================================
+
+Com `uvicorn --workers N`, cada processo carrega os mesmos dados. Os
+componentes somente-leitura (catálogo Arrow, arrays CSR do índice lexical,
+embeddings) ficam em arquivos abertos com memory-map: as páginas vivem no
+page cache e são contadas uma vez para todos os workers.
+
+Este módulo cuida do que falta para isso funcionar com vários processos:
+
+- `build_lock`: lock de arquivo entre processos. Quando um artefato está
+  ausente, apenas um worker o constrói e grava; os demais esperam e abrem a
+  versão gravada, em vez de cada um construir a sua cópia em memória.
+- `process_memory`: RSS do worker, separando páginas compartilhadas
+  (memory-map) das privadas, para o /health.
+"""
+
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_SUFFIX = '.lock'
+
+
+@contextmanager
+def build_lock(path):
+    """Lock exclusivo entre processos associado a `path` (arquivo `<path>.lock`)"""
+    lock_path = Path(f"{path}{LOCK_SUFFIX}")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info(f"Aguardando outro processo terminar de gerar {path}...")
+                fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_kb_fields(path: str) -> Dict[str, int]:
+    """Campos 'Nome:   123 kB' de /proc/self/status ou smaps_rollup"""
+    fields = {}
+    with open(path) as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == 'kB':
+                fields[name] = int(parts[0])
+    return fields
+
+
+def process_memory() -> Dict:
+    """
+    Memória do processo atual em MB.
+
+    `pss_mb` divide cada página compartilhada entre os processos que a mapeiam
+    (a soma do PSS dos workers é o uso real); `shared_mb` são as páginas
+    também mapeadas por outros processos (memory-maps e bibliotecas).
+    """
+    stats = {"pid": os.getpid()}
+    try:
+        rollup = _read_kb_fields('/proc/self/smaps_rollup')
+        shared = rollup.get('Shared_Clean', 0) + rollup.get('Shared_Dirty', 0)
+        private = rollup.get('Private_Clean', 0) + rollup.get('Private_Dirty', 0)
+        stats.update({
+            "rss_mb": round(rollup['Rss'] / 1024, 1),
+            "pss_mb": round(rollup['Pss'] / 1024, 1),
+            "shared_mb": round(shared / 1024, 1),
+            "private_mb": round(private / 1024, 1),
+        })
+        return stats
+    except (OSError, KeyError):
+        pass
+
+    try:
+        status = _read_kb_fields('/proc/self/status')
+        stats["rss_mb"] = round(status['VmRSS'] / 1024, 1)
+    except (OSError, KeyError):
+        # Sem /proc (macOS): pico de RSS; ru_maxrss é em bytes no macOS e em kB no Linux
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stats["max_rss_mb"] = round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    return stats
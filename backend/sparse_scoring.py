@@ -0,0 +1,164 @@
+"""
+Scoring esparso
+===============
+
+Implementação do BM25 Okapi (mesmos parâmetros e mesma fórmula do
+rank_bm25.BM25Okapi) sobre uma matriz CSR termo-documento com os pesos já
+calculados:
+
+    w(t, d) = idf(t) * tf(t, d) * (k1 + 1) / (tf(t, d) + k1 * (1 - b + b * |d| / avgdl))
+
+Pontuar uma query passa a ser somar as linhas dos termos da query, em vez de
+percorrer em Python o dicionário de frequências de cada documento. Os pesos
+são calculados com as mesmas operações em float64 e somados na mesma ordem
+dos tokens, então os scores são idênticos aos do rank_bm25.
+
+O mesmo acúmulo de linhas serve ao TF-IDF: com as linhas da matriz já
+normalizadas (L2) no build, a similaridade cosseno da query é o produto
+escalar calculado só sobre os postings dos termos da query.
+"""
+
+import copy
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+# Parâmetros padrão do rank_bm25.BM25Okapi
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+DEFAULT_EPSILON = 0.25
+
+
+def accumulate_rows(matrix: sparse.csr_matrix, rows: Iterable[int], weights: Optional[Iterable[float]] = None) -> np.ndarray:
+    """
+    Soma de linhas de uma matriz CSR termo-documento em um vetor denso de
+    scores por documento, opcionalmente com um peso por linha.
+    """
+    scores = np.zeros(matrix.shape[1])
+    data, indices, indptr = matrix.data, matrix.indices, matrix.indptr
+    if weights is None:
+        for row in rows:
+            start, stop = indptr[row], indptr[row + 1]
+            scores[indices[start:stop]] += data[start:stop]
+    else:
+        for row, weight in zip(rows, weights):
+            start, stop = indptr[row], indptr[row + 1]
+            scores[indices[start:stop]] += weight * data[start:stop]
+    return scores
+
+
+def sparse_dot_scores(postings: sparse.csr_matrix, query_vec: sparse.spmatrix) -> np.ndarray:
+    """
+    Produto escalar de um vetor de query esparso (1 x termos) com todos os
+    documentos, a partir da matriz termo-documento (`postings`). Com linhas
+    normalizadas, equivale a cosine_similarity sem copiar o corpus.
+    """
+    query_vec = query_vec.tocsr()
+    return accumulate_rows(postings, query_vec.indices, query_vec.data)
+
+
+class SparseBM25:
+    """BM25 Okapi com pesos pré-calculados em uma matriz CSR (termos x documentos)"""
+
+    def __init__(self, terms: Sequence[str], weights: sparse.csr_matrix, idf: np.ndarray,
+                 doc_len: np.ndarray, k1: float = DEFAULT_K1, b: float = DEFAULT_B,
+                 epsilon: float = DEFAULT_EPSILON, avgdl: float = 0.0, average_idf: float = 0.0):
+        self.terms = list(terms)
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        self.weights = weights
+        self.idf = idf
+        self.doc_len = doc_len
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.avgdl = avgdl
+        self.average_idf = average_idf
+
+    @property
+    def corpus_size(self) -> int:
+        return self.weights.shape[1]
+
+    @classmethod
+    def fit(cls, corpus: Iterable[List[str]], k1: float = DEFAULT_K1, b: float = DEFAULT_B,
+            epsilon: float = DEFAULT_EPSILON) -> 'SparseBM25':
+        """Indexa um corpus já tokenizado"""
+        # Vocabulário na ordem de primeira ocorrência, como o dicionário `nd` do rank_bm25
+        vocabulary: Dict[str, int] = {}
+        indptr, indices, counts, doc_len = [0], [], [], []
+        for document in corpus:
+            frequencies: Dict[str, int] = {}
+            for word in document:
+                frequencies[word] = frequencies.get(word, 0) + 1
+            for word, count in frequencies.items():
+                indices.append(vocabulary.setdefault(word, len(vocabulary)))
+                counts.append(count)
+            indptr.append(len(indices))
+            doc_len.append(len(document))
+
+        corpus_size = len(doc_len)
+        avgdl = sum(doc_len) / corpus_size
+        indices = np.asarray(indices, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.int64)
+        doc_len = np.asarray(doc_len, dtype=np.int64)
+
+        # IDF com math.log e acumulado na mesma ordem do rank_bm25
+        doc_freq = np.bincount(indices, minlength=len(vocabulary)).tolist()
+        idf, idf_sum, negative = [], 0.0, []
+        for term_id, freq in enumerate(doc_freq):
+            value = math.log(corpus_size - freq + 0.5) - math.log(freq + 0.5)
+            idf.append(value)
+            idf_sum += value
+            if value < 0:
+                negative.append(term_id)
+        average_idf = idf_sum / len(idf)
+        idf = np.asarray(idf, dtype=np.float64)
+        idf[negative] = epsilon * average_idf
+
+        # Pesos por (documento, termo), na mesma sequência de operações do get_scores original
+        dl = np.repeat(doc_len, np.diff(indptr))
+        data = idf[indices] * (tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)))
+        doc_major = sparse.csr_matrix((data, indices, np.asarray(indptr, dtype=np.int64)),
+                                      shape=(corpus_size, len(vocabulary)))
+
+        return cls(list(vocabulary), doc_major.T.tocsr(), idf, doc_len,
+                   k1=k1, b=b, epsilon=epsilon, avgdl=avgdl, average_idf=average_idf)
+
+    def for_documents(self, corpus: Iterable[List[str]]) -> 'SparseBM25':
+        """
+        Índice de outros documentos com o vocabulário, o IDF e o avgdl deste
+        (sem reajuste): termos fora do vocabulário são ignorados. Usado pelo
+        segmento delta (segments.py).
+        """
+        indptr, indices, counts, doc_len = [0], [], [], []
+        for document in corpus:
+            frequencies: Dict[int, int] = {}
+            for word in document:
+                term_id = self.vocabulary.get(word)
+                if term_id is not None:
+                    frequencies[term_id] = frequencies.get(term_id, 0) + 1
+            indices.extend(frequencies)
+            counts.extend(frequencies.values())
+            indptr.append(len(indices))
+            doc_len.append(len(document))
+
+        indices = np.asarray(indices, dtype=np.int32)
+        tf = np.asarray(counts, dtype=np.int64)
+        doc_len = np.asarray(doc_len, dtype=np.int64)
+        dl = np.repeat(doc_len, np.diff(indptr))
+        k1, b = self.k1, self.b
+        data = self.idf[indices] * (tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / self.avgdl)))
+        doc_major = sparse.csr_matrix((data, indices, np.asarray(indptr, dtype=np.int64)),
+                                      shape=(len(doc_len), len(self.terms)))
+
+        # Cópia rasa: vocabulário e IDF compartilhados com o índice principal
+        index = copy.copy(self)
+        index.weights = doc_major.T.tocsr()
+        index.doc_len = doc_len
+        return index
+
+    def get_scores(self, query: Sequence[str]) -> np.ndarray:
+        """Scores BM25 de todos os documentos para uma query tokenizada"""
+        # Uma linha (postings do termo) por token, na ordem da query: tokens
+        # repetidos contam de novo e a soma em ponto flutuante segue a mesma ordem
+        rows = [self.vocabulary[token] for token in query if token in self.vocabulary]
+        return accumulate_rows(self.weights, rows)
@@ -0,0 +1,80 @@
+"""
+Tabela de sinônimos
+===================
+
+Expansão de queries com sinônimos do WordNet pré-calculada no build do
+índice. Para cada palavra do catálogo (forma de superfície, antes da
+lemmatização) guardamos até `max_synonyms` sinônimos, descartando os que,
+depois de analisados, não têm nenhum termo no vocabulário indexado: eles não
+mudariam o score de nenhum filme.
+
+Nas requisições a expansão é só uma consulta ao dicionário, sem acesso ao
+WordNet.
+"""
+
+import logging
+from typing import Dict, Iterable, List
+
+from text_processing import TextAnalyzer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SYNONYMS = 2
+# Palavras mais curtas que isso não são expandidas
+MIN_EXPANDED_WORD_LENGTH = 4
+
+
+def wordnet_synonyms(word: str) -> List[str]:
+    """Sinônimos distintos da palavra, na ordem dos synsets do WordNet"""
+    from nltk.corpus import wordnet
+
+    synonyms = []
+    try:
+        for syn in wordnet.synsets(word):
+            for lemma in syn.lemmas():
+                synonym = lemma.name().replace('_', ' ').lower()
+                if synonym != word and len(synonym) > 2 and synonym not in synonyms:
+                    synonyms.append(synonym)
+    except Exception as e:
+        logger.warning(f"Erro ao buscar sinônimos para '{word}': {e}")
+    return synonyms
+
+
+def is_expandable(word: str, stop_words) -> bool:
+    """Palavras da query que recebem sinônimos (sem stopwords e palavras curtas)"""
+    return word not in stop_words and len(word) >= MIN_EXPANDED_WORD_LENGTH
+
+
+def build_synonym_table(words: Iterable[str], vocabulary: Iterable[str], analyzer: TextAnalyzer,
+                        max_synonyms: int = DEFAULT_MAX_SYNONYMS) -> Dict[str, List[str]]:
+    """
+    Sinônimos de cada palavra expansível de `words`, podados para o vocabulário.
+
+    Palavras sem nenhum sinônimo útil ficam fora da tabela.
+    """
+    vocabulary = set(vocabulary)
+    matches: Dict[str, bool] = {}
+
+    def matches_vocabulary(synonym: str) -> bool:
+        if synonym not in matches:
+            matches[synonym] = any(token in vocabulary for token in analyzer.analyze(synonym))
+        return matches[synonym]
+
+    table = {}
+    for word in sorted(set(words)):
+        if not is_expandable(word, analyzer.stop_words):
+            continue
+        kept = [s for s in wordnet_synonyms(word) if matches_vocabulary(s)][:max_synonyms]
+        if kept:
+            table[word] = kept
+    return table
+
+
+def expand_query(query: str, table: Dict[str, List[str]], stop_words) -> str:
+    """Query em minúsculas seguida dos sinônimos de cada palavra expansível"""
+    words = query.lower().split()
+    expanded = words.copy()
+    for word in words:
+        if is_expandable(word, stop_words):
+            expanded.extend(table.get(word, ()))
+    return " ".join(expanded)
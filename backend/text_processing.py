@@ -0,0 +1,272 @@
+"""
+Processamento de texto compartilhado
+====================================
+
+Pipeline de normalização usado tanto pelos servidores quanto pelo
+build_index, garantindo que o índice offline e as queries passem exatamente
+pelas mesmas etapas.
+
+O `TextAnalyzer` produz a mesma saída do pipeline original (lowercase,
+remoção de acentos e pontuação, word_tokenize, stopwords, lemmatização com
+POS tags), mas com as tabelas pré-compiladas:
+
+- stopwords em um frozenset e pontuação em uma tabela de `str.translate`;
+- texto ASCII sem pontuação dispensa o punkt/Treebank: o tokenizador do NLTK
+  se reduz a `split()` mais as contrações que ele separa (cannot, gonna...);
+- um único PerceptronTagger e cache limitado de (token, POS) -> lema.
+
+`process_corpus` distribui o catálogo em blocos por um pool de processos,
+preservando a ordem dos documentos.
+
+Os módulos do NLTK são importados apenas no primeiro uso (importar o pacote
+custa quase 1s), então os servidores sobem sem carregá-los.
+"""
+
+import logging
+import os
+import re
+import string
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, List, Optional, Sequence
+
+from nltk_resources import configure_data_path
+
+logger = logging.getLogger(__name__)
+
+LEMMA_CACHE_SIZE = 200_000
+
+# Documentos por tarefa enviada ao pool de pré-processamento
+PREPROCESS_CHUNK_SIZE = 256
+
+# Classes gramaticais do WordNet (nltk.corpus.wordnet.ADJ, VERB, NOUN, ADV)
+WORDNET_ADJ, WORDNET_VERB, WORDNET_NOUN, WORDNET_ADV = 'a', 'v', 'n', 'r'
+
+# Contrações que o NLTKWordTokenizer separa mesmo sem apóstrofo (CONTRACTIONS2)
+SPLIT_CONTRACTIONS = {
+    'cannot': ['can', 'not'],
+    'gimme': ['gim', 'me'],
+    'gonna': ['gon', 'na'],
+    'gotta': ['got', 'ta'],
+    'lemme': ['lem', 'me'],
+    'wanna': ['wan', 'na'],
+}
+
+# Texto em que o word_tokenize equivale a split(): só letras/dígitos ASCII e espaços
+_FAST_PATH_TEXT = re.compile(r'[a-z0-9 \t\n\r\f\v]*')
+
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+_combining_marks_table: Optional[Dict[int, None]] = None
+
+_tagger = None
+_lemmatizer = None
+
+
+def get_wordnet_pos(tag: str) -> str:
+    """Converte POS tag do Penn Treebank para formato WordNet"""
+    if tag.startswith('J'):
+        return WORDNET_ADJ
+    elif tag.startswith('V'):
+        return WORDNET_VERB
+    elif tag.startswith('N'):
+        return WORDNET_NOUN
+    elif tag.startswith('R'):
+        return WORDNET_ADV
+    return WORDNET_NOUN
+
+
+def _get_tagger():
+    """PerceptronTagger carregado uma única vez por processo"""
+    global _tagger
+    if _tagger is None:
+        from nltk.tag import PerceptronTagger
+        _tagger = PerceptronTagger()
+    return _tagger
+
+
+def _get_lemmatizer():
+    """WordNetLemmatizer criado no primeiro uso"""
+    global _lemmatizer
+    if _lemmatizer is None:
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
+
+
+def _strip_accents_table() -> Dict[int, None]:
+    """Tabela de tradução que remove marcas combinantes (categoria Mn), montada no primeiro uso"""
+    global _combining_marks_table
+    if _combining_marks_table is None:
+        _combining_marks_table = {
+            code: None for code in range(sys.maxunicode + 1)
+            if unicodedata.category(chr(code)) == 'Mn'
+        }
+    return _combining_marks_table
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize_word(word: str, pos: str) -> str:
+    """Lema de uma palavra para uma classe gramatical WordNet (memoizado)"""
+    return _get_lemmatizer().lemmatize(word, pos)
+
+
+def lemmatize_tokens(tokens: List[str]) -> List[str]:
+    """Aplica lemmatização considerando POS tags"""
+    if not tokens:
+        return []
+    try:
+        pos_tags = _get_tagger().tag(tokens)
+        return [lemmatize_word(word, get_wordnet_pos(tag)) for word, tag in pos_tags]
+    except Exception as e:
+        logger.warning(f"Erro na lemmatização: {e}")
+        return tokens
+
+
+class AnalyzedQuery:
+    """Query analisada uma vez por requisição e compartilhada por todos os scorers"""
+
+    __slots__ = ('raw', 'text', 'tokens')
+
+    def __init__(self, raw: str, tokens: List[str]):
+        self.raw = raw
+        self.tokens = tokens
+        self.text = " ".join(tokens)
+
+
+class TextAnalyzer:
+    """Normalização, tokenização, stopwords e lemmatização com tabelas pré-compiladas"""
+
+    def __init__(self, use_lemmatization: bool = True, min_token_length: int = 2):
+        self.use_lemmatization = use_lemmatization
+        self.min_token_length = min_token_length
+        from nltk.corpus import stopwords
+        configure_data_path()
+        self.stop_words = frozenset(stopwords.words('english'))
+
+    def normalize(self, text: str) -> str:
+        """Lowercase, remoção de acentos e de pontuação"""
+        text = text.lower()
+        if not text.isascii():
+            text = unicodedata.normalize('NFD', text).translate(_strip_accents_table())
+        return text.translate(_PUNCTUATION_TABLE)
+
+    def tokenize(self, text: str) -> List[str]:
+        """Tokenização equivalente ao word_tokenize para texto já normalizado"""
+        if _FAST_PATH_TEXT.fullmatch(text):
+            tokens = []
+            for token in text.split():
+                split = SPLIT_CONTRACTIONS.get(token)
+                if split is None:
+                    tokens.append(token)
+                else:
+                    tokens.extend(split)
+            return tokens
+        try:
+            from nltk.tokenize import word_tokenize
+            return word_tokenize(text)
+        except Exception:
+            return text.split()
+
+    def analyze(self, text: str) -> List[str]:
+        """Tokens finais (sem stopwords, filtrados por tamanho e lematizados)"""
+        if not isinstance(text, str):
+            return []
+        stop_words, min_length = self.stop_words, self.min_token_length
+        tokens = [t for t in self.tokenize(self.normalize(text))
+                  if t not in stop_words and len(t) >= min_length]
+        if self.use_lemmatization:
+            tokens = lemmatize_tokens(tokens)
+        return tokens
+
+    def process(self, text: str) -> str:
+        """Texto processado (tokens separados por espaço)"""
+        return " ".join(self.analyze(text))
+
+    def analyze_query(self, query: str) -> AnalyzedQuery:
+        """Analisa uma query uma única vez para TF-IDF, BM25 e demais scorers"""
+        return AnalyzedQuery(query, self.analyze(query))
+
+
+@lru_cache(maxsize=None)
+def get_analyzer(use_lemmatization: bool = True, min_token_length: int = 2) -> TextAnalyzer:
+    """Analisador compartilhado para uma configuração"""
+    return TextAnalyzer(use_lemmatization, min_token_length)
+
+
+def preprocess_text(text: str, use_lemmatization: bool = True, min_token_length: int = 2) -> str:
+    """Pré-processamento de texto para TF-IDF/BM25"""
+    return get_analyzer(use_lemmatization, min_token_length).process(text)
+
+
+def combine_features_text(row) -> str:
+    """Texto combinado do filme, com pesos por repetição, antes do pré-processamento"""
+    def get_str(val):
+        if isinstance(val, list):
+            return " ".join(val)
+        return str(val) if val else ""
+
+    genre_str = get_str(row.get('genre', ''))
+    cast_str = get_str(row.get('cast', ''))
+    keyword_str = get_str(row.get('keywords', ''))
+    director_str = str(row.get('director', ''))
+    title_str = str(row.get('title', ''))
+    description_str = str(row.get('description', ''))
+
+    # Pesos otimizados (repetição = peso maior)
+    features = [
+        keyword_str * 6,   # Keywords: peso 6x
+        title_str * 3,     # Título: peso 3x
+        director_str * 3,  # Diretor: peso 3x
+        cast_str * 2,      # Elenco: peso 2x
+        genre_str * 2,     # Gênero: peso 2x
+        description_str    # Descrição: peso 1x
+    ]
+
+    return " ".join(features)
+
+
+def create_combined_features(row, use_lemmatization: bool = True, min_token_length: int = 2) -> str:
+    """Combina features com pesos para criar representação textual do filme"""
+    return preprocess_text(combine_features_text(row), use_lemmatization, min_token_length)
+
+
+def _process_chunk(texts: Sequence[str], use_lemmatization: bool, min_token_length: int) -> List[str]:
+    """Processa um bloco de documentos (executado nos workers do pool)"""
+    analyzer = get_analyzer(use_lemmatization, min_token_length)
+    return [analyzer.process(text) for text in texts]
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """Número de processos do pré-processamento (None ou 0 = todos os núcleos)"""
+    if not workers:
+        # Respeita a afinidade de CPU (containers/taskset) quando disponível
+        if hasattr(os, 'sched_getaffinity'):
+            workers = len(os.sched_getaffinity(0))
+        else:
+            workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def process_corpus(texts: Sequence[str], use_lemmatization: bool = True, min_token_length: int = 2,
+                   workers: Optional[int] = None, chunk_size: int = PREPROCESS_CHUNK_SIZE) -> List[str]:
+    """
+    Processa o corpus inteiro em blocos distribuídos por um pool de processos.
+
+    A saída segue a ordem de `texts` independentemente do número de workers;
+    com um worker (ou um único bloco) tudo roda no processo atual.
+    """
+    texts = list(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    workers = min(resolve_workers(workers), len(chunks))
+    task = partial(_process_chunk, use_lemmatization=use_lemmatization, min_token_length=min_token_length)
+
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map devolve os blocos na ordem de envio
+                return [doc for chunk in pool.map(task, chunks) for doc in chunk]
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Pool de pré-processamento indisponível ({e}); processando em um único núcleo")
+    return [doc for chunk in chunks for doc in task(chunk)]
@@ -1,5 +1,9 @@
 const API_URL = 'http://localhost:8000';
 
+// Fields rendered by the genre row cards (the API returns only these)
+const CARD_FIELDS = 'id,title,image_url,vote_average';
+const GENRE_PAGE_SIZE = 20;
+
 // Current selected movie for modal
 let currentMovie = null;
 
@@ -147,6 +151,21 @@ function openModal(movie, similarMovies = null) {
     }
 }
 
+async function openMovieDetails(movie) {
+    // Row cards carry only CARD_FIELDS: fetch the full record for the modal
+    if (movie.description === undefined) {
+        try {
+            const response = await fetch(`${API_URL}/movies/${movie.id}`);
+            if (response.ok) {
+                movie = await response.json();
+            }
+        } catch (error) {
+            console.error('Error loading movie details:', error);
+        }
+    }
+    openModal(movie);
+}
+
 function closeModal() {
     const modal = document.getElementById('movieModal');
     modal.classList.add('hidden');
@@ -159,18 +178,13 @@ async function loadSimilarMovies(movie) {
     container.innerHTML = '<div class="loading-similar"><div class="spinner"></div></div>';
 
     try {
-        const searchQuery = createSearchQuery(movie);
-        const response = await fetch(`${API_URL}/recommend`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ query: searchQuery }),
-        });
-        const data = await response.json();
-        const recommendations = Array.isArray(data) ? data : (data.movies || []);
-        
-        // Filter out the current movie
-        const filtered = recommendations.filter(m => m.id !== movie.id);
-        displaySimilarMovies(filtered);
+        // Precomputed neighbors (the current movie is never included)
+        const response = await fetch(`${API_URL}/movies/${movie.id}/similar?limit=10`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const similar = await response.json();
+        displaySimilarMovies(similar);
     } catch (error) {
         console.error('Error loading similar movies:', error);
         container.innerHTML = '<p style="color: #888;">Could not load similar movies.</p>';
@@ -212,23 +226,20 @@ function displaySimilarMovies(movies) {
 
 async function loadGenreSections() {
     try {
-        // Fetch all available genres
-        const genresResponse = await fetch(`${API_URL}/genres`);
-        const genres = await genresResponse.json();
+        // Fetch the first page of every genre in a single request, with only the card fields
+        const response = await fetch(`${API_URL}/movies/by-genre?limit=${GENRE_PAGE_SIZE}&fields=${CARD_FIELDS}`);
+        const genreRows = await response.json();
 
         const genreSectionsContainer = document.getElementById('genreSections');
 
-        // Load movies for each genre
-        for (const genre of genres) {
+        for (const { genre, movies, next_cursor } of genreRows) {
             const section = createGenreSection(genre);
             genreSectionsContainer.appendChild(section);
 
-            // Fetch movies for this genre
-            const moviesResponse = await fetch(`${API_URL}/movies/by-genre/${encodeURIComponent(genre)}?limit=20`);
-            const movies = await moviesResponse.json();
-
             // Display movies in the genre section
-            displayMoviesInRow(movies, `genre-${genre.replace(/\s+/g, '-')}`);
+            const rowId = `genre-${genre.replace(/\s+/g, '-')}`;
+            displayMoviesInRow(movies, rowId);
+            setNextCursor(rowId, next_cursor);
         }
     } catch (error) {
         console.error('Error loading genre sections:', error);
@@ -263,17 +274,60 @@ function createGenreSection(genre) {
 
     scrollRight.addEventListener('click', () => {
         const row = document.getElementById(genreId);
+        // Fetch the next page before reaching the end of the loaded cards
+        if (row.scrollLeft + row.clientWidth + 800 >= row.scrollWidth) {
+            loadMoreGenreMovies(genre, genreId);
+        }
         row.scrollBy({ left: 800, behavior: 'smooth' });
     });
 
     return section;
 }
 
-function displayMoviesInRow(movies, rowId) {
+function setNextCursor(rowId, cursor) {
+    const row = document.getElementById(rowId);
+    if (!row) return;
+
+    if (cursor) {
+        row.dataset.nextCursor = cursor;
+    } else {
+        delete row.dataset.nextCursor;
+    }
+}
+
+async function loadMoreGenreMovies(genre, rowId) {
+    const row = document.getElementById(rowId);
+    if (!row || !row.dataset.nextCursor || row.dataset.loading) return;
+
+    row.dataset.loading = 'true';
+    try {
+        // The cursor resumes after the last card shown, even if the catalog changed meanwhile
+        const params = new URLSearchParams({
+            limit: GENRE_PAGE_SIZE,
+            cursor: row.dataset.nextCursor,
+            fields: CARD_FIELDS
+        });
+        const response = await fetch(`${API_URL}/movies/by-genre/${encodeURIComponent(genre)}?${params}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const movies = await response.json();
+        displayMoviesInRow(movies, rowId, true);
+        setNextCursor(rowId, response.headers.get('X-Next-Cursor'));
+    } catch (error) {
+        console.error('Error loading more movies:', error);
+    } finally {
+        delete row.dataset.loading;
+    }
+}
+
+function displayMoviesInRow(movies, rowId, append = false) {
     const row = document.getElementById(rowId);
     if (!row) return;
 
-    row.innerHTML = '';
+    if (!append) {
+        row.innerHTML = '';
+    }
 
     movies.forEach(movie => {
         const card = document.createElement('div');
@@ -289,7 +343,7 @@ function displayMoviesInRow(movies, rowId) {
 
         // Add click event to open modal
         card.addEventListener('click', () => {
-            openModal(movie);
+            openMovieDetails(movie);
         });
 
         row.appendChild(card);
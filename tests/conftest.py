@@ -0,0 +1,158 @@
+"""
+Fixtures dos testes do backend
+==============================
+
+Os módulos do backend são importados como no servidor (`backend/` no
+sys.path). Os testes de servidor rodam em um diretório temporário com um
+catálogo sintético em `data/`; cada "reinicialização" reimporta o módulo,
+com estado global novo, sobre os mesmos arquivos.
+
+Os dados do NLTK (stopwords, tagger, WordNet) não são necessários: o
+fixture `stub_nltk` troca o analisador por um com stopwords, "lemmatização"
+e sinônimos fixos, então os testes rodam iguais em qualquer ambiente.
+"""
+
+import importlib
+import os
+import sys
+import threading
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+ADMIN_TOKEN = 'test-token'
+ADMIN_HEADERS = {'X-Admin-Token': ADMIN_TOKEN}
+
+# Vocabulário repetido entre filmes: o TF-IDF do perfil 'lexical' usa min_df=2
+THEMES = [
+    ('Action', 'space', 'alien robots attack a space station'),
+    ('Drama', 'family', 'a family drama about loss and hope'),
+    ('Comedy', 'party', 'friends plan a wild party that goes wrong'),
+    ('Horror', 'ghost', 'a haunted house ghost terrifies a family'),
+    ('Romance', 'love', 'two strangers fall in love in paris'),
+]
+
+
+def synthetic_catalog(n: int = 40) -> pd.DataFrame:
+    rows = []
+    for i in range(n):
+        genre, keyword, description = THEMES[i % len(THEMES)]
+        rows.append({
+            'id': 1000 + i,
+            'title': f"{keyword.title()} Story {i}",
+            'description': f"{description} number {i % 7}",
+            'genre': [genre],
+            'image_url': f"https://example.com/{1000 + i}.jpg",
+            'director': f"Director {i % 4}",
+            'cast': [f"Actor {i % 6}", f"Actor {(i + 1) % 6}"],
+            'keywords': [keyword, THEMES[(i + 1) % len(THEMES)][1]],
+            'vote_average': 5.0 + (i % 5),
+            'vote_count': 100 + i,
+            'popularity': float(n - i),
+        })
+    return pd.DataFrame(rows)
+
+
+STUB_STOP_WORDS = frozenset({'a', 'an', 'and', 'about', 'in', 'of', 'that', 'the', 'to', 'two', 'with'})
+# Sinônimos "do WordNet" para palavras do catálogo sintético; a poda ao vocabulário continua valendo
+STUB_SYNONYMS = {
+    'ghost': ['spirit', 'haunted'],
+    'robots': ['automaton', 'alien'],
+    'love': ['romance', 'strangers'],
+}
+
+
+def stub_lemmatize(tokens):
+    """Lemmatização determinística sem o tagger/WordNet: remove o plural em 's'"""
+    return [token[:-1] if len(token) > 3 and token.endswith('s') else token for token in tokens]
+
+
+class HashingEncoder:
+    """Encoder determinístico no lugar do SBERT: soma de vetores aleatórios fixos por palavra"""
+
+    dim = 32
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=32, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i] += np.random.default_rng(zlib.crc32(word.encode('utf-8'))).normal(size=self.dim)
+        return vectors
+
+
+def fake_sbert_loader(module_name: str):
+    """Substituto de `load_sbert_model` que instala o HashingEncoder no servidor"""
+    def load():
+        from query_encoder import QueryEncoder
+
+        module = sys.modules[module_name]
+        module.sbert_model = HashingEncoder()
+        module.sbert_model_id = 'hashing-encoder'
+        module.query_encoder = QueryEncoder(module.sbert_model, 16, 4, 0.0)
+    return load
+
+
+def join_threads(name: str):
+    for thread in threading.enumerate():
+        if thread.name == name:
+            thread.join(timeout=300)
+
+
+@pytest.fixture
+def stub_nltk(monkeypatch):
+    """Analisador sem os dados do NLTK: stopwords, lemas e sinônimos fixos"""
+    import nltk_resources
+    import synonyms
+    import text_processing
+
+    def stub_init(self, use_lemmatization: bool = True, min_token_length: int = 2):
+        self.use_lemmatization = use_lemmatization
+        self.min_token_length = min_token_length
+        self.stop_words = STUB_STOP_WORDS
+
+    monkeypatch.setattr(text_processing.TextAnalyzer, '__init__', stub_init)
+    monkeypatch.setattr(text_processing, 'lemmatize_tokens', stub_lemmatize)
+    monkeypatch.setattr(synonyms, 'wordnet_synonyms', lambda word: list(STUB_SYNONYMS.get(word, ())))
+    # Os servidores são reimportados a cada início e ligam esta versão
+    monkeypatch.setattr(nltk_resources, 'require_resources', lambda names, data_dir=None: None)
+    text_processing.get_analyzer.cache_clear()
+    yield
+    text_processing.get_analyzer.cache_clear()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, stub_nltk):
+    """Diretório de trabalho com o catálogo sintético gravado em data/"""
+    from data_processor import save_movies
+
+    os.makedirs(tmp_path / 'data')
+    save_movies(synthetic_catalog(), str(tmp_path / 'data' / 'processed_movies.arrow'))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('NETRECS_ADMIN_TOKEN', ADMIN_TOKEN)
+    return tmp_path
+
+
+@pytest.fixture
+def start_server(workdir):
+    """`start_server(nome, **atributos)`: importa o servidor do zero, com `atributos` substituídos, e espera a carga"""
+    from fastapi.testclient import TestClient
+
+    @contextmanager
+    def start(module_name: str, **overrides):
+        sys.modules.pop(module_name, None)
+        module = importlib.import_module(module_name)
+        module.PREPROCESS_WORKERS = 1
+        for name, value in overrides.items():
+            setattr(module, name, value)
+        with TestClient(module.app) as client:
+            join_threads('startup-loader')
+            yield module, client
+        join_threads('catalog-reload')
+
+    return start
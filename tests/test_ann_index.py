@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from ann_index import ExactSearcher, IVFIndex, dense_scores, min_score
+from embedding_store import EmbeddingStore, quantize
+from ranking import normalize_scores
+
+from conftest import fake_sbert_loader
+
+
+def random_store(n=500, dim=16, dtype='float32', seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    if dtype == 'float32':
+        data, scales = embeddings, None
+    else:
+        data, scales = quantize(embeddings, dtype)
+    return EmbeddingStore(data, scales, 'test-model', [str(i) for i in range(n)]), rng
+
+
+def random_query(rng, dim=16):
+    query = rng.normal(size=dim).astype(np.float32)
+    return query / np.linalg.norm(query)
+
+
+@pytest.mark.parametrize('dtype', ['float32', 'float16', 'int8'])
+def test_min_score_is_corpus_minimum(dtype):
+    store, rng = random_store(dtype=dtype)
+    ivf = IVFIndex.build(store, nlist=8)
+    for _ in range(5):
+        query = random_query(rng)
+        expected = float(store.scores(query).min())
+        assert min_score(ExactSearcher(store), query) == pytest.approx(expected, abs=1e-6)
+        # Visitando todas as listas o IVF também encontra o mínimo exato
+        assert min_score(ivf, query, nprobe=ivf.nlist) == pytest.approx(expected, abs=1e-6)
+
+
+def test_dense_scores_keep_exact_normalization_scale():
+    store, rng = random_store()
+    query = random_query(rng)
+    exact = store.scores(query)
+    indices, scores = ExactSearcher(store).search(query, 20)
+
+    dense = dense_scores(len(store), indices, scores, min_score(ExactSearcher(store), query))
+
+    # Candidatos com o mesmo score normalizado da busca exata; o resto no piso (zero)
+    np.testing.assert_allclose(normalize_scores(dense)[indices], normalize_scores(exact)[indices], rtol=1e-6)
+    outside = np.setdiff1d(np.arange(len(store)), indices)
+    assert not normalize_scores(dense)[outside].any()
+
+
+def test_dense_scores_floor_never_above_a_candidate():
+    dense = dense_scores(5, np.array([1, 3]), np.array([0.2, -0.4], dtype=np.float32), floor=0.0)
+    np.testing.assert_allclose(dense, [-0.4, 0.2, -0.4, -0.4, -0.4])
+
+
+def test_hybrid_ann_floor_is_corpus_minimum(start_server):
+    with start_server('main_semantic', load_sbert_model=fake_sbert_loader('main_semantic'),
+                      FUSION_CANDIDATE_DEPTH=5) as (module, client):
+        assert client.get('/health').json()['status'] == 'healthy'
+        state = module.search.current
+        query = module.analyzer.analyze_query('alien robots attack a haunted family')
+        ann = {'backend': 'ivf', 'nprobe': 1, 'ef': None}
+
+        exact = module.sbert_similarity(state, query)
+        approximate = module.sbert_candidate_scores(state, query, ann)
+
+        # Mesmos min/max da busca exata: a normalização da fusão não muda de escala
+        assert approximate.min() == pytest.approx(exact.min(), abs=1e-6)
+        assert approximate.max() == pytest.approx(exact.max(), abs=1e-6)
+
+        response = client.post('/recommend', json={'query': 'alien robots', 'algorithm': 'hybrid', 'ann': 'ivf'})
+        assert response.status_code == 200
+        assert response.json()['query_info']['ann_backend'] == 'ivf'
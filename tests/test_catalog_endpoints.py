@@ -0,0 +1,34 @@
+import pytest
+
+SERVERS = ['main', 'main_enhanced', 'main_semantic']
+
+
+@pytest.mark.parametrize('module_name', SERVERS)
+def test_genre_page_limit_is_clamped(start_server, module_name):
+    with start_server(module_name, MAX_GENRE_ROW_LIMIT=3) as (_, client):
+        response = client.get('/movies/by-genre/Action', params={'limit': 10_000_000})
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+        assert response.headers['X-Next-Cursor']
+
+        rest = client.get('/movies/by-genre/Action', params={'limit': 10_000_000,
+                                                             'cursor': response.headers['X-Next-Cursor']})
+        assert len(rest.json()) == 3
+
+
+@pytest.mark.parametrize('module_name', SERVERS)
+def test_genre_pages_cover_the_genre_once(start_server, module_name):
+    with start_server(module_name) as (_, client):
+        expected = [movie['id'] for movie in client.get('/movies/by-genre/Drama', params={'limit': 100}).json()]
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 3, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            response = client.get('/movies/by-genre/Drama', params=params)
+            seen += [movie['id'] for movie in response.json()]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+
+        assert seen == expected and len(expected) == 8
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from catalog import load_movies
+
+from conftest import ADMIN_HEADERS, join_threads
+
+NEW_MOVIE = {'title': 'Zorbulon Galactic Invasion', 'description': 'zorbulon robots invade the galaxy',
+             'genre': ['Action'], 'keywords': ['zorbulon'], 'popularity': 1000.0}
+QUERY = {'query': 'zorbulon robots invade the galaxy', 'algorithm': 'tfidf', 'top_n': 5}
+
+
+def recommended_ids(client, query=QUERY):
+    response = client.post('/recommend', json=query)
+    assert response.status_code == 200
+    return [movie['id'] for movie in response.json()['movies']]
+
+
+def journal_entries():
+    with open('data/catalog_delta.jsonl', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_upsert_delete_and_reupsert_same_id(start_server):
+    with start_server('main_enhanced') as (_, client):
+        assert client.put('/admin/movies/5000', json=NEW_MOVIE, headers=ADMIN_HEADERS).status_code == 200
+        assert client.get('/movies/5000').json()['title'] == NEW_MOVIE['title']
+        assert 5000 in recommended_ids(client)
+
+        assert client.delete('/admin/movies/5000', headers=ADMIN_HEADERS).status_code == 200
+        assert client.get('/movies/5000').status_code == 404
+        assert 5000 not in recommended_ids(client)
+        assert client.delete('/admin/movies/5000', headers=ADMIN_HEADERS).status_code == 404
+
+        again = dict(NEW_MOVIE, title='Zorbulon Returns')
+        assert client.put('/admin/movies/5000', json=again, headers=ADMIN_HEADERS).status_code == 200
+        assert client.get('/movies/5000').json()['title'] == 'Zorbulon Returns'
+        assert 5000 in recommended_ids(client)
+
+        delta = client.get('/health').json()['delta']
+        assert (delta['movies'], delta['deleted'], delta['applied_seq']) == (1, 0, 3)
+
+
+def test_upsert_of_catalog_movie_tombstones_main_row(start_server):
+    with start_server('main_enhanced') as (_, client):
+        original = client.get('/movies/1000').json()
+        changed = dict(original, title='Renamed', popularity=0.0)
+        assert client.put('/admin/movies/1000', json=changed, headers=ADMIN_HEADERS).status_code == 200
+
+        ids = [movie['id'] for movie in client.get('/movies', params={'fields': 'id'}).json()]
+        assert ids.count(1000) == 1 and ids[-1] == 1000
+        assert client.get('/movies/1000').json()['title'] == 'Renamed'
+
+
+def test_journal_replayed_on_restart(start_server):
+    with start_server('main_enhanced') as (_, client):
+        client.put('/admin/movies/5000', json=NEW_MOVIE, headers=ADMIN_HEADERS)
+        client.delete('/admin/movies/1001', headers=ADMIN_HEADERS)
+
+    with start_server('main_enhanced') as (_, client):
+        health = client.get('/health').json()
+        assert health['status'] == 'healthy'
+        assert (health['delta']['movies'], health['delta']['deleted'], health['delta']['applied_seq']) == (1, 1, 2)
+        assert client.get('/movies/1001').status_code == 404
+        assert 5000 in recommended_ids(client)
+
+
+def test_journal_replayed_when_neighbors_fail(start_server):
+    with start_server('main_enhanced') as (_, client):
+        client.delete('/admin/movies/1001', headers=ADMIN_HEADERS)
+
+    def broken_neighbors(state):
+        raise RuntimeError("falha ao gravar a tabela de vizinhos")
+
+    with start_server('main_enhanced', with_neighbors=broken_neighbors) as (_, client):
+        health = client.get('/health').json()
+        assert health['status'] == 'partial'
+        assert health['components']['neighbors']['state'] == 'failed'
+        assert client.get('/movies/1001').status_code == 404
+        # Alterações continuam aceitas sem os componentes opcionais
+        assert client.put('/admin/movies/5000', json=NEW_MOVIE, headers=ADMIN_HEADERS).status_code == 200
+
+
+def test_journal_replayed_when_sbert_fails(start_server):
+    def broken_sbert():
+        raise RuntimeError("modelo SBERT indisponível")
+
+    with start_server('main_semantic', load_sbert_model=broken_sbert) as (_, client):
+        assert client.get('/health').json()['status'] == 'partial'
+        assert client.delete('/admin/movies/1001', headers=ADMIN_HEADERS).status_code == 200
+        assert client.put('/admin/movies/5000', json=NEW_MOVIE, headers=ADMIN_HEADERS).status_code == 200
+
+    assert [entry['op'] for entry in journal_entries()] == ['delete', 'upsert']
+
+    with start_server('main_semantic', load_sbert_model=broken_sbert) as (module, client):
+        health = client.get('/health').json()
+        assert health['status'] == 'partial'
+        assert health['components']['sbert']['state'] == 'failed'
+        assert health['delta']['applied_seq'] == 2 and health['delta']['journal_pending'] == 2
+        assert client.get('/movies/1001').status_code == 404
+        assert 5000 in recommended_ids(client)
+        assert module.search.current.delta.embeddings is None
+
+
+def test_merge_folds_delta_into_catalog(start_server):
+    with start_server('main_enhanced') as (_, client):
+        client.put('/admin/movies/5000', json=NEW_MOVIE, headers=ADMIN_HEADERS)
+        client.delete('/admin/movies/1001', headers=ADMIN_HEADERS)
+        old_version = client.get('/health').json()['index_version']
+
+        assert client.post('/admin/merge', headers=ADMIN_HEADERS).status_code == 202
+        join_threads('catalog-reload')
+
+        health = client.get('/health').json()
+        assert health['reload']['reloads'] == 1 and health['reload']['last_error'] is None
+        assert health['index_version'] != old_version
+        assert health['delta'] == dict(health['delta'], movies=0, deleted=0, applied_seq=0, journal_pending=0)
+        assert client.get('/movies/1001').status_code == 404
+        assert 5000 in recommended_ids(client)
+        assert client.get('/movies/5000/similar').status_code == 200
+
+    assert journal_entries() == []
+    ids = load_movies('data/processed_movies.arrow', 'data/processed_movies.csv')['id'].tolist()
+    assert 5000 in ids and 1001 not in ids
+
+    with start_server('main_enhanced') as (_, client):
+        assert client.get('/health').json()['delta']['movies'] == 0
+        assert client.get('/movies/5000').json()['title'] == NEW_MOVIE['title']
+
+
+@pytest.mark.parametrize('module_name', ['main_enhanced', 'main_semantic'])
+def test_admin_writes_rejected_before_lexical_index(start_server, module_name):
+    with start_server(module_name, load_analyzer=lambda: (_ for _ in ()).throw(RuntimeError("sem analisador"))) \
+            as (_, client):
+        assert client.put('/admin/movies/5000', json=NEW_MOVIE, headers=ADMIN_HEADERS).status_code == 503
+
+
+@pytest.mark.parametrize('module_name', ['main_enhanced', 'main_semantic'])
+def test_invalid_upsert_batch_rejected_without_mutation(start_server, module_name):
+    with start_server(module_name) as (_, client):
+        assert client.post('/admin/movies', json=[], headers=ADMIN_HEADERS).status_code == 400
+        assert client.post('/admin/movies', json=[NEW_MOVIE], headers=ADMIN_HEADERS).status_code == 400
+        assert client.get('/health').json()['delta']['applied_seq'] == 0
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import index_store
+from index_store import build_index, load_index, write_index
+
+from conftest import synthetic_catalog
+
+FINGERPRINT = 'abcdef0123456789'
+
+
+@pytest.fixture
+def catalog_index(stub_nltk):
+    df = synthetic_catalog()
+    return df, build_index(df, 'lexical', workers=1)
+
+
+def versions(root):
+    return sorted(entry.name for entry in (root / 'lexical').iterdir() if entry.is_dir())
+
+
+def test_write_index_keeps_current_and_previous_version(tmp_path, catalog_index):
+    df, index = catalog_index
+    written = [write_index(index, df['id'], FINGERPRINT, str(tmp_path)).name for _ in range(4)]
+
+    assert len(set(written)) == 4
+    assert versions(tmp_path) == sorted(written[-2:])
+    assert (tmp_path / 'lexical' / 'CURRENT').read_text() == written[-1]
+    assert load_index('lexical', FINGERPRINT, str(tmp_path)).version == written[-1]
+
+
+def test_prune_keeps_builds_in_progress(tmp_path, catalog_index):
+    df, index = catalog_index
+    in_progress = tmp_path / 'lexical' / '.tmp-20990101-000000-other'
+    in_progress.mkdir(parents=True)
+
+    write_index(index, df['id'], FINGERPRINT, str(tmp_path))
+
+    assert in_progress.is_dir()
+
+
+def test_load_index_checks_sizes_without_hashing(tmp_path, catalog_index, monkeypatch):
+    df, index = catalog_index
+    path = write_index(index, df['id'], FINGERPRINT, str(tmp_path))
+
+    def no_hashing(path):
+        raise AssertionError("load_index leu o índice inteiro")
+
+    monkeypatch.setattr(index_store, 'file_sha256', no_hashing)
+    loaded = load_index('lexical', FINGERPRINT, str(tmp_path))
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded.tfidf_matrix.toarray(), index.tfidf_matrix.toarray())
+
+    # Arquivo truncado: recusado só pelo tamanho
+    data = path / 'tfidf_data.npy'
+    data.write_bytes(data.read_bytes()[:-8])
+    assert load_index('lexical', FINGERPRINT, str(tmp_path)) is None
+
+
+def test_full_checksum_only_when_requested(tmp_path, catalog_index):
+    df, index = catalog_index
+    path = write_index(index, df['id'], FINGERPRINT, str(tmp_path))
+
+    # Mesmo tamanho, conteúdo diferente: só o SHA-256 percebe
+    data = path / 'bm25_idf.npy'
+    content = bytearray(data.read_bytes())
+    content[-1] ^= 0x01
+    data.write_bytes(bytes(content))
+
+    assert load_index('lexical', FINGERPRINT, str(tmp_path)) is not None
+    assert load_index('lexical', FINGERPRINT, str(tmp_path), verify_checksums=True) is None
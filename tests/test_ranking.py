@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from ranking import full_fusion_top_k, fuse_top_k, top_k
+
+
+def lexical_scores(rng, n, density=0.1, levels=None):
+    """Scores esparsos como os lexicais: quase tudo zero; `levels` força empates"""
+    scores = np.zeros(n)
+    rows = rng.choice(n, max(1, int(n * density)), replace=False)
+    values = rng.random(len(rows)) if levels is None else rng.integers(1, levels + 1, len(rows)).astype(float)
+    scores[rows] = values
+    return scores
+
+
+def assert_same_as_full_fusion(signals, k, depth):
+    indices, scores = fuse_top_k(signals, k, depth)
+    expected_indices, expected_scores = full_fusion_top_k(signals, k)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_array_equal(scores, expected_scores)
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('depth', [1, 5, 20, 1000])
+def test_fuse_top_k_matches_full_fusion(seed, depth):
+    rng = np.random.default_rng(seed)
+    n = 300
+    signals = [(lexical_scores(rng, n), 0.6), (lexical_scores(rng, n, 0.3), 0.4), (rng.random(n), 0.5)]
+    for k in (0, 1, 10, 50, n):
+        assert_same_as_full_fusion(signals, k, depth)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_fuse_top_k_matches_full_fusion_with_ties(seed):
+    rng = np.random.default_rng(seed)
+    n = 200
+    # Poucos valores distintos: empates dentro dos candidatos e na fronteira do depth
+    signals = [(lexical_scores(rng, n, 0.4, levels=3), 1.0), (lexical_scores(rng, n, 0.4, levels=2), 1.0)]
+    for k in (1, 7, 30):
+        for depth in (3, 10, 40):
+            assert_same_as_full_fusion(signals, k, depth)
+
+
+def test_fuse_top_k_falls_back_when_signals_disagree():
+    # Sinais opostos: o melhor documento fundido não está no topo de nenhum sinal
+    n = 50
+    first = np.linspace(1.0, 0.0, n)
+    second = first[::-1].copy()
+    middle = np.zeros(n)
+    middle[n // 2] = 1.0
+    signals = [(first, 1.0), (second, 1.0), (middle, 0.1)]
+
+    assert_same_as_full_fusion(signals, 3, depth=5)
+    assert fuse_top_k(signals, 1, depth=5)[0][0] == n // 2
+
+
+def test_fuse_top_k_ignores_constant_and_zero_weight_signals():
+    rng = np.random.default_rng(0)
+    scores = rng.random(100)
+    signals = [(scores, 1.0), (np.full(100, 3.0), 1.0), (rng.random(100), 0.0)]
+
+    assert_same_as_full_fusion(signals, 10, depth=10)
+    # verify=True compara com a fusão completa dentro da própria chamada
+    fuse_top_k(signals, 10, depth=10, verify=True)
+
+
+def test_top_k_breaks_ties_by_lowest_index():
+    scores = np.array([0.0, 2.0, 1.0, 2.0, 0.0, 1.0, 0.0])
+
+    indices, values = top_k(scores, 4)
+
+    assert indices.tolist() == [1, 3, 2, 5]
+    assert values.tolist() == [2.0, 2.0, 1.0, 1.0]
+    assert top_k(scores, 6)[0].tolist() == [1, 3, 2, 5, 0, 4]
@@ -0,0 +1,28 @@
+def recommend(client, query, **params):
+    response = client.post('/recommend', json=dict({'query': query, 'algorithm': 'hybrid'}, **params))
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_cached_results_echo_the_requesting_query(start_server):
+    with start_server('main_enhanced') as (_, client):
+        first = recommend(client, 'Ghost  HOUSE')
+        second = recommend(client, 'ghost house')
+
+        assert client.get('/health').json()['result_cache']['hits'] == 1
+        assert second['movies'] == first['movies'] and first['movies']
+        assert first['query_info']['original_query'] == 'Ghost  HOUSE'
+        assert second['query_info']['original_query'] == 'ghost house'
+        # Sinônimo da tabela do índice (podado ao vocabulário: 'spirit' não aparece no catálogo)
+        assert second['query_info']['expanded_query'] == 'ghost house haunted'
+        assert second['query_info']['synonyms_added']
+
+
+def test_cache_key_separates_synonym_expansion(start_server):
+    with start_server('main_enhanced') as (_, client):
+        expanded = recommend(client, 'ghost house')
+        plain = recommend(client, 'ghost house', use_synonyms=False)
+
+        assert client.get('/health').json()['result_cache']['hits'] == 0
+        assert plain['query_info']['expanded_query'] is None and not plain['query_info']['synonyms_added']
+        assert expanded['query_info']['synonyms_added']
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from segments import DeltaJournal, DeltaSegment, concat_scores, dead_rows, drop_dead, live_top_k, merge_candidates, segment_view
+from payloads import MoviePayloads
+
+from conftest import synthetic_catalog
+
+
+class LowercaseAnalyzer:
+    def process(self, text: str) -> str:
+        return text.lower()
+
+
+def embed(movies: pd.DataFrame) -> np.ndarray:
+    return np.stack([np.array([len(title), 1.0]) for title in movies['title']])
+
+
+def main_segment():
+    main = synthetic_catalog(10)
+    tfidf = TfidfVectorizer().fit(main['description'])
+    return main, MoviePayloads.from_frame(main), tfidf
+
+
+def movie(movie_id: int, title: str, popularity: float = 1.0) -> dict:
+    return {'id': movie_id, 'title': title, 'description': 'alien robots', 'genre': ['Action'], 'image_url': '',
+            'director': '', 'cast': [], 'keywords': [], 'vote_average': 7.0, 'vote_count': 1, 'popularity': popularity}
+
+
+def test_upsert_replaces_movie_with_same_id_in_delta():
+    _, _, tfidf = main_segment()
+    delta = DeltaSegment().upsert(pd.DataFrame([movie(1, 'First'), movie(2, 'Other')]), LowercaseAnalyzer(), tfidf)
+    delta = delta.upsert(pd.DataFrame([movie(1, 'Second')]), LowercaseAnalyzer(), tfidf)
+
+    assert delta.ids == [2, 1]
+    assert delta.movies['title'].tolist() == ['Other', 'Second']
+    assert delta.tfidf_matrix.shape[0] == len(delta) == len(delta.payloads)
+
+
+def test_remove_then_upsert_same_id():
+    _, _, tfidf = main_segment()
+    delta = DeltaSegment().upsert(pd.DataFrame([movie(1, 'First')]), LowercaseAnalyzer(), tfidf)
+
+    assert len(delta.remove([1], tfidf)) == 0
+    assert delta.remove([99], tfidf) is delta
+    assert delta.remove([1], tfidf).upsert(pd.DataFrame([movie(1, 'Back')]), LowercaseAnalyzer(), tfidf).ids == [1]
+
+
+def test_segment_view_tombstones_replaced_and_deleted_rows():
+    main, payloads, tfidf = main_segment()
+    replaced_id, deleted_id = int(main['id'][0]), int(main['id'][1])
+    delta = DeltaSegment().upsert(pd.DataFrame([movie(replaced_id, 'Replaced', 100.0)]), LowercaseAnalyzer(), tfidf)
+
+    view = segment_view(main, payloads, delta, {deleted_id})
+
+    assert len(view['df_movies']) == len(main) + 1
+    assert not view['alive'][0] and not view['alive'][1] and view['alive'][len(main)]
+    assert view['id_to_row'][replaced_id] == len(main)
+    assert deleted_id not in view['id_to_row']
+    assert view['popular_rows'][0] == len(main)
+    assert 0 not in view['popular_rows'] and 1 not in view['popular_rows']
+
+
+def test_segment_view_without_changes_keeps_main_frame():
+    main, payloads, _ = main_segment()
+    view = segment_view(main, payloads, DeltaSegment(), frozenset())
+    assert view['df_movies'] is main and view['alive'] is None
+
+
+def test_with_embeddings_fills_delta_replayed_without_encoder():
+    _, _, tfidf = main_segment()
+    delta = DeltaSegment().upsert(pd.DataFrame([movie(1, 'First'), movie(2, 'Second one')]), LowercaseAnalyzer(), tfidf)
+    assert delta.embeddings is None
+    assert not delta.sbert_scores(np.ones(2, dtype=np.float32)).any()
+
+    filled = delta.with_embeddings(embed)
+    assert filled.embeddings.shape == (2, 2)
+    np.testing.assert_allclose(np.linalg.norm(filled.embeddings, axis=1), 1.0, rtol=1e-6)
+    assert filled.with_embeddings(embed) is filled
+
+    # Upsert com o encoder sobre um delta ainda sem embeddings
+    grown = delta.upsert(pd.DataFrame([movie(3, 'Third')]), LowercaseAnalyzer(), tfidf, embed=embed)
+    assert grown.ids == [1, 2, 3] and grown.embeddings.shape == (3, 2)
+
+
+def test_live_top_k_skips_dead_row_outranked_by_delta():
+    # Linha 0 (principal) morta com o maior score; linha 3 é do delta
+    scores = concat_scores(np.array([0.9, 0.5, 0.1]), np.array([0.95]))
+    alive = np.array([False, True, True, True])
+
+    indices, values = live_top_k(scores, 2, alive)
+
+    assert indices.tolist() == [3, 1]
+    np.testing.assert_allclose(values, [0.95, 0.5])
+    assert dead_rows(alive) == 1
+
+
+def test_live_top_k_fills_k_when_dead_rows_rank_first():
+    scores = np.array([0.9, 0.8, 0.3, 0.2, 0.7])
+    alive = np.array([False, False, True, True, True])
+
+    indices, _ = live_top_k(scores, 3, alive)
+
+    assert indices.tolist() == [4, 2, 3]
+
+
+def test_drop_dead_without_tombstones_only_truncates():
+    indices, scores = drop_dead(np.array([2, 0, 1]), np.array([0.3, 0.2, 0.1]), None, 2)
+    assert indices.tolist() == [2, 0] and scores.tolist() == [0.3, 0.2]
+
+
+def test_merge_candidates_adds_delta_rows_and_drops_dead():
+    main = (np.array([0, 2]), np.array([0.9, 0.4]))
+    alive = np.array([False, True, True, True, True])
+
+    indices, scores = merge_candidates(main, np.array([0.6, 0.1]), 3, 2, alive)
+
+    assert indices.tolist() == [3, 2]
+    np.testing.assert_allclose(scores, [0.6, 0.4])
+
+
+def test_journal_seq_unique_across_writers(tmp_path):
+    path = str(tmp_path / 'catalog_delta.jsonl')
+    first, second = DeltaJournal(path), DeltaJournal(path)
+
+    seqs = [first.append({'op': 'delete', 'ids': [1]}), second.append({'op': 'delete', 'ids': [2]}),
+            first.append({'op': 'delete', 'ids': [3]})]
+
+    assert seqs == [1, 2, 3]
+    assert [entry['ids'] for entry in first.read(1)] == [[2], [3]]
+    assert first.pending == 3
+
+    first.compact(2)
+    assert second.append({'op': 'delete', 'ids': [4]}) == 4
+    assert [entry['seq'] for entry in second.read()] == [3, 4]
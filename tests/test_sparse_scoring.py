@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from sparse_scoring import SparseBM25, sparse_dot_scores
+
+# 'space' aparece em mais da metade dos documentos: IDF negativo, trocado por epsilon * média
+CORPUS = [
+    "alien robot attack space station space".split(),
+    "space family drama loss hope".split(),
+    "friend plan wild party space".split(),
+    "haunted house ghost terrify family".split(),
+    "stranger fall love paris space love love".split(),
+    "robot love story".split(),
+    "ghost".split(),
+]
+
+QUERIES = [
+    ["robot"],
+    ["space", "love"],
+    ["love", "love", "robot", "love"],            # termos repetidos contam de novo
+    ["unknown", "ghost", "missing"],              # termos fora do corpus
+    ["nothing", "matches"],
+    [],
+    ["space", "space", "family", "ghost", "paris", "robot", "station"],
+]
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_sparse_bm25_matches_rank_bm25(query):
+    expected = BM25Okapi(CORPUS).get_scores(query)
+    np.testing.assert_array_equal(SparseBM25.fit(CORPUS).get_scores(query), expected)
+
+
+def test_sparse_bm25_parameters_match_rank_bm25():
+    reference = BM25Okapi(CORPUS, k1=1.2, b=0.5, epsilon=0.1)
+    index = SparseBM25.fit(CORPUS, k1=1.2, b=0.5, epsilon=0.1)
+
+    assert index.avgdl == reference.avgdl and index.average_idf == reference.average_idf
+    assert dict(zip(index.terms, index.idf)) == reference.idf
+    for query in QUERIES:
+        np.testing.assert_array_equal(index.get_scores(query), reference.get_scores(query))
+
+
+def test_for_documents_scores_like_the_main_index():
+    index = SparseBM25.fit(CORPUS)
+    delta = index.for_documents(CORPUS[:3] + [["unknown", "robot"]])
+
+    for query in QUERIES:
+        np.testing.assert_allclose(delta.get_scores(query)[:3], index.get_scores(query)[:3])
+    # Termos fora do vocabulário entram no tamanho do documento, mas não pontuam
+    assert delta.get_scores(["unknown"])[3] == 0.0 and delta.get_scores(["robot"])[3] > 0.0
+
+
+def test_sparse_dot_scores_matches_cosine_similarity():
+    texts = [" ".join(document) for document in CORPUS]
+    tfidf = TfidfVectorizer()
+    matrix = tfidf.fit_transform(texts)
+    query_vec = tfidf.transform(["love robot ghost unknown"])
+
+    scores = sparse_dot_scores(matrix.T.tocsr(), query_vec)
+
+    np.testing.assert_allclose(scores, cosine_similarity(query_vec, matrix).ravel())
@@ -1,10 +1,16 @@
 import pandas as pd
+import pyarrow.feather as feather
 import requests
 import time
 import os
+import sys
 from typing import Optional
 from dotenv import load_dotenv
 
+# The catalog schema and writer live with the backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from data_processor import save_movies
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -56,21 +62,36 @@ def search_movie_poster(title: str, year: Optional[str] = None) -> Optional[str]
         print(f"Error searching for '{title}': {e}")
         return None
 
+def read_dataset(path: str) -> pd.DataFrame:
+    """Read the processed catalog (Arrow IPC or legacy CSV)."""
+    if path.endswith('.arrow'):
+        return feather.read_feather(path)
+    return pd.read_csv(path)
+
+def write_dataset(df: pd.DataFrame, path: str):
+    """Write the processed catalog in the format implied by the file extension."""
+    if path.endswith('.arrow'):
+        # Typed schema + tmp file and rename, so servers mapping the old file keep it intact
+        save_movies(df, path)
+    else:
+        df.to_csv(path, index=False)
+
 def update_movie_images(input_csv: str, output_csv: str, backup: bool = True):
     """
     Update movie images in the dataset by fetching fresh URLs from TMDB.
     
     Args:
-        input_csv: Path to input CSV file
-        output_csv: Path to output CSV file
+        input_csv: Path to input file (.arrow or .csv)
+        output_csv: Path to output file (.arrow or .csv)
         backup: Whether to create a backup of the original file
     """
     print(f"Loading dataset from {input_csv}...")
-    df = pd.read_csv(input_csv)
+    df = read_dataset(input_csv)
     
     if backup:
-        backup_path = input_csv.replace('.csv', '_backup.csv')
-        df.to_csv(backup_path, index=False)
+        base, ext = os.path.splitext(input_csv)
+        backup_path = f"{base}_backup{ext}"
+        write_dataset(df, backup_path)
         print(f"Backup created at {backup_path}")
     
     total_movies = len(df)
@@ -114,7 +135,7 @@ def update_movie_images(input_csv: str, output_csv: str, backup: bool = True):
     
     # Save updated dataset
     print(f"\nSaving updated dataset to {output_csv}...")
-    df.to_csv(output_csv, index=False)
+    write_dataset(df, output_csv)
     
     print("\n" + "="*60)
     print("UPDATE COMPLETE")
@@ -138,8 +159,11 @@ def main():
         print("\nGet your free API key at: https://www.themoviedb.org/settings/api")
         return
     
-    input_file = 'data/processed_movies.csv'
-    output_file = 'data/processed_movies.csv'
+    # Prefer the Arrow catalog the servers load; fall back to the legacy CSV
+    input_file = 'data/processed_movies.arrow'
+    if not os.path.exists(input_file):
+        input_file = 'data/processed_movies.csv'
+    output_file = input_file
     
     if not os.path.exists(input_file):
         print(f"ERROR: Input file not found: {input_file}")